@@ -0,0 +1,296 @@
+"""Network-wide analytics: travel matrices, isochrones, centrality and transfer load.
+
+Everything is computed from one shortest-path tree per origin station (the
+same search and tie-breaking as ``MetroGraph.dijkstra``) rather than one
+search per station pair. Trees are processed in batches: with numpy
+installed, a batch's distance rows, settle orders and predecessors are
+stacked into arrays and the per-station statistics are accumulated for the
+whole batch at once; without it the same numbers are accumulated tree by
+tree. Matrices export as compressed ``.npz`` (numpy) or CSV, and isochrones
+can be drawn over any of the folium maps.
+
+    python analytics.py matrix [--criteria time] [--out times.npz]
+    python analytics.py isochrone "Kashmere Gate" [--minutes 30] [--map isochrone.html]
+    python analytics.py centrality [--criteria time] [--out centrality.csv]
+"""
+import argparse
+import contextlib
+import csv
+import sys
+from array import array
+from itertools import islice
+
+from route_table import CRITERIA
+from spatial import _numpy
+
+BATCH_SIZE = 256  # trees held at once; bounds memory at BATCH_SIZE x stations per array
+ISOCHRONE_BANDS = (10, 20, 30)  # minutes
+BAND_COLORS = ('#1a9850', '#fee08b', '#d73027', '#762a83', '#2166ac')  # nearest band first
+INF = float('inf')
+
+
+def shortest_path_trees(metro_graph, criteria='time', sources=None, batch_size=BATCH_SIZE):
+    """Yield lists of up to ``batch_size`` SearchTrees, one per source station id.
+
+    ``sources`` defaults to every station of the compiled graph.
+    """
+    compiled = metro_graph._compiled()
+    compiled.weights(criteria)  # validate criteria before any search runs
+    sources = iter(range(len(compiled)) if sources is None else sources)
+    while True:
+        batch = [metro_graph._search(compiled, source, criteria) for source in islice(sources, batch_size)]
+        if not batch:
+            return
+        yield batch
+
+
+def travel_totals(metro_graph, station, criteria='time'):
+    """``{station: total}`` for every station reachable from ``station``, nearest first."""
+    compiled = metro_graph._compiled()
+    if station not in compiled.index:
+        return {}
+    tree = metro_graph._search(compiled, compiled.index[station], criteria)
+    return {compiled.names[node]: tree.dist[node] for node in tree.order}
+
+
+def isochrone(metro_graph, station, limit=30, criteria='time'):
+    """``[(total, station)]`` for every station within ``limit`` of ``station``, nearest first."""
+    return [(total, name) for name, total in travel_totals(metro_graph, station, criteria).items() if total <= limit]
+
+
+def travel_matrix(metro_graph, criteria='time', batch_size=BATCH_SIZE):
+    """Shortest ``criteria`` totals between every pair of stations.
+
+    Returns ``(stations, matrix)`` where ``matrix[i][j]`` is the total from
+    ``stations[i]`` to ``stations[j]`` (inf if unreachable). The matrix is a
+    float64 numpy array when numpy is installed, otherwise a list of
+    ``array('d')`` rows.
+    """
+    compiled = metro_graph._compiled()
+    n = len(compiled)
+    np = _numpy()
+    matrix = np.empty((n, n)) if np is not None else []
+    row = 0
+    for batch in shortest_path_trees(metro_graph, criteria, batch_size=batch_size):
+        if np is not None:
+            matrix[row:row + len(batch)] = [tree.dist for tree in batch]
+        else:
+            matrix.extend(array('d', tree.dist) for tree in batch)
+        row += len(batch)
+    return list(compiled.names), matrix
+
+
+def travel_matrices(metro_graph, criteria=CRITERIA, batch_size=BATCH_SIZE):
+    """``{criteria: (stations, matrix)}`` for each criteria, see travel_matrix."""
+    return {name: travel_matrix(metro_graph, name, batch_size) for name in criteria}
+
+
+def _accumulate_python(compiled, batch, betweenness, transfer_load):
+    lines = compiled.lines
+    for tree in batch:
+        order, pred_node, pred_edge = tree.order, tree.pred_node, tree.pred_edge
+        # Routes to every station in a subtree pass through its root; children
+        # are settled after their parent, so a reverse pass adds up subtree sizes
+        size = {node: 1 for node in order}
+        for node in reversed(order[1:]):
+            size[pred_node[node]] += size[node]
+        for node in order[1:]:
+            betweenness[node] += size[node] - 1
+            parent = pred_node[node]
+            if parent != tree.source and lines[pred_edge[node]] != lines[pred_edge[parent]]:
+                transfer_load[parent] += size[node]
+
+
+def _accumulate_numpy(np, compiled, batch, betweenness, transfer_load):
+    """Batched form of _accumulate_python: one vector step per settle position across all trees."""
+    n, rows = len(compiled), len(batch)
+    dummy = n  # stands in for unreached stations and the parent of each source
+    order = np.full((rows, n), dummy, dtype=np.int64)
+    pred_node = np.empty((rows, n + 1), dtype=np.int64)
+    pred_edge = np.empty((rows, n + 1), dtype=np.int64)
+    for i, tree in enumerate(batch):
+        order[i, :len(tree.order)] = tree.order
+        pred_node[i, :n] = tree.pred_node
+        pred_edge[i, :n] = tree.pred_edge
+    pred_node[pred_node == -1] = dummy
+    pred_node[:, dummy] = dummy
+    pred_edge[:, dummy] = -1
+
+    index = np.arange(rows)
+    size = np.zeros((rows, n + 1), dtype=np.int64)
+    size[index[:, None], order] = 1
+    size[:, dummy] = 0
+    for position in range(n - 1, 0, -1):
+        node = order[:, position]
+        # Each row touches one (row, parent) cell per step, so fancy += is safe
+        size[index, pred_node[index, node]] += size[index, node]
+
+    sources = np.array([tree.source for tree in batch])
+    reached = size[:, :n] > 0
+    reached[index, sources] = False
+    betweenness += np.where(reached, size[:, :n] - 1, 0).sum(axis=0)
+
+    edge_lines = np.frombuffer(compiled.lines, dtype=np.int32)
+    line = np.where(pred_edge >= 0, edge_lines[np.maximum(pred_edge, 0)], -1)
+    parent = pred_node[:, :n]
+    parent_line = line[index[:, None], parent]
+    transfer = reached & (parent_line != -1) & (parent_line != line[:, :n])
+    np.add.at(transfer_load, parent[transfer], size[:, :n][transfer])
+
+
+def centrality(metro_graph, criteria='time', batch_size=BATCH_SIZE, use_numpy=None):
+    """Per-station route statistics over every ordered pair of stations.
+
+    Returns ``{'stations', 'betweenness', 'transfer_load'}`` where, for each
+    station, betweenness counts the optimal routes passing through it
+    (neither starting nor ending there) and transfer_load counts the routes
+    that change lines there. ``use_numpy`` forces or disables the batched
+    numpy accumulation (default: use it when installed).
+    """
+    compiled = metro_graph._compiled()
+    n = len(compiled)
+    np = _numpy() if use_numpy is not False else None
+    if use_numpy and np is None:
+        raise ImportError("numpy is required for use_numpy=True")
+    if np is not None:
+        betweenness = np.zeros(n, dtype=np.int64)
+        transfer_load = np.zeros(n, dtype=np.int64)
+    else:
+        betweenness = [0] * n
+        transfer_load = [0] * n
+    for batch in shortest_path_trees(metro_graph, criteria, batch_size=batch_size):
+        if np is not None:
+            _accumulate_numpy(np, compiled, batch, betweenness, transfer_load)
+        else:
+            _accumulate_python(compiled, batch, betweenness, transfer_load)
+    return {
+        'stations': list(compiled.names),
+        'betweenness': [int(value) for value in betweenness],
+        'transfer_load': [int(value) for value in transfer_load],
+    }
+
+
+def save_matrix(path, stations, matrix, dtype='float32'):
+    """Write a travel matrix to ``.npz`` (compressed, numpy required) or ``.csv``.
+
+    The ``.npz`` holds ``stations`` and ``matrix`` arrays, stored as
+    ``dtype``. CSV has a header row of station names and one row per origin;
+    unreachable pairs are left empty.
+    """
+    if path.endswith('.npz'):
+        np = _numpy()
+        if np is None:
+            raise ImportError("numpy is required to write .npz files; use a .csv path")
+        np.savez_compressed(path, stations=np.array(stations), matrix=np.asarray(matrix, dtype=dtype))
+        return
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Station', *stations])
+        for station, row in zip(stations, matrix):
+            writer.writerow([station, *(f"{value:g}" if value != INF else '' for value in row)])
+
+
+def save_centrality(path, stats):
+    """Write centrality statistics as CSV, busiest interchanges first."""
+    rows = sorted(zip(stats['stations'], stats['betweenness'], stats['transfer_load']),
+                  key=lambda row: (-row[1], row[0]))
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Station', 'Betweenness', 'Transfer Load'])
+        writer.writerows(rows)
+
+
+def add_isochrone_layer(m, metro_graph, station, bands=ISOCHRONE_BANDS, criteria='time'):
+    """Overlay the stations reachable from ``station`` on a folium map, colored by band.
+
+    Works on any map from ``generate_full_map``/``generate_route_map``.
+    Returns the number of stations drawn.
+    """
+    import folium
+
+    bands = sorted(bands)
+    layer = folium.FeatureGroup(name=f"Within {bands[-1]:g} of {station}")
+    drawn = 0
+    for total, name in isochrone(metro_graph, station, bands[-1], criteria):
+        coord = metro_graph.station_coords.get(name)
+        if coord is None:
+            continue
+        band = next(i for i, limit in enumerate(bands) if total <= limit)
+        color = BAND_COLORS[min(band, len(BAND_COLORS) - 1)]
+        folium.CircleMarker(
+            location=coord,
+            radius=7,
+            color=color,
+            fill=True,
+            fill_color=color,
+            fill_opacity=0.8,
+            weight=1,
+            tooltip=f"{name}: {total:g} ({criteria}) from {station}",
+        ).add_to(layer)
+        drawn += 1
+    layer.add_to(m)
+    folium.LayerControl().add_to(m)
+    return drawn
+
+
+def isochrone_map(metro_graph, station, bands=ISOCHRONE_BANDS, criteria='time'):
+    """The full network map with an isochrone overlay for ``station``, or None if there is nothing to draw."""
+    m = metro_graph.generate_full_map()
+    if m is None:
+        return None
+    add_isochrone_layer(m, metro_graph, station, bands, criteria)
+    return m
+
+
+def main(argv=None):
+    from app import CACHE_DIR, NETWORK_CSV, load_network, network_digest
+
+    parser = argparse.ArgumentParser(description="Network-wide travel matrices, isochrones and centrality.")
+    parser.add_argument('--csv', default=NETWORK_CSV, help="network CSV to load")
+    commands = parser.add_subparsers(dest='command', required=True)
+    matrix_parser = commands.add_parser('matrix', help="all-pairs travel totals")
+    matrix_parser.add_argument('--criteria', choices=CRITERIA, default='time')
+    matrix_parser.add_argument('--out', default='travel_matrix.csv', help=".npz (numpy) or .csv output file")
+    isochrone_parser = commands.add_parser('isochrone', help="stations reachable within a limit")
+    isochrone_parser.add_argument('station')
+    isochrone_parser.add_argument('--criteria', choices=CRITERIA, default='time')
+    isochrone_parser.add_argument('--minutes', type=float, default=30, help="limit, in the criteria's unit")
+    isochrone_parser.add_argument('--map', help="also write a folium map with the isochrone overlay")
+    centrality_parser = commands.add_parser('centrality', help="betweenness and transfer load per station")
+    centrality_parser.add_argument('--criteria', choices=CRITERIA, default='time')
+    centrality_parser.add_argument('--out', default='centrality.csv')
+    args = parser.parse_args(argv)
+
+    with contextlib.redirect_stdout(sys.stderr):  # keep loader chatter out of command output
+        metro_graph = load_network(args.csv, network_digest(args.csv), cache_dir=CACHE_DIR)
+
+    if args.command == 'matrix':
+        stations, matrix = travel_matrix(metro_graph, args.criteria)
+        save_matrix(args.out, stations, matrix)
+        print(f"{args.criteria} matrix for {len(stations)} stations written to {args.out}")
+    elif args.command == 'isochrone':
+        station = metro_graph.resolve_station(args.station)
+        if station is None:
+            print(f"Unknown station: {args.station}", file=sys.stderr)
+            return 1
+        for total, name in isochrone(metro_graph, station, args.minutes, args.criteria):
+            print(f"{total:8g}  {name}")
+        if args.map:
+            limits = [limit for limit in ISOCHRONE_BANDS if limit < args.minutes] + [args.minutes]
+            try:
+                m = isochrone_map(metro_graph, station, limits, args.criteria)
+            except ImportError as e:
+                print(f"Cannot draw the map: {e}", file=sys.stderr)
+                return 1
+            if m is not None:
+                m.save(args.map)
+                print(f"Map written to {args.map}", file=sys.stderr)
+    else:
+        stats = centrality(metro_graph, args.criteria)
+        save_centrality(args.out, stats)
+        print(f"Centrality for {len(stats['stations'])} stations written to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,38 @@
-import pandas as pd
+import contextlib
+import csv
 import heapq
-import tkinter as tk
-from tkinter import ttk, messagebox
-import webbrowser
-import folium
+import pickle
+import sys
+from array import array
+import glob
 import os
-from collections import defaultdict
+import hashlib
+import json
+import itertools
+import math
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict, defaultdict, deque
+from time import perf_counter
+
+from contraction import load_or_build_hierarchy
+from route_table import CRITERIA, STALE_ROUTE, load_or_build_route_table
+from spatial import SpatialIndex, haversine_km
+from station_index import StationIndex
+from timetable import (FREQUENCIES_CSV, TRANSFER_WALK_MIN, Timetable, format_clock, frequencies_path, parse_clock,
+                       read_frequencies)
+
+NETWORK_CSV = 'metro_normalized.csv'
+CACHE_DIR = '.metro_cache'  # on-disk caches derived from the network CSV
+CRITERIA_LABELS = {
+    "Shortest Path (Distance)": "distance",
+    "Minimum Time": "time",
+    "Minimum Cost": "cost"
+}
+INF = float('inf')
+EPS = 1e-9  # tolerance when comparing floating point route totals
+_point_search = threading.local()  # per-thread arrays reused by point-to-point searches, see _point_arrays
 
 # Enhanced color definitions with more distinct colors
 LINE_COLORS = {
@@ -51,13 +78,247 @@ def normalize_line_name(line):
         return line.title()
 
 
+def parse_transfer_penalty(value):
+    """Parse a transfer penalty, rejecting negative and non-finite values the searches cannot handle."""
+    penalty = float(value)
+    if not (math.isfinite(penalty) and penalty >= 0):
+        raise ValueError(f"Invalid transfer penalty: {value!r} (expected a number >= 0)")
+    return penalty
+
+
+def _check_weight(name, value):
+    """Reject negative and non-finite weights; a negative one forms a cycle the searches never leave."""
+    if not (math.isfinite(value) and value >= 0):
+        raise ValueError(f"Invalid {name}: {value!r} (expected a number >= 0)")
+    return value
+
+
+def _point_arrays(n):
+    """This thread's ``(dist, pred_node, pred_edge)`` lists for a point-to-point search over ``n`` stations.
+    
+    Only the stations the previous search settled or queued are reset, so a
+    query costs no per-station allocation; the previous search's tree is
+    invalid from here on.
+    """
+    arrays = getattr(_point_search, 'arrays', None)
+    if arrays is None or len(arrays[0]) != n:
+        arrays = _point_search.arrays = ([INF] * n, [-1] * n, [-1] * n)
+        _point_search.settled = _point_search.queued = ()
+    dist, pred_node, pred_edge = arrays
+    for node in _point_search.settled:
+        dist[node] = INF
+        pred_node[node] = pred_edge[node] = -1
+    for _, node in _point_search.queued:
+        dist[node] = INF
+        pred_node[node] = pred_edge[node] = -1
+    return arrays
+
+
+def _dominated(time, cost, labels):
+    """True if any (time, cost, ...) label is at least as good on both criteria."""
+    for label in labels:
+        if label[0] <= time + EPS and label[1] <= cost + EPS:
+            return True
+    return False
+
+
+class CompiledGraph:
+    """Frozen CSR (compressed sparse row) view of a MetroGraph adjacency.
+
+    Station names are interned to integer ids (in sorted name order) and
+    line names to small integer ids. The edges leaving station ``i`` occupy
+    ``offsets[i]:offsets[i + 1]`` of the flat ``targets``, ``times``,
+    ``distances``, ``costs`` and ``lines`` arrays.
+    """
+
+    def __init__(self, graph):
+        self.names = sorted(graph)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.line_names = []
+        line_index = {}
+
+        self.offsets = array('i', [0])
+        self.sources = array('i')
+        self.targets = array('i')
+        self.times = array('d')
+        self.distances = array('d')
+        self.costs = array('d')
+        self.lines = array('i')
+
+        for name in self.names:
+            for neighbor, time, distance, cost, line in graph[name]:
+                if line not in line_index:
+                    line_index[line] = len(self.line_names)
+                    self.line_names.append(line)
+                self.sources.append(self.index[name])
+                self.targets.append(self.index[neighbor])
+                self.times.append(float(time))
+                self.distances.append(float(distance))
+                self.costs.append(float(cost))
+                self.lines.append(line_index[line])
+            self.offsets.append(len(self.targets))
+
+    def __len__(self):
+        return len(self.names)
+
+    def weights(self, criteria):
+        """Return the edge weight array for a routing criteria."""
+        if criteria == 'time':
+            return self.times
+        elif criteria == 'distance':
+            return self.distances
+        elif criteria == 'cost':
+            return self.costs
+        else:
+            raise ValueError("Invalid criteria.")
+
+
+class SearchTree:
+    """Shortest-path tree produced by a single-source search on a CompiledGraph.
+
+    ``pred_node[i]``/``pred_edge[i]`` hold the station and edge used to reach
+    station ``i`` (-1 if unreached or the source); ``order`` lists stations in
+    the order they were settled.
+    """
+
+    __slots__ = ('source', 'dist', 'pred_node', 'pred_edge', 'order')
+
+    def __init__(self, source, dist, pred_node, pred_edge, order):
+        self.source = source
+        self.dist = dist
+        self.pred_node = pred_node
+        self.pred_edge = pred_edge
+        self.order = order
+
+
+class RouteCache:
+    """Bounded LRU cache of route results with hit/miss instrumentation.
+    
+    Every edge is bidirectional, so a route and its reverse share one entry;
+    a hit in the opposite direction returns the stored route reversed.
+    ``time_saved`` adds up the original compute time of every hit. Safe to
+    share between threads (e.g. the service's thread workers).
+    """
+    
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # key -> (start, result, compute seconds)
+        self._lock = threading.Lock()  # guards _entries and the counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.time_saved = 0.0
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']  # locks cannot be pickled; each copy gets its own
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _key(start, end, criteria, options):
+        return (min(start, end), max(start, end), criteria, options)
+    
+    def get(self, start, end, criteria, options=()):
+        """Return ``(True, route)`` on a hit and ``(False, None)`` on a miss."""
+        key = self._key(start, end, criteria, options)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.time_saved += entry[2]
+        cached_start, result, _ = entry
+        if result is None:
+            return True, None
+        if cached_start == start:
+            return True, dict(result, path=list(result['path']), lines=list(result['lines']),
+                              steps=list(result['steps']))
+        steps = [(to_station, from_station, *weights_and_line)
+                 for from_station, to_station, *weights_and_line in reversed(result['steps'])]
+        return True, dict(result, path=result['path'][::-1], lines=result['lines'][::-1], steps=steps)
+    
+    def put(self, start, end, criteria, options, result, elapsed):
+        if self.maxsize <= 0:
+            return
+        key = self._key(start, end, criteria, options)
+        if result is not None:
+            result = dict(result, path=list(result['path']), lines=list(result['lines']),
+                          steps=list(result['steps']))
+        with self._lock:
+            self._entries[key] = (start, result, elapsed)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        """Drop every cached route (the counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+    
+    def discard_routes_through(self, segments):
+        """Drop cached routes that travel any of the given unordered station pairs."""
+        with self._lock:
+            stale = []
+            for key, (_, result, _) in self._entries.items():
+                if result is not None:
+                    path = result['path']
+                    if any(frozenset(pair) in segments for pair in zip(path, path[1:])):
+                        stale.append(key)
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+    
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'time_saved': self.time_saved,
+            }
+
+
 class MetroGraph:
-    def __init__(self):
+    def __init__(self, route_cache_size=1024):
         self.graph = {}
         self.stations = set()
         self.station_coords = {}  # {station: (lat, lon)}
         self.line_edges = defaultdict(set)  # {line: set of (from, to)}
         self.line_stations = defaultdict(set)  # {line: set of stations}
+        self.compiled = None  # CompiledGraph, rebuilt lazily after add_edge
+        self._route_table = None  # optional precomputed RouteTable for self.compiled
+        self._hierarchy = None  # optional ContractionHierarchy for self.compiled
+        self.route_cache = RouteCache(route_cache_size)
+        self.station_index = None  # StationIndex over self.stations, built lazily
+        self.spatial_index = None  # SpatialIndex over self.station_coords, built lazily
+        
+        # Live network state layered over the loaded timetable
+        self.disabled_edges = set()  # {(station, station, line or None)} closed segments
+        self.disabled_stations = set()
+        self._closed_weights = {}  # compiled edge id -> live (time, distance, cost) while closed
+        self._removed_edges = set()  # compiled edge ids removed since the last compile
+        self._stale_edges = set()  # compiled edge ids slowed down since the route table/hierarchy was built
+        self._astar_calibration = {}  # criteria -> calibration report, see astar_calibration
+        self._map_layers = None  # (network_hash, layers) last returned by map_layers
+        self.profiler = None  # optional profiling.Profiler, see enable_profiling
+        self.frequencies = None  # {line: service periods} for route_at, see load_frequencies
+        self.frequencies_csv = FREQUENCIES_CSV  # loaded on first use; the loaders point it next to the network CSV
+        self.transfer_walk = TRANSFER_WALK_MIN
+        self._timetable = None  # Timetable for self.compiled, built lazily by route_at
     
     def add_edge(self, from_station, to_station, time, distance, cost, line, lat_from=None, lon_from=None, lat_to=None, lon_to=None):
         line = line.strip().title()  # Normalize line name
@@ -82,53 +343,586 @@ class MetroGraph:
         
         # Store edges by line
         self.line_edges[line].add((from_station, to_station))
+        
+        # The compiled view and anything precomputed from it no longer match
+        self.compiled = None
+        self.route_table = None
+        self.hierarchy = None
+        self.route_cache.clear()
+        self.station_index = None
+        self.spatial_index = None
+    
+    def __getstate__(self):
+        # The route table maps a local file; pickled copies (e.g. pool workers) route without it
+        state = self.__dict__.copy()
+        state['_route_table'] = None
+        state['profiler'] = None  # counts made in another process would never come back
+        return state
+    
+    def enable_profiling(self, profiler=None):
+        """Record hot-path timings and counters into ``profiler`` (a new Profiler if None) and return it."""
+        from profiling import Profiler
+        
+        self.profiler = profiler if profiler is not None else Profiler()
+        return self.profiler
+    
+    def disable_profiling(self):
+        """Stop recording and return the profiler that was attached, if any."""
+        profiler, self.profiler = self.profiler, None
+        return profiler
+    
+    @property
+    def route_table(self):
+        return self._route_table
+    
+    @route_table.setter
+    def route_table(self, table):
+        self._route_table = table
+        if self._hierarchy is None:  # otherwise the hierarchy may still predate them
+            self._stale_edges = set()
+    
+    @property
+    def hierarchy(self):
+        return self._hierarchy
+    
+    @hierarchy.setter
+    def hierarchy(self, hierarchy):
+        self._hierarchy = hierarchy
+        if self._route_table is None:
+            self._stale_edges = set()
+    
+    def compile(self):
+        """Build (or rebuild) the array-backed routing view of the graph."""
+        started = perf_counter()
+        self.compiled = CompiledGraph(self.graph)
+        self.route_table = None  # built against the previous edge ids
+        self.hierarchy = None
+        self._closed_weights = {}
+        self._removed_edges = set()
+        self._astar_calibration = {}
+        self._timetable = None
+        if self.disabled_edges or self.disabled_stations:
+            self._refresh_edges(range(len(self.compiled.targets)))
+        if self.profiler is not None:
+            self.profiler.add('compile', perf_counter() - started, stations=len(self.compiled),
+                              edges=len(self.compiled.targets))
+        return self.compiled
+    
+    def _compiled(self):
+        return self.compiled if self.compiled is not None else self.compile()
+    
+    def route(self, start, end, criteria='time', transfer_penalty=None):
+        """Answer a route query through the route cache.
+        
+        Misses are answered by transfer_aware_route when ``transfer_penalty``
+        is given, otherwise from the precomputed table or contraction
+        hierarchy if one is attached, falling back to dijkstra.
+        """
+        started = perf_counter()
+        options = (transfer_penalty,)
+        hit, result = self.route_cache.get(start, end, criteria, options)
+        if hit:
+            if self.profiler is not None:
+                self.profiler.add('route', perf_counter() - started, cache_hits=1)
+            return result
+        
+        if transfer_penalty is not None:
+            result = self.transfer_aware_route(start, end, criteria, transfer_penalty)
+        else:
+            precomputed = self.route_table
+            if precomputed is None and self.hierarchy is not None and criteria in self.hierarchy.criteria:
+                precomputed = self.hierarchy
+            if precomputed is not None:
+                # Precomputed routes stay optimal after slow-downs unless they use a slowed edge
+                result = precomputed.route(start, end, criteria, avoid=self._stale_edges)
+                if result is STALE_ROUTE:
+                    result = self.dijkstra(start, end, criteria)
+            else:
+                result = self.dijkstra(start, end, criteria)
+        elapsed = perf_counter() - started
+        self.route_cache.put(start, end, criteria, options, result, elapsed)
+        if self.profiler is not None:
+            self.profiler.add('route', elapsed, cache_misses=1)
+        return result
+    
+    def _station_index(self):
+        if self.station_index is None:
+            self.station_index = StationIndex(self.stations)
+        return self.station_index
+    
+    def search_stations(self, query, limit=10):
+        """Station names matching a partial or misspelled ``query``, best first."""
+        return self._station_index().search(query, limit)
+    
+    def resolve_station(self, query):
+        """The station ``query`` unambiguously refers to, or None."""
+        return self._station_index().resolve(query)
+    
+    def _spatial_index(self):
+        if self.spatial_index is None:
+            self.spatial_index = SpatialIndex(self.station_coords)
+        return self.spatial_index
+    
+    def nearest_stations(self, lat, lon, k=1, max_km=None):
+        """Up to ``k`` ``(distance_km, station)`` pairs nearest to a point, closest first."""
+        return self._spatial_index().nearest(lat, lon, k, max_km)
+    
+    def stations_within(self, lat, lon, radius_km):
+        """Every ``(distance_km, station)`` within ``radius_km`` of a point, closest first."""
+        return self._spatial_index().within(lat, lon, radius_km)
+    
+    def route_from_coordinates(self, origin, destination, criteria='time', max_walk_km=2.0, transfer_penalty=None):
+        """Route between two ``(lat, lon)`` points via their nearest stations.
+        
+        Returns the route result extended with ``origin_station``,
+        ``destination_station`` and the straight-line ``walk_km`` at each end,
+        or None if either point has no station within ``max_walk_km`` or the
+        stations are not connected.
+        """
+        ends = []
+        for lat, lon in (origin, destination):
+            nearest = self.nearest_stations(lat, lon, 1, max_walk_km)
+            if not nearest:
+                return None
+            ends.append(nearest[0])
+        (origin_km, start), (destination_km, end) = ends
+        
+        result = self.route(start, end, criteria, transfer_penalty)
+        if result is None:
+            return None
+        # Copy: the route cache hands out shared result dicts
+        return dict(result, origin_station=start, destination_station=end, walk_km=(origin_km, destination_km))
+    
+    def load_frequencies(self, file_path=None, transfer_walk=TRANSFER_WALK_MIN):
+        """Load per-line service frequencies for route_at (default: ``frequencies_csv``).
+        
+        ``transfer_walk`` is the minutes needed to change trains at an
+        interchange, on top of waiting for the next departure.
+        """
+        if file_path is not None:
+            self.frequencies_csv = file_path
+        self.frequencies = read_frequencies(self.frequencies_csv)
+        self.transfer_walk = transfer_walk
+        self._timetable = None
+    
+    def timetable(self):
+        """The day's Timetable for the current network, built on first use."""
+        if self._timetable is None:
+            if self.frequencies is None:
+                self.load_frequencies()
+            started = perf_counter()
+            self._timetable = Timetable(self, self.frequencies, self.transfer_walk)
+            if self.profiler is not None:
+                self.profiler.add('timetable', perf_counter() - started, trips=len(self._timetable.trip_lines),
+                                  connections=len(self._timetable))
+        return self._timetable
+    
+    def route_at(self, start, end, departure):
+        """Earliest arrival leaving ``start`` at ``departure`` ('HH:MM' or minutes after midnight).
+        
+        Unlike the static searches this waits for actual departures and
+        walks between platforms when changing lines, so ``total_time`` runs
+        from ``departure`` to arrival. See Timetable.route for the result.
+        """
+        return self.timetable().route(start, end, departure)
+    
+    def no_route_message(self, start, end, departure=None):
+        """Why route (or route_at, given ``departure``) found nothing between two stations."""
+        if departure is not None and self.timetable().serves(start, end):
+            return f"No further service today from {start} to {end} after {format_clock(parse_clock(departure))}."
+        when = f" leaving {format_clock(parse_clock(departure))}" if departure is not None else ""
+        return f"No route found from {start} to {end}{when}."
+    
+    def cache_stats(self):
+        """Route cache counters (hits, misses, evictions, time saved) for monitoring."""
+        return self.route_cache.stats()
     
     def dijkstra(self, start, end, criteria='time'):
-        if criteria == 'time':
-            weight_index = 1
-        elif criteria == 'distance':
-            weight_index = 2
-        elif criteria == 'cost':
-            weight_index = 3
+        compiled = self._compiled()
+        compiled.weights(criteria)  # validate criteria before anything else
+        
+        source = compiled.index.get(start)
+        target = compiled.index.get(end)
+        if source is None or target is None:
+            return self._unroutable(start, end)
+        
+        tree = self._search(compiled, source, criteria, target)
+        return self._route_from_tree(compiled, tree, target)
+    
+    def transfer_aware_route(self, start, end, criteria='time', transfer_penalty=5):
+        """Find the route minimizing ``criteria`` plus ``transfer_penalty`` per line change.
+        
+        The search state is (station, line), so a line change is charged when
+        it happens instead of being counted after the route is fixed. The
+        penalty is in the units of ``criteria`` (minutes, km or rupees).
+        """
+        transfer_penalty = parse_transfer_penalty(transfer_penalty)
+        compiled = self._compiled()
+        weights = compiled.weights(criteria)
+        
+        source = compiled.index.get(start)
+        target = compiled.index.get(end)
+        if source is None or target is None:
+            return self._unroutable(start, end)
+        
+        offsets, targets, edge_lines = compiled.offsets, compiled.targets, compiled.lines
+        # State ids pack (station, line + 1); line slot 0 means "not boarded yet"
+        width = len(compiled.line_names) + 1
+        start_state = source * width
+        dist = {start_state: 0}
+        pred = {}  # state -> (previous state, edge)
+        settled = set()
+        
+        heap = [(0, start_state)]
+        while heap:
+            total_weight, state = heapq.heappop(heap)
+            if state in settled:
+                continue
+            settled.add(state)
+            current, line = divmod(state, width)
+            if current == target:
+                break
+            for edge in range(offsets[current], offsets[current + 1]):
+                edge_line = edge_lines[edge] + 1
+                new_weight = total_weight + weights[edge]
+                if line and edge_line != line:
+                    new_weight += transfer_penalty
+                next_state = targets[edge] * width + edge_line
+                if new_weight < dist.get(next_state, INF):
+                    dist[next_state] = new_weight
+                    pred[next_state] = (state, edge)
+                    heapq.heappush(heap, (new_weight, next_state))
         else:
-            raise ValueError("Invalid criteria.")
+            return None
+        
+        edges = []
+        while state != start_state:
+            state, edge = pred[state]
+            edges.append(edge)
+        edges.reverse()
+        return self._route_from_edges(compiled, source, edges)
+    
+    def pareto_routes(self, start, end, max_transfers=None):
+        """Return every Pareto-optimal route over (time, cost, transfers).
+        
+        Round-based (RAPTOR-style) search: round ``k`` rides one more line
+        from the stations improved in round ``k - 1``, so its labels use
+        ``k - 1`` transfers. A (time, cost) label is kept only if no label from
+        an earlier round, the same ride or the target dominates it. Rounds run
+        until no station improves; ``max_transfers`` stops earlier, dropping
+        routes that need more transfers. Routes are sorted by transfers, then
+        time.
+        """
+        compiled = self._compiled()
+        source = compiled.index.get(start)
+        target = compiled.index.get(end)
+        if source is None or target is None:
+            route = self._unroutable(start, end)
+            return [route] if route else []
+        
+        offsets, targets, edge_lines = compiled.offsets, compiled.targets, compiled.lines
+        times, costs = compiled.times, compiled.costs
+        
+        # Labels are (time, cost, station, edge, parent label)
+        root = (0, 0, source, -1, None)
+        bags = defaultdict(list)  # station -> labels kept from all rounds
+        bags[source].append(root)
+        marked = {source: [root]}
+        
+        rounds = itertools.count() if max_transfers is None else range(max_transfers + 1)
+        for _ in rounds:
+            boarding = defaultdict(list)  # line -> labels boarding it this round
+            for station, labels in marked.items():
+                for line in {edge_lines[edge] for edge in range(offsets[station], offsets[station + 1])}:
+                    boarding[line].extend(labels)
+            
+            round_labels = defaultdict(list)
+            target_labels = list(bags[target])
+            for line, labels in boarding.items():
+                ride = defaultdict(list)
+                queue = deque(labels)
+                while queue:
+                    label = queue.popleft()
+                    time, cost, station = label[0], label[1], label[2]
+                    for edge in range(offsets[station], offsets[station + 1]):
+                        if edge_lines[edge] != line:
+                            continue
+                        neighbor = targets[edge]
+                        new_time = time + times[edge]
+                        new_cost = cost + costs[edge]
+                        if (new_time == INF
+                                or _dominated(new_time, new_cost, bags[neighbor])
+                                or _dominated(new_time, new_cost, ride[neighbor])
+                                or _dominated(new_time, new_cost, target_labels)):
+                            continue
+                        new_label = (new_time, new_cost, neighbor, edge, label)
+                        ride[neighbor] = [kept for kept in ride[neighbor]
+                                          if not (new_time <= kept[0] + EPS and new_cost <= kept[1] + EPS)]
+                        ride[neighbor].append(new_label)
+                        if neighbor == target:
+                            target_labels.append(new_label)
+                        queue.append(new_label)
+                for station, labels in ride.items():
+                    round_labels[station].extend(labels)
+            
+            marked = {}
+            for station, labels in round_labels.items():
+                for label in sorted(labels, key=lambda label: (label[0], label[1])):
+                    if not _dominated(label[0], label[1], bags[station]):
+                        bags[station].append(label)
+                        marked.setdefault(station, []).append(label)
+            if not marked:
+                break
+        
+        routes = []
+        for label in bags[target]:
+            edges = []
+            while label[3] != -1:
+                edges.append(label[3])
+                label = label[4]
+            edges.reverse()
+            routes.append(self._route_from_edges(compiled, source, edges))
+        routes.sort(key=lambda route: (route['transfers'], route['total_time'], route['total_cost']))
+        return routes
+    
+    def astar(self, start, end, criteria='time'):
+        """Goal-directed search guided by straight-line distance to ``end``.
+        
+        The heuristic is ``scale * haversine(station, end)`` with the scale fitted
+        by astar_calibration, which keeps it admissible whatever the quality
+        of the coordinates. Falls back to dijkstra when it is unusable (missing
+        coordinates or no usable scale). Returns the same format as dijkstra.
+        """
+        compiled = self._compiled()
+        compiled.weights(criteria)
+        source = compiled.index.get(start)
+        target = compiled.index.get(end)
+        if source is None or target is None:
+            return self._unroutable(start, end)
+        
+        calibration = self.astar_calibration(criteria)
+        if not calibration['usable']:
+            return self.dijkstra(start, end, criteria)
+        tree = self._astar_search(compiled, source, target, criteria, calibration)
+        return self._route_from_tree(compiled, tree, target)
+    
+    def astar_calibration(self, criteria='time'):
+        """Fit and sanity-check the A* heuristic scale for ``criteria``.
+        
+        A heuristic ``h(v) = scale * straight_line_km(v, target)`` is consistent
+        (and so admissible) iff ``scale * straight_line_km(u, v) <= weight(u, v)``
+        for every edge, so the scale is the minimum weight per straight-line km
+        over all edges. For distance the physical scale is 1 (track is never
+        shorter than the straight line); edges below that expose bad
+        coordinates. For time the scale is 60 / the fastest implied km/h.
         
-        heap = []
-        heapq.heappush(heap, (0, start, [], []))
-        visited = set()
+        Returns a dict with ``usable``, ``scale``, ``reason``, ``violations``
+        (distance edges shorter than their straight line), ``implied_max_kmh``
+        (time only) and ``duplicate_coords`` (stations sharing a coordinate).
+        """
+        if criteria in self._astar_calibration:
+            return self._astar_calibration[criteria]
+        compiled = self._compiled()
+        weights = compiled.weights(criteria)
+        
+        report = {'criteria': criteria, 'usable': False, 'scale': 0.0, 'reason': '', 'violations': 0,
+                  'implied_max_kmh': None, 'duplicate_coords': 0}
+        coords = [self.station_coords.get(name) for name in compiled.names]
+        missing = [name for name, coord in zip(compiled.names, coords)
+                   if name in self.graph and (coord is None or any(math.isnan(c) for c in coord))]
+        if missing:
+            report['reason'] = f"{len(missing)} stations have no coordinates (e.g. {missing[0]})"
+            self._astar_calibration[criteria] = report
+            return report
+        
+        seen = defaultdict(int)
+        for name, coord in zip(compiled.names, coords):
+            if name in self.graph:
+                seen[coord] += 1
+        report['duplicate_coords'] = sum(count for count in seen.values() if count > 1)
+        
+        scale = INF
+        for edge in range(len(compiled.targets)):
+            weight = weights[edge]
+            if weight == INF:
+                continue
+            a, b = coords[compiled.sources[edge]], coords[compiled.targets[edge]]
+            straight = haversine_km(a[0], a[1], b[0], b[1])
+            if straight > 0:
+                scale = min(scale, weight / straight)
+                if criteria == 'distance' and weight < straight - EPS:
+                    report['violations'] += 1
         
+        if scale == INF:
+            report['reason'] = "no segment spans a positive straight-line distance"
+        elif scale <= 0:
+            report['reason'] = f"a segment with zero {criteria} spans a positive straight-line distance"
+        else:
+            report['usable'] = True
+            report['scale'] = scale
+            if criteria == 'time':
+                report['implied_max_kmh'] = 60 / scale
+            if criteria == 'distance' and report['violations']:
+                report['reason'] = (f"{report['violations']} segments are shorter than the straight line "
+                                    f"between their coordinates; heuristic scaled down to {scale:.3f}")
+        self._astar_calibration[criteria] = report
+        return report
+    
+    def _astar_search(self, compiled, source, target, criteria, calibration):
+        """A* counterpart of _search; heap entries are (estimate, weight, node)."""
+        profiler = self.profiler
+        started = perf_counter() if profiler is not None else 0
+        weights = compiled.weights(criteria)
+        offsets, targets = compiled.offsets, compiled.targets
+        heappush, heappop = heapq.heappush, heapq.heappop
+        
+        scale = calibration['scale']
+        target_lat, target_lon = self.station_coords[compiled.names[target]]
+        names, coords = compiled.names, self.station_coords
+        estimates = {}
+        
+        n = len(compiled)
+        dist = [INF] * n
+        pred_node = [-1] * n
+        pred_edge = [-1] * n
+        order = []
+        stale = 0
+        
+        dist[source] = 0
+        heap = [(0, 0, source)]
         while heap:
-            total_weight, current, path, lines = heapq.heappop(heap)
-            if current in visited:
+            _, total_weight, current = heappop(heap)
+            if total_weight > dist[current]:
+                stale += 1
                 continue
-            visited.add(current)
-            path = path + [current]
-            if current == end:
-                return {
-                    'path': path,
-                    'total_time': sum(step[2] for step in self._get_steps(path)),
-                    'total_distance': sum(step[3] for step in self._get_steps(path)),
-                    'total_cost': sum(step[4] for step in self._get_steps(path)),
-                    'lines': lines,
-                    'transfers': self._count_transfers(lines)
-                }
-            for neighbor, time, distance, cost, line in self.graph.get(current, []):
-                if neighbor not in visited:
-                    new_lines = lines + [line] if not lines else (lines if lines[-1] == line else lines + [line])
-                    weight = time if criteria == 'time' else distance if criteria == 'distance' else cost
-                    heapq.heappush(heap, (total_weight + weight, neighbor, path, new_lines))
+            order.append(current)
+            if current == target:
+                break
+            for edge in range(offsets[current], offsets[current + 1]):
+                neighbor = targets[edge]
+                new_weight = total_weight + weights[edge]
+                if new_weight < dist[neighbor]:
+                    dist[neighbor] = new_weight
+                    pred_node[neighbor] = current
+                    pred_edge[neighbor] = edge
+                    estimate = estimates.get(neighbor)
+                    if estimate is None:
+                        lat, lon = coords[names[neighbor]]
+                        estimate = estimates[neighbor] = scale * haversine_km(lat, lon, target_lat, target_lon)
+                    heappush(heap, (new_weight + estimate, new_weight, neighbor))
+        
+        if profiler is not None:
+            profiler.add('astar', perf_counter() - started, nodes_expanded=len(order),
+                         heap_pushes=len(order) + stale + len(heap), stale_pops=stale, estimates=len(estimates))
+        return SearchTree(source, dist, pred_node, pred_edge, order)
+    
+    def _unroutable(self, start, end):
+        """Result for endpoints missing from the graph: a trivial route if they coincide."""
+        if start == end:
+            return {'path': [start], 'total_time': 0, 'total_distance': 0, 'total_cost': 0,
+                    'lines': [], 'transfers': 0, 'steps': []}
         return None
     
-    def _get_steps(self, path):
+    def _search(self, compiled, source, criteria, target=None):
+        """Run Dijkstra over the compiled graph from ``source``.
+        
+        Each reached station records only its predecessor node and edge, so
+        heap entries stay ``(weight, node)`` pairs. The search stops as soon
+        as ``target`` is settled; with no target it builds the full tree.
+        A ``target`` search works in this thread's reusable arrays (see
+        _point_arrays), so its tree is only valid until the thread's next one.
+        """
+        profiler = self.profiler
+        started = perf_counter() if profiler is not None else 0
+        weights = compiled.weights(criteria)
+        offsets, targets = compiled.offsets, compiled.targets
+        
+        heappush, heappop = heapq.heappush, heapq.heappop
+        
+        n = len(compiled)
+        if target is None:
+            dist = [INF] * n
+            pred_node = [-1] * n
+            pred_edge = [-1] * n
+        else:
+            dist, pred_node, pred_edge = _point_arrays(n)
+        order = []
+        stale = 0
+        
+        dist[source] = 0
+        heap = [(0, source)]
+        if target is not None:
+            _point_search.settled, _point_search.queued = order, heap  # filled in place; reset by the next search
+        while heap:
+            total_weight, current = heappop(heap)
+            if total_weight > dist[current]:
+                stale += 1
+                continue  # stale entry, the station was settled with a lower weight
+            order.append(current)
+            if current == target:
+                break
+            for edge in range(offsets[current], offsets[current + 1]):
+                neighbor = targets[edge]
+                new_weight = total_weight + weights[edge]
+                if new_weight < dist[neighbor]:
+                    dist[neighbor] = new_weight
+                    pred_node[neighbor] = current
+                    pred_edge[neighbor] = edge
+                    heappush(heap, (new_weight, neighbor))
+        
+        if profiler is not None:
+            # Every push was popped (settled or stale) or is still on the heap
+            profiler.add('search' if target is not None else 'search_tree', perf_counter() - started,
+                         nodes_expanded=len(order), heap_pushes=len(order) + stale + len(heap), stale_pops=stale)
+        return SearchTree(source, dist, pred_node, pred_edge, order)
+    
+    def _route_from_tree(self, compiled, tree, target):
+        """Reconstruct the route to ``target`` from a search tree, or None if unreached."""
+        if target != tree.source and tree.pred_edge[target] == -1:
+            return None
+        edges = []
+        node = target
+        while node != tree.source:
+            edges.append(tree.pred_edge[node])
+            node = tree.pred_node[node]
+        edges.reverse()
+        return self._route_from_edges(compiled, tree.source, edges)
+    
+    def _route_from_edges(self, compiled, source, edges):
+        """Build a route result from a start station id and the edge ids taken.
+        
+        Totals, the line sequence and the per-segment ``steps``
+        ``(from, to, time, distance, cost, line)`` are accumulated in this
+        single pass over the route's edges, so the directions always add up
+        to the totals and no neighbor lists are scanned.
+        """
+        started = perf_counter() if self.profiler is not None else 0
+        names, targets, line_names, edge_lines = compiled.names, compiled.targets, compiled.line_names, compiled.lines
+        path = [names[source]]
+        lines = []
         steps = []
-        for i in range(len(path)-1):
-            from_station = path[i]
-            to_station = path[i+1]
-            for neighbor, time, distance, cost, line in self.graph[from_station]:
-                if neighbor == to_station:
-                    steps.append((from_station, to_station, time, distance, cost, line))
-                    break
-        return steps
+        total_time = total_distance = total_cost = 0
+        for edge in edges:
+            time, distance, cost = compiled.times[edge], compiled.distances[edge], compiled.costs[edge]
+            line = line_names[edge_lines[edge]]
+            steps.append((path[-1], names[targets[edge]], time, distance, cost, line))
+            path.append(names[targets[edge]])
+            total_time += time
+            total_distance += distance
+            total_cost += cost
+            if not lines or lines[-1] != line:
+                lines.append(line)
+        if self.profiler is not None:
+            self.profiler.add('reconstruct', perf_counter() - started, edges=len(edges))
+        return {
+            'path': path,
+            'total_time': total_time,
+            'total_distance': total_distance,
+            'total_cost': total_cost,
+            'lines': lines,
+            'transfers': self._count_transfers(lines),
+            'steps': steps,
+        }
     
     def _count_transfers(self, lines):
         if not lines:
@@ -141,8 +935,304 @@ class MetroGraph:
                 current_line = line
         return transfers
     
-    def generate_route_map(self, route):
-        """Generate a folium map showing the route with colored lines."""
+    # Live updates: closures, removals and weight changes applied in place
+    
+    def disable_edge(self, from_station, to_station, line=None):
+        """Close the segment between two stations (one line, or every line if None)."""
+        edges = self._matching_edges(from_station, to_station, line)
+        self.disabled_edges.add(self._segment_key(from_station, to_station, line))
+        self._refresh_edges(edges)
+    
+    def enable_edge(self, from_station, to_station, line=None):
+        """Reopen a segment closed with disable_edge."""
+        edges = self._matching_edges(from_station, to_station, line)
+        self.disabled_edges.discard(self._segment_key(from_station, to_station, line))
+        self._refresh_edges(edges)
+    
+    def disable_station(self, station):
+        """Close a station: routes can neither start, end nor pass through it."""
+        edges = self._station_edges(station)
+        self.disabled_stations.add(station)
+        self._refresh_edges(edges)
+    
+    def enable_station(self, station):
+        edges = self._station_edges(station)
+        self.disabled_stations.discard(station)
+        self._refresh_edges(edges)
+    
+    def update_edge(self, from_station, to_station, line=None, time=None, distance=None, cost=None):
+        """Change the weights of a segment in both directions; None keeps a weight."""
+        for name, value in (('time', time), ('distance', distance), ('cost', cost)):
+            if value is not None:
+                _check_weight(name, value)
+        edges = self._matching_edges(from_station, to_station, line)
+        line = line.strip().title() if line is not None else None
+        for a, b in ((from_station, to_station), (to_station, from_station)):
+            self.graph[a] = [
+                (edge[0],
+                 edge[1] if time is None else time,
+                 edge[2] if distance is None else distance,
+                 edge[3] if cost is None else cost,
+                 edge[4]) if self._edge_matches(edge, b, line) else edge
+                for edge in self.graph[a]
+            ]
+        changes = {}
+        for edge in edges:
+            live_time, live_distance, live_cost = self._live_weights(edge)
+            changes[edge] = (live_time if time is None else time,
+                             live_distance if distance is None else distance,
+                             live_cost if cost is None else cost)
+        self._set_weights(changes)
+    
+    def delay_line(self, line, minutes=0, factor=1.0):
+        """Scale and/or extend the travel time of every segment on a line."""
+        line = line.strip().title()
+        compiled = self._compiled()
+        if line not in compiled.line_names:
+            raise ValueError(f"Unknown line: {line}")
+        line_id = compiled.line_names.index(line)
+        _check_weight('delay factor', factor)
+        changes = {}
+        for edge in range(len(compiled.targets)):
+            if compiled.lines[edge] == line_id and edge not in self._removed_edges:
+                time, distance, cost = self._live_weights(edge)
+                changes[edge] = (_check_weight('time', time * factor + minutes), distance, cost)
+        for station, edges in self.graph.items():
+            self.graph[station] = [
+                (neighbor, time * factor + minutes, distance, cost, edge_line) if edge_line == line
+                else (neighbor, time, distance, cost, edge_line)
+                for neighbor, time, distance, cost, edge_line in edges
+            ]
+        self._set_weights(changes)
+    
+    def remove_edge(self, from_station, to_station, line=None):
+        """Permanently remove a segment, keeping line_edges and line_stations in step."""
+        edges = self._matching_edges(from_station, to_station, line)
+        compiled = self.compiled
+        removed_lines = {compiled.line_names[compiled.lines[edge]] for edge in edges}
+        line = line.strip().title() if line is not None else None
+        for a, b in ((from_station, to_station), (to_station, from_station)):
+            self.graph[a] = [edge for edge in self.graph[a] if not self._edge_matches(edge, b, line)]
+        
+        for removed_line in removed_lines:
+            self.line_edges[removed_line].discard((from_station, to_station))
+            self.line_edges[removed_line].discard((to_station, from_station))
+            if not self.line_edges[removed_line]:
+                del self.line_edges[removed_line]
+            for station in (from_station, to_station):
+                if not any(edge[4] == removed_line for edge in self.graph[station]):
+                    self.line_stations[removed_line].discard(station)
+            if not self.line_stations[removed_line]:
+                del self.line_stations[removed_line]
+        
+        self.disabled_edges.discard(self._segment_key(from_station, to_station, line))
+        self._removed_edges.update(edges)
+        self._refresh_edges(edges)
+    
+    def remove_station(self, station):
+        """Permanently remove a station, its segments and its coordinates."""
+        if station not in self.graph:
+            raise ValueError(f"Unknown station: {station}")
+        for neighbor in {edge[0] for edge in self.graph[station]}:
+            self.remove_edge(station, neighbor)
+        del self.graph[station]
+        self.stations.discard(station)
+        self.station_coords.pop(station, None)
+        self.disabled_stations.discard(station)
+        self.station_index = None
+        self.spatial_index = None
+    
+    @staticmethod
+    def _segment_key(from_station, to_station, line):
+        line = line.strip().title() if line is not None else None
+        return (min(from_station, to_station), max(from_station, to_station), line)
+    
+    @staticmethod
+    def _edge_matches(edge, neighbor, line):
+        return edge[0] == neighbor and (line is None or edge[4] == line)
+    
+    def _matching_edges(self, from_station, to_station, line=None):
+        """Compiled ids of the (live) edges between two stations, in both directions."""
+        compiled = self._compiled()
+        index = compiled.index
+        line = line.strip().title() if line is not None else None
+        edges = []
+        if from_station in index and to_station in index:
+            for a, b in ((index[from_station], index[to_station]), (index[to_station], index[from_station])):
+                for edge in range(compiled.offsets[a], compiled.offsets[a + 1]):
+                    if (compiled.targets[edge] == b and edge not in self._removed_edges
+                            and (line is None or compiled.line_names[compiled.lines[edge]] == line)):
+                        edges.append(edge)
+        if not edges:
+            raise ValueError(f"No segment between {from_station} and {to_station}"
+                             + (f" on the {line} line" if line else ""))
+        return edges
+    
+    def _station_edges(self, station):
+        compiled = self._compiled()
+        if station not in compiled.index:
+            raise ValueError(f"Unknown station: {station}")
+        node = compiled.index[station]
+        outgoing = range(compiled.offsets[node], compiled.offsets[node + 1])
+        # Incoming edges are the reverse twins, found from each neighbor's side
+        incoming = [edge for neighbor in {compiled.targets[e] for e in outgoing}
+                    for edge in range(compiled.offsets[neighbor], compiled.offsets[neighbor + 1])
+                    if compiled.targets[edge] == node]
+        return list(outgoing) + incoming
+    
+    def _is_closed(self, edge):
+        compiled = self.compiled
+        if edge in self._removed_edges:
+            return True
+        a = compiled.names[compiled.sources[edge]]
+        b = compiled.names[compiled.targets[edge]]
+        if a in self.disabled_stations or b in self.disabled_stations:
+            return True
+        line = compiled.line_names[compiled.lines[edge]]
+        return (self._segment_key(a, b, None) in self.disabled_edges
+                or self._segment_key(a, b, line) in self.disabled_edges)
+    
+    def _live_weights(self, edge):
+        """Current (time, distance, cost) of an edge, including closed ones."""
+        if edge in self._closed_weights:
+            return self._closed_weights[edge]
+        compiled = self.compiled
+        return compiled.times[edge], compiled.distances[edge], compiled.costs[edge]
+    
+    def _refresh_edges(self, edges):
+        """Close or reopen compiled edges to match the disabled/removed state.
+        
+        Closed edges get infinite weights, so every search skips them without
+        any extra check in its inner loop; their live weights are kept aside.
+        """
+        compiled = self.compiled
+        closed, reopened = [], []
+        for edge in edges:
+            if self._is_closed(edge):
+                if edge not in self._closed_weights:
+                    self._closed_weights[edge] = self._live_weights(edge)
+                    compiled.times[edge] = compiled.distances[edge] = compiled.costs[edge] = INF
+                    closed.append(edge)
+            elif edge in self._closed_weights:
+                compiled.times[edge], compiled.distances[edge], compiled.costs[edge] = self._closed_weights.pop(edge)
+                reopened.append(edge)
+        self._weights_changed(closed, reopened)
+    
+    def _set_weights(self, changes):
+        """Apply ``{edge: (time, distance, cost)}`` to the compiled arrays (or closed-edge store)."""
+        compiled = self.compiled
+        slower, faster = [], []
+        for edge, weights in changes.items():
+            old = self._live_weights(edge)
+            if edge in self._closed_weights:
+                self._closed_weights[edge] = weights
+                continue
+            compiled.times[edge], compiled.distances[edge], compiled.costs[edge] = weights
+            if any(new < before for new, before in zip(weights, old)):
+                faster.append(edge)
+            elif weights != old:
+                slower.append(edge)
+        self._weights_changed(slower, faster)
+    
+    def _weights_changed(self, slower, faster):
+        """Bring the route cache and table up to date after edge weights changed.
+        
+        Slower edges only invalidate the cached routes that use them and mark
+        them stale for the route table and hierarchy, whose other routes
+        remain optimal. A faster edge can improve any route, so the cache is
+        cleared and both are detached. The timetable's trips are rebuilt on next use either way.
+        """
+        if slower or faster:
+            self._timetable = None
+        if faster:
+            self.route_cache.clear()
+            self.route_table = None
+            self.hierarchy = None
+            self._astar_calibration = {}  # a cheaper edge can lower the admissible scale
+        elif slower:
+            compiled = self.compiled
+            segments = {frozenset((compiled.names[compiled.sources[edge]], compiled.names[compiled.targets[edge]]))
+                        for edge in slower}
+            self.route_cache.discard_routes_through(segments)
+            if self.route_table is not None or self.hierarchy is not None:
+                self._stale_edges.update(slower)
+    
+    def network_hash(self):
+        """Hex SHA-256 of everything drawn on the maps: line segments and station coordinates."""
+        digest = hashlib.sha256()
+        for line in sorted(self.line_edges):
+            digest.update(f"L{line}\n".encode('utf-8'))
+            for from_station, to_station in sorted(self.line_edges[line]):
+                digest.update(f"{from_station}\t{to_station}\n".encode('utf-8'))
+        for station in sorted(self.station_coords):
+            lat, lon = self.station_coords[station]
+            digest.update(f"S{station}\t{lat!r}\t{lon!r}\n".encode('utf-8'))
+        return digest.hexdigest()
+    
+    def map_layers(self, cache_dir=CACHE_DIR):
+        """GeoJSON base layers shared by every map, cached on disk by network_hash.
+        
+        Returns ``{'stations': FeatureCollection, 'lines': FeatureCollection}``
+        where each line is a single MultiLineString feature instead of one
+        polyline per segment.
+        """
+        network_hash = self.network_hash()
+        if self._map_layers is not None and self._map_layers[0] == network_hash:
+            return self._map_layers[1]
+        
+        path = os.path.join(cache_dir, f"map_layers_{network_hash[:16]}.json")
+        try:
+            with open(path, encoding='utf-8') as f:
+                layers = json.load(f)
+        except (FileNotFoundError, ValueError):
+            layers = self._build_map_layers()
+            os.makedirs(cache_dir, exist_ok=True)
+            _remove_stale(cache_dir, 'map_layers_*.json', keep=path)
+            with _atomic_write(path, encoding='utf-8') as f:
+                json.dump(layers, f, ensure_ascii=False, separators=(',', ':'))
+        
+        self._map_layers = (network_hash, layers)
+        return layers
+    
+    def _build_map_layers(self):
+        # GeoJSON positions are [lon, lat]
+        stations = [
+            {'type': 'Feature', 'properties': {'name': station},
+             'geometry': {'type': 'Point', 'coordinates': [lon, lat]}}
+            for station, (lat, lon) in sorted(self.station_coords.items())
+        ]
+        lines = []
+        for line in sorted(self.line_edges):
+            segments = []
+            for st1, st2 in sorted(self.line_edges[line]):
+                coord1 = self.station_coords.get(st1)
+                coord2 = self.station_coords.get(st2)
+                if coord1 and coord2:
+                    segments.append([[coord1[1], coord1[0]], [coord2[1], coord2[0]]])
+            if segments:
+                lines.append({'type': 'Feature',
+                              'properties': {'line': f"{line} Line", 'color': LINE_COLORS.get(line, '#000000')},
+                              'geometry': {'type': 'MultiLineString', 'coordinates': segments}})
+        return {
+            'stations': {'type': 'FeatureCollection', 'features': stations},
+            'lines': {'type': 'FeatureCollection', 'features': lines},
+        }
+    
+    def _add_station_layer(self, m, layers):
+        import folium
+        
+        folium.GeoJson(
+            layers['stations'],
+            name='Stations',
+            marker=folium.CircleMarker(radius=3, color='black', fill=True, fill_color='white',
+                                       fill_opacity=1, weight=1),
+            popup=folium.GeoJsonPopup(fields=['name'], labels=False),
+        ).add_to(m)
+    
+    def generate_route_map(self, route, cache_dir=CACHE_DIR):
+        """Generate a folium map showing the route with colored lines over the cached station layer."""
+        import folium
+        
         if not route or 'path' not in route or len(route['path']) < 2:
             return None
         
@@ -155,60 +1245,51 @@ class MetroGraph:
         avg_lon = sum(coord[1] for coord in route_coords) / len(route_coords)
         
         m = folium.Map(location=[avg_lat, avg_lon], zoom_start=13, tiles='CartoDB positron')
+        self._add_station_layer(m, self.map_layers(cache_dir))
         
-        # Plot all stations as small markers
-        for station, coord in self.station_coords.items():
-            folium.CircleMarker(
-                location=coord,
-                radius=3,
-                popup=station,
-                color='black',
-                fill=True,
-                fill_color='white',
-                fill_opacity=1,
-                weight=1
-            ).add_to(m)
-        
-        # Plot the route with colored lines
-        steps = self._get_steps(route['path'])
-        for step in steps:
-            from_station, to_station, time, distance, cost, line = step
+        # Plot the route, one polyline per run of consecutive steps on the same line
+        runs = []
+        for from_station, to_station, time, distance, cost, line in route['steps']:
             coord1 = self.station_coords.get(from_station)
             coord2 = self.station_coords.get(to_station)
+            if not (coord1 and coord2):
+                continue
+            if runs and runs[-1][0] == line and runs[-1][1][-1] == from_station:
+                runs[-1][1].append(to_station)
+            else:
+                runs.append((line, [from_station, to_station]))
+        
+        for line, stations in runs:
+            line_color = LINE_COLORS.get(line, '#000000')
+            folium.PolyLine(
+                locations=[self.station_coords[station] for station in stations],
+                color=line_color,
+                weight=6,
+                opacity=0.9,
+                tooltip=f"{line} Line: {stations[0]} to {stations[-1]}",
+                line_cap='round',
+                line_join='round'
+            ).add_to(m)
             
-            if coord1 and coord2:
-                # Get line color or generate a random one if not defined
-                line_color = LINE_COLORS.get(line, '#000000')
-                
-                folium.PolyLine(
-                    locations=[coord1, coord2],
+            # Highlight stations on the route
+            for station in stations:
+                folium.CircleMarker(
+                    location=self.station_coords[station],
+                    radius=5,
+                    popup=f"{station} ({line} Line)",
                     color=line_color,
-                    weight=6,
-                    opacity=0.9,
-                    tooltip=f"{line} Line: {from_station} to {to_station}",
-                    line_cap='round',
-                    line_join='round'
+                    fill=True,
+                    fill_color=line_color,
+                    fill_opacity=1,
+                    weight=2
                 ).add_to(m)
-                
-                # Highlight stations on the route
-                for station in [from_station, to_station]:
-                    coord = self.station_coords.get(station)
-                    if coord:
-                        folium.CircleMarker(
-                            location=coord,
-                            radius=5,
-                            popup=f"{station} ({line} Line)",
-                            color=line_color,
-                            fill=True,
-                            fill_color=line_color,
-                            fill_opacity=1,
-                            weight=2
-                        ).add_to(m)
         
         return m
     
-    def generate_full_map(self):
+    def generate_full_map(self, cache_dir=CACHE_DIR):
         """Generate a full metro map with all stations and colored lines."""
+        import folium
+        
         if not self.station_coords:
             return None
             
@@ -220,46 +1301,49 @@ class MetroGraph:
         
         m = folium.Map(location=[center_lat, center_lon], zoom_start=12, tiles='CartoDB positron')
         
-        # Plot all stations
-        for station, coord in self.station_coords.items():
-            folium.CircleMarker(
-                location=coord,
-                radius=3,
-                popup=station,
-                color='black',
-                fill=True,
-                fill_color='white',
-                fill_opacity=1,
-                weight=1
-            ).add_to(m)
+        layers = self.map_layers(cache_dir)
+        self._add_station_layer(m, layers)
         
-        # Draw all lines with their respective colors
-        for line, edges in self.line_edges.items():
-            line_color = LINE_COLORS.get(line, '#000000')
-            
-            for edge in edges:
-                st1, st2 = edge
-                coord1 = self.station_coords.get(st1)
-                coord2 = self.station_coords.get(st2)
-                
-                if coord1 and coord2:
-                    folium.PolyLine(
-                        locations=[coord1, coord2],
-                        color=line_color,
-                        weight=4,
-                        opacity=0.8,
-                        tooltip=f"{line} Line",
-                        line_cap='round',
-                        line_join='round'
-                    ).add_to(m)
+        # Draw every line as a single multi-polyline in its color
+        folium.GeoJson(
+            layers['lines'],
+            name='Lines',
+            style_function=lambda feature: {
+                'color': feature['properties']['color'],
+                'weight': 4,
+                'opacity': 0.8,
+                'lineCap': 'round',
+                'lineJoin': 'round',
+            },
+            tooltip=folium.GeoJsonTooltip(fields=['line'], labels=False),
+        ).add_to(m)
         
         # Add legend
         self._add_legend(m)
         
         return m
     
+    def save_full_map(self, file_path, cache_dir=CACHE_DIR):
+        """Write the full map HTML to ``file_path``, re-rendering only when the network changed.
+        
+        Returns ``file_path``, or None if there is nothing to draw.
+        """
+        cached = os.path.join(cache_dir, f"full_map_{self.network_hash()[:16]}.html")
+        if not os.path.exists(cached):
+            m = self.generate_full_map(cache_dir)
+            if m is None:
+                return None
+            os.makedirs(cache_dir, exist_ok=True)
+            _remove_stale(cache_dir, 'full_map_*.html', keep=cached)
+            with _atomic_write(cached, 'wb') as f:
+                m.save(f)
+        shutil.copyfile(cached, file_path)
+        return file_path
+    
     def _add_legend(self, m):
         """Add a legend to the map showing line colors."""
+        import folium
+        
         legend_html = '''
             <div style="position: fixed; 
                         bottom: 50px; left: 50px; width: 180px; height: auto;
@@ -283,171 +1367,158 @@ class MetroGraph:
         m.get_root().html.add_child(folium.Element(legend_html))
 
 
-class MetroRouteOptimizerApp:
-    def __init__(self, root, metro_graph):
-        self.root = root
-        self.metro_graph = metro_graph
-        self.root.title("Metro Route Optimizer")
-        
-        # Make window larger
-        self.root.geometry("800x700")
-        
-        self.setup_ui()
+def format_route(metro_graph, result, criteria_label):
+    """Render a route result as the rider-facing text used by the GUI and CLI."""
+    text = [
+        f"Optimal Route ({criteria_label}):",
+        " → ".join(result['path']),
+        "",
+        f"Total Stops: {len(result['path']) - 1}",
+        f"Total Time: {result['total_time']:g} minutes",
+        f"Total Distance: {result['total_distance']:g} km",
+        f"Total Cost: ₹{result['total_cost']:g}",
+        f"Line Transfers: {result['transfers']}",
+    ]
+    if 'legs' in result:
+        text.append(f"Depart {result['departure']}, arrive {result['arrival']} "
+                    f"({result['wait_time']:g} min waiting and changing)")
+        text += ["", "Timetable:"]
+        for leg in result['legs']:
+            text.append(f"  {leg['board']} {leg['line']} line from {leg['from']} → "
+                        f"{leg['alight']} {leg['to']} ({leg['stops']} stops)")
+    text += ["", "Step-by-step Directions:"]
+    steps = result['steps']
+    current_line = steps[0][5] if steps else None
     
-    def setup_ui(self):
-        # Create main container
-        main_frame = ttk.Frame(self.root, padding="10")
-        main_frame.pack(fill=tk.BOTH, expand=True)
-        
-        # Input frame
-        input_frame = ttk.LabelFrame(main_frame, text="Route Options", padding="10")
-        input_frame.pack(fill=tk.X, pady=5)
-        
-        ttk.Label(input_frame, text="From Station:").grid(row=0, column=0, sticky=tk.W, padx=5, pady=5)
-        self.from_station = ttk.Combobox(input_frame, values=sorted(self.metro_graph.stations))
-        self.from_station.grid(row=0, column=1, sticky=tk.EW, padx=5, pady=5)
-        
-        ttk.Label(input_frame, text="To Station:").grid(row=1, column=0, sticky=tk.W, padx=5, pady=5)
-        self.to_station = ttk.Combobox(input_frame, values=sorted(self.metro_graph.stations))
-        self.to_station.grid(row=1, column=1, sticky=tk.EW, padx=5, pady=5)
-        
-        ttk.Label(input_frame, text="Optimize By:").grid(row=2, column=0, sticky=tk.W, padx=5, pady=5)
-        self.criteria = ttk.Combobox(input_frame, values=["Shortest Path (Distance)", "Minimum Time", "Minimum Cost"])
-        self.criteria.current(0)
-        self.criteria.grid(row=2, column=1, sticky=tk.EW, padx=5, pady=5)
-        
-        button_frame = ttk.Frame(input_frame)
-        button_frame.grid(row=3, column=0, columnspan=2, pady=10)
-        
-        find_route_btn = ttk.Button(button_frame, text="Find Optimal Route", command=self.find_route)
-        find_route_btn.pack(side=tk.LEFT, padx=5)
-        
-        self.show_route_map_btn = ttk.Button(button_frame, text="Show Route on Map", command=self.show_route_map, state=tk.DISABLED)
-        self.show_route_map_btn.pack(side=tk.LEFT, padx=5)
-        
-        self.show_full_map_btn = ttk.Button(button_frame, text="Show Full Metro Map", command=self.show_full_map)
-        self.show_full_map_btn.pack(side=tk.LEFT, padx=5)
-        
-        # Results frame
-        results_frame = ttk.LabelFrame(main_frame, text="Route Details", padding="10")
-        results_frame.pack(fill=tk.BOTH, expand=True, pady=5)
-        
-        self.results_text = tk.Text(results_frame, height=15, wrap=tk.WORD)
-        self.results_text.pack(fill=tk.BOTH, expand=True)
-        
-        scrollbar = ttk.Scrollbar(results_frame, orient=tk.VERTICAL, command=self.results_text.yview)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.results_text['yscrollcommand'] = scrollbar.set
-        
-        self.current_route = None
+    for i, step in enumerate(steps, 1):
+        from_s, to_s, time, distance, cost, line = step
+        if line != current_line:
+            text.append(f"  - Transfer from {current_line} line to {line} line")
+            current_line = line
+        text.append(f"{i}. Take {line} line from {from_s} to {to_s} ({time:g} min, {distance:g} km, ₹{cost:g})")
+    return "\n".join(text) + "\n"
+
+
+@contextlib.contextmanager
+def _atomic_write(path, mode='w', **open_kwargs):
+    """Yield a uniquely named file next to ``path`` that replaces ``path`` once fully written.
     
-    def find_route(self):
-        from_station = self.from_station.get()
-        to_station = self.to_station.get()
-        criteria = self.criteria.get()
-        
-        if not from_station or not to_station:
-            messagebox.showerror("Error", "Please select both from and to stations.")
-            return
-        
-        if from_station == to_station:
-            messagebox.showerror("Error", "From and To stations cannot be the same.")
-            return
-        
-        criteria_map = {
-            "Shortest Path (Distance)": "distance",
-            "Minimum Time": "time",
-            "Minimum Cost": "cost"
-        }
-        
-        try:
-            result = self.metro_graph.dijkstra(from_station, to_station, criteria_map[criteria])
-            
-            if not result:
-                self.results_text.delete(1.0, tk.END)
-                self.results_text.insert(tk.END, f"No route found from {from_station} to {to_station}.")
-                self.show_route_map_btn.config(state=tk.DISABLED)
-                return
-            
-            self.current_route = result
-            self.results_text.delete(1.0, tk.END)
-            
-            self.results_text.insert(tk.END, f"Optimal Route ({criteria}):\n")
-            self.results_text.insert(tk.END, " → ".join(result['path']) + "\n\n")
-            
-            self.results_text.insert(tk.END, f"Total Stops: {len(result['path']) - 1}\n")
-            self.results_text.insert(tk.END, f"Total Time: {result['total_time']} minutes\n")
-            self.results_text.insert(tk.END, f"Total Distance: {result['total_distance']} km\n")
-            self.results_text.insert(tk.END, f"Total Cost: ₹{result['total_cost']}\n")
-            self.results_text.insert(tk.END, f"Line Transfers: {result['transfers']}\n\n")
-            
-            self.results_text.insert(tk.END, "Step-by-step Directions:\n")
-            steps = self.metro_graph._get_steps(result['path'])
-            current_line = steps[0][5] if steps else None
-            
-            for i, step in enumerate(steps, 1):
-                from_s, to_s, time, distance, cost, line = step
-                if line != current_line:
-                    self.results_text.insert(tk.END, f"  - Transfer from {current_line} line to {line} line\n")
-                    current_line = line
-                self.results_text.insert(tk.END, f"{i}. Take {line} line from {from_s} to {to_s} ({time} min, {distance} km, ₹{cost})\n")
-            
-            self.show_route_map_btn.config(state=tk.NORMAL)
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"An error occurred: {str(e)}")
-            self.show_route_map_btn.config(state=tk.DISABLED)
-            self.current_route = None
-    
-    def show_route_map(self):
-        if not self.current_route:
-            messagebox.showinfo("Info", "No route to show on map. Please find a route first.")
-            return
-        
-        m = self.metro_graph.generate_route_map(self.current_route)
-        if m:
-            file_path = "route_map.html"
-            m.save(file_path)
-            webbrowser.open('file://' + os.path.realpath(file_path))
-        else:
-            messagebox.showerror("Error", "Could not generate map for the route.")
-    
-    def show_full_map(self):
-        m = self.metro_graph.generate_full_map()
-        if m:
-            file_path = "full_metro_map.html"
-            m.save(file_path)
-            webbrowser.open('file://' + os.path.realpath(file_path))
-        else:
-            messagebox.showerror("Error", "Could not generate full metro map.")
+    Concurrent writers of the same cache file never share a temporary file, and
+    readers see either the old file or the complete new one.
+    """
+    f = tempfile.NamedTemporaryFile(mode, dir=os.path.dirname(path) or '.', prefix=f"{os.path.basename(path)}.",
+                                    suffix='.tmp', delete=False, **open_kwargs)
+    try:
+        with f:
+            yield f
+        os.replace(f.name, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(f.name)
+        raise
+
+
+def _remove_stale(cache_dir, pattern, keep):
+    """Delete cache files matching ``pattern`` other than ``keep``; another process may be doing the same."""
+    for stale in glob.glob(os.path.join(cache_dir, pattern)):
+        if stale != keep:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(stale)
+
+
+def network_digest(file_path, price_per_km=5):
+    """SHA-256 of the network CSV and loader settings, used to key on-disk caches."""
+    digest = hashlib.sha256(f"price_per_km={price_per_km}\n".encode('utf-8'))
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.digest()
+
+
+NUMERIC_COLUMNS = ('Time (min)', 'Distance (km)', 'Cost (INR)', 'From Lat', 'From Lon', 'To Lat', 'To Lon')
+COORD_COLUMNS = ('From Lat', 'From Lon', 'To Lat', 'To Lon')
+
+# Snapshots pickle MetroGraph fields and CompiledGraph as they are, so bump this
+# whenever either class gains, drops or changes an attribute; older files are then rebuilt
+SNAPSHOT_VERSION = 2
+SNAPSHOT_MAGIC = f'MGSNAP{SNAPSHOT_VERSION}\n'.encode('ascii')
+SNAPSHOT_FIELDS = ('graph', 'stations', 'station_coords', 'line_edges', 'line_stations', 'compiled')
+
+
+def _parse_number(value):
+    if value == '':
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+def _read_columns(file_path):
+    """Read the network CSV into a dict of column lists.
+    
+    Uses pandas' vectorized column access when pandas is already imported;
+    otherwise parses with the stdlib csv module, as importing pandas costs
+    far more than parsing the file.
+    """
+    if 'pandas' in sys.modules:
+        # Every cell as text, so both branches strip and parse the same way
+        df = sys.modules['pandas'].read_csv(file_path, dtype=str, keep_default_na=False)
+        cells = {column: df[column].str.strip().tolist() for column in df.columns}
+    else:
+        with open(file_path, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            rows = list(reader)
+        cells = {column: [row[i].strip() for row in rows] for i, column in enumerate(header)}
+    return {column: [_parse_number(value) for value in values] if column in NUMERIC_COLUMNS else values
+            for column, values in cells.items()}
 
 
-def load_metro_data(file_path, price_per_km=5):  # Set your desired price per km here
+def load_metro_data(file_path, price_per_km=5, profiler=None):  # Set your desired price per km here
     metro_graph = MetroGraph()
+    metro_graph.frequencies_csv = frequencies_path(file_path)
+    metro_graph.profiler = profiler  # also times the load phases below
     try:
-        df = pd.read_csv(file_path)
-        print(f"Loaded {len(df)} records from {file_path}")
+        started = perf_counter()
+        columns = _read_columns(file_path)
+        count = len(columns['From Station'])
+        if profiler is not None:
+            profiler.add('read_csv', perf_counter() - started, rows=count)
+        print(f"Loaded {count} records from {file_path}")
         
-        unique_lines = df['Line'].unique()
+        unique_lines = list(dict.fromkeys(columns['Line']))
         print("Lines in CSV:", unique_lines)
         
-        for _, row in df.iterrows():
+        started = perf_counter()
+        missing = [None] * count
+        rows = zip(
+            columns['From Station'],
+            columns['To Station'],
+            columns['Time (min)'],
+            columns['Distance (km)'],
+            columns['Line'],
+            *(columns.get(column, missing) for column in COORD_COLUMNS)
+        )
+        for from_station, to_station, time, distance, line, lat_from, lon_from, lat_to, lon_to in rows:
             # Calculate cost based on distance and price_per_km
-            distance = row['Distance (km)']
             cost = distance * price_per_km
             metro_graph.add_edge(
-                row['From Station'],
-                row['To Station'],
-                row['Time (min)'],
+                from_station,
+                to_station,
+                time,
                 distance,
                 cost,
-                row['Line'],
-                lat_from=row.get('From Lat'),
-                lon_from=row.get('From Lon'),
-                lat_to=row.get('To Lat'),
-                lon_to=row.get('To Lon')
+                line,
+                lat_from=lat_from,
+                lon_from=lon_from,
+                lat_to=lat_to,
+                lon_to=lon_to
             )
+        if profiler is not None:
+            profiler.add('build_graph', perf_counter() - started, edges=count)
         
+        metro_graph.compile()
         print(f"Graph contains {len(metro_graph.stations)} stations and {len(metro_graph.line_edges)} lines")
         print("Lines in graph:", metro_graph.line_edges.keys())
         
@@ -457,16 +1528,153 @@ def load_metro_data(file_path, price_per_km=5):  # Set your desired price per km
     return metro_graph
 
 
-def main():
+def save_snapshot(metro_graph, file_path, key):
+    """Write a pre-built MetroGraph (adjacency, coordinates, line indexes) to disk."""
+    metro_graph._compiled()
+    state = {field: getattr(metro_graph, field) for field in SNAPSHOT_FIELDS}
+    with _atomic_write(file_path, 'wb') as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(key)
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_snapshot(file_path, key):
+    """Load a snapshot written by save_snapshot, or return None if it is missing or stale."""
     try:
-        metro_graph = load_metro_data('metro_normalized.csv')
-        
-        root = tk.Tk()
-        app = MetroRouteOptimizerApp(root, metro_graph)
-        root.mainloop()
+        with open(file_path, 'rb') as f:
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC or f.read(len(key)) != key:
+                return None
+            state = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except (AttributeError, ImportError, EOFError, pickle.UnpicklingError):
+        return None  # written by an incompatible or interrupted run; rebuilt from the CSV
+    metro_graph = MetroGraph()
+    for field in SNAPSHOT_FIELDS:
+        setattr(metro_graph, field, state[field])
+    return metro_graph
+
+
+def load_network(file_path, key, price_per_km=5, cache_dir=CACHE_DIR):
+    """Load the network from its snapshot, parsing the CSV (and snapshotting it) only when stale.
+    
+    ``key`` is the network_digest of ``file_path`` and ``price_per_km``.
+    """
+    snapshot_path = os.path.join(cache_dir, f"network_{key.hex()[:16]}.pickle")
+    metro_graph = load_snapshot(snapshot_path, key)
+    if metro_graph is not None:
+        metro_graph.frequencies_csv = frequencies_path(file_path)
+        print(f"Loaded {len(metro_graph.stations)} stations from snapshot {snapshot_path}")
+        return metro_graph
+    
+    metro_graph = load_metro_data(file_path, price_per_km)
+    os.makedirs(cache_dir, exist_ok=True)
+    _remove_stale(cache_dir, 'network_*.pickle', keep=snapshot_path)
+    save_snapshot(metro_graph, snapshot_path, key)
+    return metro_graph
+
+
+def clock_time(value):
+    """argparse type for ``HH:MM`` departure times."""
+    parse_clock(value)
+    return value
+
+
+def penalty(value):
+    """argparse type for ``--transfer-penalty``, see parse_transfer_penalty."""
+    return parse_transfer_penalty(value)
+
+
+def main(argv=None):
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Metro Route Optimizer. Starts the GUI unless a command is given.")
+    parser.add_argument('--csv', default=NETWORK_CSV, help="network CSV to load")
+    parser.add_argument('--hierarchy', action='store_true',
+                        help="route with a contraction hierarchy instead of the all-pairs table (large networks)")
+    commands = parser.add_subparsers(dest='command')
+    route_parser = commands.add_parser('route', help="print a route without starting the GUI")
+    route_parser.add_argument('from_station', help="station name; partial or misspelled names are resolved if unambiguous")
+    route_parser.add_argument('to_station')
+    route_parser.add_argument('--criteria', choices=sorted(CRITERIA_LABELS.values()), default='time')
+    route_parser.add_argument('--json', action='store_true', help="print the raw route result as JSON")
+    route_parser.add_argument('--depart', type=clock_time, metavar='HH:MM',
+                              help="earliest arrival leaving at this time, waiting for scheduled trains")
+    route_parser.add_argument('--transfer-penalty', type=penalty, metavar='N',
+                              help="charge N (in units of --criteria) per line change")
+    commands.add_parser('stations', help="list every station")
+    args = parser.parse_args(argv)
+    if getattr(args, 'depart', None) and args.criteria != 'time':
+        parser.error("--depart routes by time; it cannot be combined with --criteria")
+    if getattr(args, 'depart', None) and args.transfer_penalty is not None:
+        parser.error("--depart already includes the time spent changing trains; drop --transfer-penalty")
+    
+    if args.command is None:
+        return start_gui(args.csv)
+    
+    key = network_digest(args.csv)
+    with contextlib.redirect_stdout(sys.stderr):  # keep loader chatter out of command output
+        metro_graph = load_network(args.csv, key)
+        if args.hierarchy:
+            metro_graph.hierarchy = load_or_build_hierarchy(metro_graph, key, CACHE_DIR)
+        else:
+            metro_graph.route_table = load_or_build_route_table(metro_graph, key, CACHE_DIR)
+    
+    if args.command == 'stations':
+        print("\n".join(sorted(metro_graph.stations)))
+        return 0
+    
+    stations = []
+    for query in (args.from_station, args.to_station):
+        station = metro_graph.resolve_station(query)
+        if station is None:
+            suggestions = metro_graph.search_stations(query, 5)
+            hint = f" Did you mean: {', '.join(suggestions)}?" if suggestions else ""
+            print(f"Unknown station: {query}.{hint}", file=sys.stderr)
+            return 1
+        stations.append(station)
+    from_station, to_station = stations
+    
+    if args.depart:
+        result = metro_graph.route_at(from_station, to_station, args.depart)
+        label = f"Earliest Arrival, leaving {args.depart}"
+    else:
+        result = metro_graph.route(from_station, to_station, args.criteria, args.transfer_penalty)
+        label = next(label for label, criteria in CRITERIA_LABELS.items() if criteria == args.criteria)
+        if args.transfer_penalty is not None:
+            label += f", {args.transfer_penalty:g} per transfer"
+    if result is None:
+        print(metro_graph.no_route_message(from_station, to_station, args.depart), file=sys.stderr)
+        return 1
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        print(format_route(metro_graph, result, label), end='')
+    return 0
+
+
+def start_gui(file_path):
+    from tkinter import messagebox
+    from gui import run_gui
+    
+    try:
+        key = network_digest(file_path)
+        metro_graph = load_network(file_path, key)
+        metro_graph.route_table = load_or_build_route_table(metro_graph, key, CACHE_DIR)
+        run_gui(metro_graph)
     except Exception as e:
         messagebox.showerror("Startup Error", f"Failed to initialize application: {str(e)}")
 
 
+def __getattr__(name):
+    # The Tk front end lives in gui.py so headless users never import tkinter
+    if name == 'MetroRouteOptimizerApp':
+        from gui import MetroRouteOptimizerApp
+        return MetroRouteOptimizerApp
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Run through the importable module so snapshots pickle classes as app.*, not __main__.*
+    import app
+    sys.exit(app.main())
@@ -0,0 +1,107 @@
+"""Batch route queries answered from one shortest-path tree per origin.
+
+Queries are read in windows, grouped by (origin, criteria) and each group
+is answered from a single full search, optionally fanned out over a
+process pool. Results are yielded as soon as their group finishes, so
+arbitrarily large batches never sit in memory.
+"""
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from route_table import load_or_build_route_table
+
+_worker_graph = None  # read-only MetroGraph installed in each pool worker
+
+
+def init_worker(metro_graph, table_key=None, cache_dir=None):
+    """Pool initializer: install ``metro_graph`` for this worker's jobs (see worker_graph).
+
+    With ``table_key`` the worker also maps the precomputed route table.
+    """
+    global _worker_graph
+    _worker_graph = metro_graph
+    if table_key is not None:
+        # Every worker maps the same table file, so its pages are shared
+        metro_graph.route_table = load_or_build_route_table(metro_graph, table_key, cache_dir)
+
+
+def worker_graph():
+    """The MetroGraph installed by init_worker in this process."""
+    return _worker_graph
+
+
+def _route_origin(group):
+    return route_from_origin(_worker_graph, *group)
+
+
+def route_from_origin(metro_graph, origin, criteria, destinations):
+    """Answer every (origin -> destination) query from one shortest-path tree.
+
+    Returns a list of ``(from_station, to_station, criteria, result)`` tuples
+    where ``result`` has the same format as ``MetroGraph.dijkstra``.
+    """
+    compiled = metro_graph._compiled()
+    compiled.weights(criteria)  # validate criteria even if no search runs
+    source = compiled.index.get(origin)
+    tree = metro_graph._search(compiled, source, criteria) if source is not None else None
+
+    results = []
+    for destination in destinations:
+        target = compiled.index.get(destination)
+        if tree is None or target is None:
+            result = metro_graph._unroutable(origin, destination)
+        else:
+            result = metro_graph._route_from_tree(compiled, tree, target)
+        results.append((origin, destination, criteria, result))
+    return results
+
+
+def _grouped(queries, window):
+    """Split an iterable of queries into lists of (origin, criteria, destinations) groups."""
+    queries = iter(queries)
+    while True:
+        chunk = list(islice(queries, window))
+        if not chunk:
+            return
+        groups = defaultdict(list)
+        for query in chunk:
+            from_station, to_station = query[0], query[1]
+            criteria = query[2] if len(query) > 2 else 'time'
+            groups[(from_station, criteria)].append(to_station)
+        yield [(origin, criteria, destinations) for (origin, criteria), destinations in groups.items()]
+
+
+def _resolved(metro_graph, queries):
+    for query in queries:
+        # Names that resolve to no station are kept and come back unroutable
+        yield (metro_graph.resolve_station(query[0]) or query[0],
+               metro_graph.resolve_station(query[1]) or query[1], *query[2:])
+
+
+def batch_routes(metro_graph, queries, processes=None, window=10000, resolve_names=False):
+    """Yield ``(from_station, to_station, criteria, result)`` for each query.
+
+    ``queries`` is any iterable of ``(from_station, to_station[, criteria])``
+    tuples (criteria defaults to ``'time'``). Results come back grouped by
+    origin within each window of ``window`` queries rather than in input
+    order. With ``processes`` > 1 the origins are spread over a process pool
+    that receives the graph once per worker. With ``resolve_names``, partial
+    or misspelled station names are first resolved with
+    ``MetroGraph.resolve_station`` and results carry the resolved names.
+    """
+    metro_graph._compiled()  # compile once here rather than in every worker
+    if resolve_names:
+        queries = _resolved(metro_graph, queries)
+
+    if not processes or processes <= 1:
+        for groups in _grouped(queries, window):
+            for origin, criteria, destinations in groups:
+                yield from route_from_origin(metro_graph, origin, criteria, destinations)
+        return
+
+    with ProcessPoolExecutor(processes, initializer=init_worker, initargs=(metro_graph,)) as executor:
+        for groups in _grouped(queries, window):
+            chunksize = max(1, len(groups) // (processes * 4))
+            for results in executor.map(_route_origin, groups, chunksize=chunksize):
+                yield from results
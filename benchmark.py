@@ -0,0 +1,809 @@
+"""Benchmarks for the metro route optimizer.
+
+Run every benchmark with ``python benchmark.py`` or pick some by name, e.g.
+``python benchmark.py dijkstra``. ``--json results.json`` also writes every
+measurement, with the interpreter, platform and input digest, for comparing
+runs. The ``scale`` and ``contraction`` benchmarks run on synthetic
+networks (``--sizes``) generated from ``--seed``.
+"""
+import argparse
+import contextlib
+import csv
+import heapq
+import io
+import json
+import math
+import os
+import platform
+import random
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import analytics
+from app import LINE_COLORS, RouteCache, load_metro_data, load_snapshot, network_digest, save_snapshot
+from batch import batch_routes
+from contraction import ContractionHierarchy
+from profiling import Profiler
+from route_table import CRITERIA, load_or_build_route_table
+import spatial
+from spatial import SpatialIndex, haversine_km
+from station_index import StationIndex
+from timetable import Timetable, format_clock, frequencies_path, read_frequencies
+
+BENCHMARKS = {}
+RESULTS = {}  # benchmark name -> {label: metrics}, exported by --json
+current = None  # name of the running benchmark
+
+
+def benchmark(func):
+    """Register ``func(metro_graph, args)`` under its name minus the ``bench_`` prefix."""
+    BENCHMARKS[func.__name__[len('bench_'):]] = func
+    return func
+
+
+def record(label, **metrics):
+    """Keep the metrics printed for ``label`` under the running benchmark for --json."""
+    RESULTS.setdefault(current, {})[label] = metrics
+
+
+def sample_pairs(metro_graph, count, seed=42):
+    rng = random.Random(seed)
+    stations = sorted(metro_graph.stations)
+    return [tuple(rng.sample(stations, 2)) for _ in range(count)]
+
+
+def measure(func, *args):
+    """Return (seconds, peak traced bytes) for a single call of ``func``."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def footprint(func, *args):
+    """Return (result, bytes still allocated after the call, peak bytes) for one call of ``func``."""
+    tracemalloc.start()
+    result = func(*args)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, retained, peak
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def timed(func, *args, repeat=5):
+    """Best wall-clock time of ``repeat`` calls of ``func``."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def legacy_dijkstra(metro_graph, start, end, criteria='time'):
+    """The original dict-based search, kept as the baseline for comparisons.
+
+    Every heap entry carries its own copy of the path and line lists, and the
+    totals are recomputed afterwards by scanning neighbor lists per hop.
+    """
+    index = {'time': 1, 'distance': 2, 'cost': 3}[criteria]
+
+    def get_steps(path):
+        steps = []
+        for from_station, to_station in zip(path, path[1:]):
+            for edge in metro_graph.graph[from_station]:
+                if edge[0] == to_station:
+                    steps.append((from_station, to_station) + edge[1:])
+                    break
+        return steps
+
+    heap = [(0, start, [], [])]
+    visited = set()
+    while heap:
+        total_weight, current, path, lines = heapq.heappop(heap)
+        if current in visited:
+            continue
+        visited.add(current)
+        path = path + [current]
+        if current == end:
+            return {
+                'path': path,
+                'total_time': sum(step[2] for step in get_steps(path)),
+                'total_distance': sum(step[3] for step in get_steps(path)),
+                'total_cost': sum(step[4] for step in get_steps(path)),
+                'lines': lines,
+                'transfers': metro_graph._count_transfers(lines)
+            }
+        for edge in metro_graph.graph.get(current, []):
+            neighbor, line = edge[0], edge[4]
+            if neighbor not in visited:
+                new_lines = lines + [line] if not lines or lines[-1] != line else lines
+                heapq.heappush(heap, (total_weight + edge[index], neighbor, path, new_lines))
+    return None
+
+
+@benchmark
+def bench_dijkstra(metro_graph, args):
+    """Predecessor-array dijkstra versus the legacy path-copying search."""
+    pairs = sample_pairs(metro_graph, args.queries)
+    metro_graph.compile()
+
+    def run(search):
+        for criteria in CRITERIA:
+            for start, end in pairs:
+                search(start, end, criteria)
+
+    legacy = lambda start, end, criteria: legacy_dijkstra(metro_graph, start, end, criteria)
+    for label, search in (('legacy', legacy), ('dijkstra', metro_graph.dijkstra)):
+        elapsed = timed(run, search)
+        _, peak = measure(run, search)
+        per_query = elapsed / (len(pairs) * len(CRITERIA)) * 1e6
+        print(f"  {label:<10} {per_query:8.1f} us/query   peak alloc {peak / 1024:8.1f} KiB")
+        record(label, us_per_query=per_query, peak_alloc_bytes=peak)
+
+
+@benchmark
+def bench_transfers(metro_graph, args):
+    """Transfer-aware and Pareto routing versus plain dijkstra (time criteria)."""
+    pairs = sample_pairs(metro_graph, args.queries)
+    metro_graph.compile()
+    modes = (
+        ('dijkstra', lambda start, end: [metro_graph.dijkstra(start, end, 'time')]),
+        ('penalty=5', lambda start, end: [metro_graph.transfer_aware_route(start, end, 'time', 5)]),
+        ('pareto', metro_graph.pareto_routes),
+    )
+    for label, search in modes:
+        routes = []
+        elapsed = timed(lambda: routes.extend(route for start, end in pairs for route in search(start, end) if route),
+                        repeat=1)
+        per_query = elapsed / len(pairs) * 1e6
+        transfers = sum(route['transfers'] for route in routes) / max(len(routes), 1)
+        print(f"  {label:<10} {per_query:8.1f} us/query   {len(routes) / len(pairs):5.2f} routes/query"
+              f"   {transfers:5.2f} avg transfers")
+        record(label, us_per_query=per_query, routes_per_query=len(routes) / len(pairs), avg_transfers=transfers)
+
+
+@benchmark
+def bench_route_table(metro_graph, args):
+    """All-pairs route table build, mmap load and lookup versus dijkstra."""
+    pairs = sample_pairs(metro_graph, args.queries)
+    key = network_digest(args.csv)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        start = time.perf_counter()
+        table = load_or_build_route_table(metro_graph, key, cache_dir)
+        elapsed, size = time.perf_counter() - start, os.path.getsize(table.path)
+        print(f"  build      {elapsed * 1e3:8.1f} ms   {size / 1024:8.1f} KiB on disk")
+        record('build', seconds=elapsed, bytes_on_disk=size)
+        table.close()
+
+        start = time.perf_counter()
+        table = load_or_build_route_table(metro_graph, key, cache_dir)
+        elapsed = time.perf_counter() - start
+        print(f"  load       {elapsed * 1e3:8.3f} ms")
+        record('load', seconds=elapsed)
+
+        for label, search in (('dijkstra', metro_graph.dijkstra), ('table', table.route)):
+            elapsed = timed(lambda: [search(start, end, criteria) for criteria in CRITERIA for start, end in pairs])
+            per_query = elapsed / (len(pairs) * len(CRITERIA)) * 1e6
+            print(f"  {label:<10} {per_query:8.1f} us/query")
+            record(label, us_per_query=per_query)
+        table.close()
+
+
+@benchmark
+def bench_loader(metro_graph, args):
+    """Network startup: CSV parse versus loading a pre-built snapshot."""
+    key = network_digest(args.csv)
+    with tempfile.TemporaryDirectory() as cache_dir, contextlib.redirect_stdout(io.StringIO()):
+        snapshot_path = os.path.join(cache_dir, 'network.pickle')
+        parse = timed(load_metro_data, args.csv)
+        save = timed(save_snapshot, metro_graph, snapshot_path, key, repeat=1)
+        load = timed(load_snapshot, snapshot_path, key)
+        size = os.path.getsize(snapshot_path)
+        _, retained, peak = footprint(load_metro_data, args.csv)
+    print(f"  csv parse  {parse * 1e3:8.2f} ms")
+    print(f"  snapshot   {load * 1e3:8.2f} ms load   {save * 1e3:8.2f} ms save   {size / 1024:8.1f} KiB")
+    print(f"  footprint  {retained / 1024:8.1f} KiB retained   {peak / 1024:8.1f} KiB peak while loading")
+    record('csv parse', seconds=parse)
+    record('snapshot', load_seconds=load, save_seconds=save, bytes_on_disk=size)
+    record('footprint', retained_bytes=retained, peak_bytes=peak)
+
+
+@benchmark
+def bench_batch(metro_graph, args):
+    """All-pairs batch routing: pair-by-pair dijkstra versus per-origin trees and a process pool."""
+    stations = sorted(metro_graph.stations)
+    queries = [(start, end, 'time') for start in stations for end in stations]
+    sample = sample_pairs(metro_graph, args.queries)
+
+    per_query = timed(lambda: [metro_graph.dijkstra(start, end) for start, end in sample], repeat=1) / len(sample)
+    print(f"  pairwise   {per_query * len(queries):8.2f} s  (extrapolated from {len(sample)} queries)")
+    record('pairwise', seconds=per_query * len(queries), queries=len(queries), extrapolated=True)
+    for label, processes in (('batch', None), ('batch x4', 4)):
+        elapsed = timed(lambda: sum(1 for _ in batch_routes(metro_graph, queries, processes)), repeat=1)
+        print(f"  {label:<10} {elapsed:8.2f} s  for {len(queries)} queries")
+        record(label, seconds=elapsed, queries=len(queries), queries_per_second=len(queries) / elapsed)
+
+
+@benchmark
+def bench_route_cache(metro_graph, args):
+    """LRU route cache on a skewed workload where a few popular pairs dominate."""
+    rng = random.Random(7)
+    pairs = sample_pairs(metro_graph, 500)
+    weights = [1 / rank for rank in range(1, len(pairs) + 1)]  # Zipf-like popularity
+    workload = [(*rng.choices(pairs, weights)[0], 'time') for _ in range(args.queries * 10)]
+    workload = [(end, start, criteria) if rng.random() < 0.5 else (start, end, criteria)
+                for start, end, criteria in workload]
+
+    uncached = timed(lambda: [metro_graph.dijkstra(*query) for query in workload], repeat=1)
+    print(f"  uncached   {uncached / len(workload) * 1e6:8.1f} us/query")
+    record('uncached', us_per_query=uncached / len(workload) * 1e6)
+    for size in (32, 128, 1024):
+        metro_graph.route_cache = RouteCache(size)
+        elapsed = timed(lambda: [metro_graph.route(*query) for query in workload], repeat=1)
+        stats = metro_graph.cache_stats()
+        print(f"  lru {size:<6} {elapsed / len(workload) * 1e6:8.1f} us/query   hit rate {stats['hit_rate']:6.1%}"
+              f"   evictions {stats['evictions']:6}   saved {stats['time_saved'] * 1e3:7.1f} ms")
+        record(f'lru {size}', us_per_query=elapsed / len(workload) * 1e6, **stats)
+    metro_graph.route_cache = RouteCache()
+
+
+@benchmark
+def bench_live_updates(metro_graph, args):
+    """Closure/delay applied in place, re-queried and reverted, versus a full reload and re-query."""
+    pairs = sample_pairs(metro_graph, args.queries)
+    start, end = pairs[0]
+    route = metro_graph.dijkstra(start, end) or metro_graph.dijkstra(*pairs[1])
+    segment = route['path'][:2] if route and len(route['path']) > 1 else None
+    line = route['lines'][0] if route and route['lines'] else sorted(metro_graph.line_edges)[0]
+
+    def close_and_query():
+        metro_graph.disable_edge(*segment)
+        metro_graph.route(start, end)
+        metro_graph.enable_edge(*segment)
+
+    def delay_and_query():
+        metro_graph.delay_line(line, minutes=2)
+        metro_graph.route(start, end)
+        metro_graph.delay_line(line, minutes=-2)
+
+    def reload_and_query():
+        with contextlib.redirect_stdout(io.StringIO()):
+            load_metro_data(args.csv).route(start, end)
+
+    updates = [('delay line', delay_and_query), ('full reload', reload_and_query)]
+    if segment:
+        updates.insert(0, ('close edge', close_and_query))
+    for label, update in updates:
+        elapsed = timed(update, repeat=20)
+        print(f"  {label:<12} {elapsed * 1e3:8.3f} ms per cycle")
+        record(label, ms_per_cycle=elapsed * 1e3)
+
+
+def long_routes(metro_graph, count):
+    """The ``count`` station pairs whose time-optimal routes have the most stops."""
+    stations = sorted(metro_graph.stations)
+    routes = [route for _, _, _, route in batch_routes(metro_graph, ((a, b) for a in stations for b in stations))
+              if route]
+    routes.sort(key=lambda route: len(route['path']), reverse=True)
+    return [(route['path'][0], route['path'][-1]) for route in routes[:count]]
+
+
+@benchmark
+def bench_astar(metro_graph, args):
+    """A* versus dijkstra on the longest cross-city routes: stations expanded and latency."""
+    compiled = metro_graph._compiled()
+    pairs = long_routes(metro_graph, min(args.queries, 100))
+    for criteria in CRITERIA:
+        calibration = metro_graph.astar_calibration(criteria)
+        if not calibration['usable']:
+            print(f"  {criteria:<9} A* unusable, falls back to dijkstra: {calibration['reason']}")
+            record(f'{criteria} astar', usable=False, reason=calibration['reason'])
+            continue
+        if calibration['reason']:
+            print(f"  {criteria:<9} warning: {calibration['reason']}")
+        ids = [(compiled.index[start], compiled.index[end]) for start, end in pairs]
+        searches = (
+            ('dijkstra', lambda s, t: metro_graph._search(compiled, s, criteria, t)),
+            ('astar', lambda s, t: metro_graph._astar_search(compiled, s, t, criteria, calibration)),
+        )
+        for label, search in searches:
+            expanded = sum(len(search(s, t).order) for s, t in ids) / len(ids)
+            elapsed = timed(lambda: [search(s, t) for s, t in ids]) / len(ids)
+            print(f"  {criteria:<9} {label:<9} {expanded:7.1f} stations expanded   {elapsed * 1e6:8.1f} us/query")
+            record(f'{criteria} {label}', nodes_expanded=expanded, us_per_query=elapsed * 1e6)
+
+
+@benchmark
+def bench_station_search(metro_graph, args):
+    """Autocomplete: index build, per-keystroke prefix search and typo-tolerant search."""
+    stations = sorted(metro_graph.stations)
+    elapsed = timed(lambda: StationIndex(stations))
+    print(f"  build      {elapsed * 1e3:8.2f} ms")
+    record('build', seconds=elapsed)
+    index = StationIndex(stations)
+
+    rng = random.Random(3)
+    names = rng.sample(stations, min(len(stations), args.queries))
+    keystrokes = [name[:i] for name in names for i in range(1, len(name) + 1)]
+    typos = []
+    for name in names:
+        i = rng.randrange(1, max(2, len(name) - 1))
+        typos.append(name[:i - 1] + name[i] + name[i - 1] + name[i + 1:])  # transposed letters
+
+    substring = lambda text: [name for name in stations if text.lower() in name.lower()][:10]
+    for label, func, queries in (
+        ('substring', substring, keystrokes),
+        ('prefix', index.search, keystrokes),
+        ('typo', index.search, typos),
+    ):
+        elapsed = timed(lambda: [func(query) for query in queries])
+        print(f"  {label:<10} {elapsed / len(queries) * 1e6:8.1f} us/query")
+        record(label, us_per_query=elapsed / len(queries) * 1e6)
+    found = sum(index.resolve(typo) == name for typo, name in zip(typos, names))
+    print(f"  resolved {found}/{len(names)} misspelled names to the intended station")
+    record('resolve typos', resolved=found, names=len(names))
+
+
+@benchmark
+def bench_spatial(metro_graph, args):
+    """Nearest-station lookups: linear scan versus the grid index and batch queries."""
+    coords = metro_graph.station_coords
+    rng = random.Random(11)
+    stations = sorted(coords)
+    # Door-to-door style points: within a couple of km of some station
+    points = [(lat + rng.uniform(-0.02, 0.02), lon + rng.uniform(-0.02, 0.02))
+              for lat, lon in (coords[rng.choice(stations)] for _ in range(args.queries * 10))]
+
+    elapsed = timed(lambda: SpatialIndex(coords))
+    print(f"  build      {elapsed * 1e3:8.2f} ms   {len(stations)} stations")
+    record('build', seconds=elapsed, stations=len(stations))
+    index = SpatialIndex(coords)
+    scan = lambda lat, lon: min((haversine_km(lat, lon, *coord), station) for station, coord in coords.items())
+    for label, func in (('scan', scan), ('grid', index.nearest), ('within 1km', lambda lat, lon: index.within(lat, lon, 1.0))):
+        elapsed = timed(lambda: [func(lat, lon) for lat, lon in points], repeat=3)
+        print(f"  {label:<10} {elapsed / len(points) * 1e6:8.1f} us/point")
+        record(label, us_per_point=elapsed / len(points) * 1e6)
+    elapsed = timed(index.nearest_many, points, repeat=3)
+    backend = 'numpy' if spatial._numpy() else 'grid, numpy not installed'
+    print(f"  batch      {elapsed / len(points) * 1e6:8.1f} us/point   ({backend})")
+    record('batch', us_per_point=elapsed / len(points) * 1e6, backend=backend)
+
+
+@benchmark
+def bench_timetable(metro_graph, args):
+    """Timetable routing over a full service day: build, connection scan queries and a day-long sweep."""
+    frequencies = read_frequencies(frequencies_path(args.csv))
+    elapsed = timed(Timetable, metro_graph, frequencies, repeat=3)
+    timetable, retained, _ = footprint(Timetable, metro_graph, frequencies)
+    print(f"  build      {elapsed * 1e3:8.1f} ms   {len(timetable.trip_lines)} trips, {len(timetable)} connections, "
+          f"{retained / 2 ** 20:.1f} MiB")
+    record('build', seconds=elapsed, trips=len(timetable.trip_lines), connections=len(timetable),
+           retained_bytes=retained)
+    metro_graph._timetable = timetable
+
+    rng = random.Random(5)
+    first, last = min(timetable.departures), max(timetable.departures)
+    queries = [(start, end, rng.randrange(first, last - 3600) / 60)
+               for start, end in sample_pairs(metro_graph, args.queries)]
+    elapsed = timed(lambda: [metro_graph.dijkstra(start, end) for start, end, _ in queries], repeat=3)
+    print(f"  static     {elapsed / len(queries) * 1e6:8.1f} us/query   (dijkstra, no waiting)")
+    record('static dijkstra', us_per_query=elapsed / len(queries) * 1e6)
+    profiler = metro_graph.enable_profiling()
+    try:
+        results = [metro_graph.route_at(start, end, departure) for start, end, departure in queries]
+    finally:
+        metro_graph.disable_profiling()
+    scanned = profiler.as_dict()['scan']['connections_scanned_per_call']
+    elapsed = timed(lambda: [metro_graph.route_at(start, end, departure) for start, end, departure in queries],
+                    repeat=3)
+    found = [result for result in results if result]
+    print(f"  scan       {elapsed / len(queries) * 1e6:8.1f} us/query   {scanned:8.0f} connections scanned/query   "
+          f"{len(found)}/{len(queries)} reachable")
+    record('connection scan', us_per_query=elapsed / len(queries) * 1e6, connections_scanned=scanned,
+           reachable=len(found), queries=len(queries))
+
+    # Every 5 minutes of the service day for a few connected pairs, as a departure board would
+    pairs = [(result['path'][0], result['path'][-1]) for result in found[:10]]
+    times = range(first, last - 3600, 300)
+    started = time.perf_counter()
+    sweep = [metro_graph.route_at(start, end, departure / 60) for start, end in pairs for departure in times]
+    elapsed = time.perf_counter() - started
+    waits = [result['wait_time'] for result in sweep if result]
+    if waits:
+        print(f"  day sweep  {elapsed * 1e3:8.1f} ms   {len(sweep)} queries from {format_clock(first)} to "
+              f"{format_clock(times[-1])}, waiting {min(waits):g}-{max(waits):g} min "
+              f"(mean {sum(waits) / len(waits):.1f})")
+    record('day sweep', seconds=elapsed, queries=len(sweep), us_per_query=elapsed / max(len(sweep), 1) * 1e6,
+           mean_wait_min=sum(waits) / len(waits) if waits else None)
+
+
+@benchmark
+def bench_analytics(metro_graph, args):
+    """Network analytics from one tree per origin versus one dijkstra per station pair, and export sizes."""
+    compiled = metro_graph._compiled()
+    n = len(compiled)
+    pairs = sample_pairs(metro_graph, args.queries)
+    per_pair = timed(lambda: [metro_graph.dijkstra(start, end) for start, end in pairs], repeat=3) / len(pairs)
+    elapsed = timed(analytics.travel_matrix, metro_graph, repeat=3)
+    print(f"  matrix     {elapsed * 1e3:8.1f} ms   {n}x{n} time totals   "
+          f"(per-pair dijkstra: ~{per_pair * n * n:.1f} s, x{per_pair * n * n / elapsed:.0f})")
+    record('time matrix', seconds=elapsed, stations=n, per_pair_estimate_seconds=per_pair * n * n)
+
+    backends = [('python', False)] + ([('numpy', True)] if spatial._numpy() else [])
+    stats = {}
+    for label, use_numpy in backends:
+        elapsed = timed(analytics.centrality, metro_graph, 'time', analytics.BATCH_SIZE, use_numpy, repeat=3)
+        stats[label] = analytics.centrality(metro_graph, use_numpy=use_numpy)
+        print(f"  centrality {elapsed * 1e3:8.1f} ms   ({label} accumulation)")
+        record(f'centrality {label}', seconds=elapsed)
+    if len(stats) > 1 and stats['python'] != stats['numpy']:
+        print("  warning: numpy and python centrality differ")
+    if not spatial._numpy():
+        print("  numpy not installed: numpy accumulation and .npz export skipped")
+
+    stations, matrix = analytics.travel_matrix(metro_graph)
+    with tempfile.TemporaryDirectory() as tmp:
+        for extension in ('csv', 'npz') if spatial._numpy() else ('csv',):
+            path = os.path.join(tmp, f'matrix.{extension}')
+            elapsed = timed(analytics.save_matrix, path, stations, matrix, repeat=1)
+            size = os.path.getsize(path)
+            print(f"  export     {elapsed * 1e3:8.1f} ms   .{extension} {size / 1024:8.1f} KiB")
+            record(f'export {extension}', seconds=elapsed, bytes=size)
+
+
+def print_profile(profiler):
+    for phase, stats in profiler.as_dict().items():
+        counters = '   '.join(f"{name[:-len('_per_call')].replace('_', ' ')} {value:9.1f}"
+                               for name, value in stats.items() if name.endswith('_per_call'))
+        print(f"  {phase:<12} {stats['calls']:7} calls {stats['mean_us']:9.1f} us/call   {counters}")
+
+
+@benchmark
+def bench_profile(metro_graph, args):
+    """Hot-path instrumentation (per call: time, stations expanded, heap pushes) for sample queries."""
+    pairs = sample_pairs(metro_graph, args.queries)
+    metro_graph.route_cache = RouteCache()
+    profiler = metro_graph.enable_profiling()
+    try:
+        for criteria in CRITERIA:
+            for start, end in pairs:
+                metro_graph.dijkstra(start, end, criteria)
+                metro_graph.astar(start, end, criteria)
+                metro_graph.route(start, end, criteria)
+    finally:
+        metro_graph.disable_profiling()
+    print_profile(profiler)
+    for phase, stats in profiler.as_dict().items():
+        record(phase, **stats)
+
+
+SYNTHETIC_ORIGIN = (28.0, 76.5)  # south-west corner of the synthetic lattice
+SYNTHETIC_STEP = (0.011, 0.0125)  # degrees between lattice points, about 1.2 km each way
+SYNTHETIC_KMH = 32  # average speed including dwell time
+DIRECTIONS = ((0, 1), (1, 0), (0, -1), (-1, 0), (1, 1), (1, -1), (-1, 1), (-1, -1))
+
+
+def write_synthetic_csv(path, stations, seed=0, line_length=40, price_per_km=5):
+    """Write a metro-like network CSV with ``stations`` stations; return the number of segments.
+    
+    Lines are mostly straight walks over a jittered lattice. Each line starts
+    at an existing station, prefers unbuilt ground, ends when boxed in and
+    sometimes crosses an earlier line, so the network is connected with about
+    1.1 segments per station, like the real one. Times and distances are
+    consistent with the coordinates.
+    """
+    rng = random.Random(seed)
+    side = math.ceil(math.sqrt(stations * 2))
+    placed = {}  # lattice point -> (name, lat, lon)
+    points = []
+    rows = []
+
+    def station(point):
+        if point not in placed:
+            lat = SYNTHETIC_ORIGIN[0] + point[0] * SYNTHETIC_STEP[0] + rng.uniform(-0.002, 0.002)
+            lon = SYNTHETIC_ORIGIN[1] + point[1] * SYNTHETIC_STEP[1] + rng.uniform(-0.002, 0.002)
+            placed[point] = (f"S{point[0]}-{point[1]}", lat, lon)
+            points.append(point)
+        return placed[point]
+
+    def inside(point):
+        return 0 <= point[0] < side and 0 <= point[1] < side
+
+    station((side // 2, side // 2))
+    line = 0
+    while len(placed) < stations:
+        line += 1
+        for _ in range(20):  # start next to unbuilt ground if possible
+            point = rng.choice(points)
+            if any(inside(p) and p not in placed for p in ((point[0] + d[0], point[1] + d[1]) for d in DIRECTIONS)):
+                break
+        direction = rng.choice(DIRECTIONS)
+        for _ in range(line_length):
+            if rng.random() < 0.15:
+                direction = rng.choice(DIRECTIONS)
+            step = (point[0] + direction[0], point[1] + direction[1])
+            if not inside(step) or (step in placed and rng.random() > 0.3):  # sometimes cross another line
+                fresh = [d for d in DIRECTIONS
+                         if inside((point[0] + d[0], point[1] + d[1])) and (point[0] + d[0], point[1] + d[1]) not in placed]
+                if not fresh:
+                    break  # boxed in: end the line rather than run over built track
+                direction = rng.choice(fresh)
+                step = (point[0] + direction[0], point[1] + direction[1])
+            (name1, lat1, lon1), (name2, lat2, lon2) = station(point), station(step)
+            km = haversine_km(lat1, lon1, lat2, lon2)
+            distance = math.ceil(km * 100) / 100  # never shorter than the straight line
+            rows.append((name1, name2, max(1, round(km / SYNTHETIC_KMH * 60)), distance,
+                         round(distance * price_per_km), f"Line {line}", lat1, lon1, lat2, lon2))
+            point = step
+            if len(placed) >= stations:
+                break
+
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['From Station', 'To Station', 'Time (min)', 'Distance (km)', 'Cost (INR)', 'Line',
+                         'From Lat', 'From Lon', 'To Lat', 'To Lon'])
+        writer.writerows(rows)
+    return len(rows)
+
+
+@benchmark
+def bench_scale(metro_graph, args):
+    """Synthetic networks of --sizes stations: load, memory, per-criteria latency, A* and batch throughput."""
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'synthetic.csv')
+            segments = write_synthetic_csv(path, size, args.seed)
+            profiler = Profiler()
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                graph = load_metro_data(path, profiler=profiler)
+                load = time.perf_counter() - start
+                _, retained, peak = footprint(load_metro_data, path)
+        phases = profiler.as_dict()
+        print(f"  {size} stations, {segments} segments")
+        print(f"    load       {load:8.2f} s  (read {phases['read_csv']['seconds']:.2f}, build "
+              f"{phases['build_graph']['seconds']:.2f}, compile {phases['compile']['seconds']:.2f})")
+        print(f"    footprint  {retained / 2 ** 20:8.1f} MiB retained   {peak / 2 ** 20:8.1f} MiB peak while loading")
+        record(f'{size} load', seconds=load, segments=segments, phases=phases)
+        record(f'{size} footprint', retained_bytes=retained, peak_bytes=peak)
+
+        pairs = sample_pairs(graph, args.scale_queries, args.seed)
+        for criteria in CRITERIA:
+            graph.astar_calibration(criteria)  # one-off per network, kept out of the latencies
+            for label, search, phase in (('dijkstra', graph.dijkstra, 'search'), ('astar', graph.astar, 'astar')):
+                profiler.reset()
+                latencies = []
+                for start, end in pairs:
+                    began = time.perf_counter()
+                    search(start, end, criteria)
+                    latencies.append(time.perf_counter() - began)
+                stats = profiler.as_dict().get(phase, {})
+                expanded = stats.get('nodes_expanded_per_call', 0)
+                p50, p99 = percentile(latencies, 0.5), percentile(latencies, 0.99)
+                print(f"    {criteria:<9}{label:<9} p50 {p50 * 1e3:8.2f} ms   p99 {p99 * 1e3:8.2f} ms"
+                      f"   {expanded:9.0f} stations expanded")
+                record(f'{size} {criteria} {label}', p50_seconds=p50, p99_seconds=p99,
+                       mean_seconds=sum(latencies) / len(latencies), nodes_expanded=expanded,
+                       heap_pushes=stats.get('heap_pushes_per_call', 0))
+        graph.disable_profiling()
+
+        rng = random.Random(args.seed)
+        stations = sorted(graph.stations)
+        origins, destinations = min(5, len(stations)), min(2000, len(stations))
+        queries = [(origin, destination) for origin in rng.sample(stations, origins)
+                   for destination in rng.sample(stations, destinations)]
+        # Bound as a default so the lambda does not refer to a name deleted below
+        elapsed = timed(lambda graph=graph: sum(1 for _ in batch_routes(graph, queries)), repeat=1)
+        print(f"    batch      {len(queries) / elapsed:8.0f} queries/s   "
+              f"({origins} origins x {destinations} destinations)")
+        record(f'{size} batch', queries_per_second=len(queries) / elapsed, queries=len(queries))
+        del graph
+
+
+def compare_hierarchy(graph, hierarchy, pairs, criteria, label):
+    """Print and record per-query latency of the hierarchy against dijkstra on ``pairs``."""
+    expected = [graph.dijkstra(start, end, criteria) for start, end in pairs]
+    routes = [hierarchy.route(start, end, criteria) for start, end in pairs]
+    total = f'total_{criteria}'
+    mismatches = sum((a is None) != (b is None) or (a is not None and abs(a[total] - b[total]) > 1e-6)
+                     for a, b in zip(expected, routes))
+    dijkstra = timed(lambda: [graph.dijkstra(start, end, criteria) for start, end in pairs], repeat=3) / len(pairs)
+    profiler = graph.enable_profiling()
+    try:
+        query = timed(lambda: [hierarchy.route(start, end, criteria) for start, end in pairs], repeat=3) / len(pairs)
+    finally:
+        graph.disable_profiling()
+    settled = profiler.as_dict()['ch_query']['nodes_settled_per_call']
+    print(f"    {criteria:<9} dijkstra {dijkstra * 1e3:8.3f} ms   hierarchy {query * 1e3:8.3f} ms   "
+          f"x{dijkstra / query:6.1f}   {settled:7.1f} settled   {mismatches} mismatches")
+    record(f'{label} {criteria}', dijkstra_seconds=dijkstra, hierarchy_seconds=query, speedup=dijkstra / query,
+           nodes_settled=settled, mismatches=mismatches)
+
+
+@benchmark
+def bench_contraction(metro_graph, args):
+    """Contraction hierarchies: preprocessing time, memory, file size and query speedup over dijkstra."""
+    def networks():
+        yield 'network', metro_graph, CRITERIA, args.queries
+        for size in sorted(args.sizes):  # one at a time, smallest first, so peak RSS growth stays meaningful
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, 'synthetic.csv')
+                write_synthetic_csv(path, size, args.seed)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    graph = load_metro_data(path)
+            yield f'{size}', graph, ('time',), args.scale_queries
+
+    for label, graph, criteria, queries in networks():
+        graph.compile()
+        # tracemalloc would slow the contraction several times over; the growth
+        # of the process's peak RSS bounds the memory preprocessing needed
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.perf_counter()
+        hierarchy = ContractionHierarchy.build(graph, criteria)
+        build = time.perf_counter() - started
+        peak = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss) * 1024
+        retained = sum(block.itemsize * len(block) for up, down in hierarchy.graphs.values() for block in (*up, *down))
+        arcs = sum(hierarchy.arc_count(name) for name in criteria)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'hierarchy.bin')
+            hierarchy.save(path, bytes(32))
+            size = os.path.getsize(path)
+            load = timed(ContractionHierarchy.load, graph, path, bytes(32), repeat=3)
+        print(f"  {label}: {len(graph.compiled)} stations, {len(graph.compiled.targets)} edges")
+        print(f"    build      {build:8.2f} s   {arcs} arcs for {', '.join(criteria)} "
+              f"({arcs / len(criteria) / len(graph.compiled.targets):.2f} per edge)")
+        print(f"    memory     {retained / 2 ** 20:8.1f} MiB arrays   {peak / 2 ** 20:8.1f} MiB peak RSS growth   "
+              f"file {size / 2 ** 20:.1f} MiB, loads in {load * 1e3:.1f} ms")
+        record(f'{label} build', seconds=build, arcs=arcs, criteria=list(criteria), array_bytes=retained,
+               peak_rss_growth_bytes=peak, file_bytes=size, load_seconds=load)
+        pairs = sample_pairs(graph, queries, args.seed)
+        for name in criteria:
+            compare_hierarchy(graph, hierarchy, pairs, name, label)
+
+
+def legacy_full_map(metro_graph):
+    """The original full map: one CircleMarker per station and one PolyLine per segment."""
+    import folium
+
+    coords = list(metro_graph.station_coords.values())
+    center = [sum(c[0] for c in coords) / len(coords), sum(c[1] for c in coords) / len(coords)]
+    m = folium.Map(location=center, zoom_start=12, tiles='CartoDB positron')
+    for station, coord in metro_graph.station_coords.items():
+        folium.CircleMarker(location=coord, radius=3, popup=station, color='black', fill=True,
+                            fill_color='white', fill_opacity=1, weight=1).add_to(m)
+    for line, edges in metro_graph.line_edges.items():
+        for st1, st2 in edges:
+            coord1, coord2 = metro_graph.station_coords.get(st1), metro_graph.station_coords.get(st2)
+            if coord1 and coord2:
+                folium.PolyLine(locations=[coord1, coord2], color=LINE_COLORS.get(line, '#000000'), weight=4,
+                                opacity=0.8, tooltip=f"{line} Line", line_cap='round', line_join='round').add_to(m)
+    metro_graph._add_legend(m)
+    return m
+
+
+@benchmark
+def bench_maps(metro_graph, args):
+    """Full/route map render time and HTML size: per-feature versus cached GeoJSON layers."""
+    try:
+        import folium  # noqa: F401
+    except ImportError:
+        print("  skipped: folium is not installed")
+        record('skipped', reason="folium is not installed")
+        return
+
+    route = next((route for start, end in sample_pairs(metro_graph, 50)
+                  for route in [metro_graph.dijkstra(start, end)] if route and len(route['path']) > 5), None)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        def cold_full_map():
+            metro_graph._map_layers = None
+            for name in os.listdir(cache_dir):
+                os.remove(os.path.join(cache_dir, name))
+            return metro_graph.generate_full_map(cache_dir)
+
+        renders = [
+            ('legacy full', lambda: legacy_full_map(metro_graph)),
+            ('full (cold)', cold_full_map),
+            ('full (warm)', lambda: metro_graph.generate_full_map(cache_dir)),
+        ]
+        if route:
+            renders.append(('route', lambda: metro_graph.generate_route_map(route, cache_dir)))
+        for label, render in renders:
+            html = []
+            elapsed = timed(lambda: html.append(render().get_root().render()), repeat=3)
+            size = len(html[-1].encode('utf-8'))
+            print(f"  {label:<12} {elapsed * 1e3:8.1f} ms   {size / 1024:8.1f} KiB")
+            record(label, seconds=elapsed, html_bytes=size)
+
+        full_map = os.path.join(cache_dir, 'full_metro_map.html')
+        metro_graph.save_full_map(full_map, cache_dir)
+        elapsed = timed(metro_graph.save_full_map, full_map, cache_dir)
+        print(f"  {'saved full':<12} {elapsed * 1e3:8.1f} ms   (re-save with unchanged network)")
+        record('saved full', seconds=elapsed)
+
+
+def import_time(module):
+    """Cumulative import time of ``module`` in a fresh interpreter, in seconds (None if unavailable)."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    for line in result.stderr.splitlines():
+        match = re.match(r'import time:\s+\d+ \|\s+(\d+) \| ' + re.escape(module) + '$', line)
+        if match:
+            return int(match.group(1)) / 1e6
+    return None
+
+
+@benchmark
+def bench_startup(metro_graph, args):
+    """Import times (fresh interpreter) and headless route query wall time."""
+    for module in ('app', 'gui', 'pandas', 'folium', 'tkinter'):
+        elapsed = import_time(module)
+        shown = f"{elapsed * 1e3:8.1f} ms" if elapsed is not None else "     n/a"
+        print(f"  import {module:<10} {shown}")
+        record(f'import {module}', seconds=elapsed)
+
+    start, end = sample_pairs(metro_graph, 1)[0]
+    command = [sys.executable, 'app.py', '--csv', args.csv, 'route', start, end]
+    subprocess.run(command, capture_output=True)  # warm the snapshot and route table caches
+    elapsed = timed(lambda: subprocess.run(command, capture_output=True), repeat=3)
+    print(f"  headless route query   {elapsed * 1e3:8.1f} ms (process start to exit)")
+    record('headless route query', seconds=elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('names', nargs='*', metavar='name',
+                        help=f"benchmarks to run (default: all of {', '.join(sorted(BENCHMARKS))})")
+    parser.add_argument('--csv', default='metro_normalized.csv', help="network CSV to benchmark against")
+    parser.add_argument('--queries', type=int, default=300, help="random station pairs per benchmark")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000],
+                        help="station counts of the synthetic networks (scale and contraction benchmarks)")
+    parser.add_argument('--scale-queries', type=int, default=20, help="random station pairs per synthetic network")
+    parser.add_argument('--seed', type=int, default=0, help="seed for the synthetic networks")
+    parser.add_argument('--json', metavar='PATH', help="also write every measurement to PATH as JSON")
+    args = parser.parse_args()
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+    global current
+    names = args.names or sorted(BENCHMARKS)
+    metro_graph = load_metro_data(args.csv)
+    for current in names:
+        print(f"\n[{current}] {BENCHMARKS[current].__doc__}")
+        BENCHMARKS[current](metro_graph, args)
+
+    if args.json:
+        meta = {
+            'python': f"{platform.python_implementation()} {platform.python_version()}",
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'csv': args.csv,
+            'network_digest': network_digest(args.csv).hex(),
+            'queries': args.queries,
+            'sizes': args.sizes,
+            'scale_queries': args.scale_queries,
+            'seed': args.seed,
+            'benchmarks': names,
+        }
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'meta': meta, 'results': RESULTS}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
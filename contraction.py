@@ -0,0 +1,329 @@
+"""Contraction hierarchies for fast point-to-point queries on large networks.
+
+Preprocessing contracts stations one at a time in order of importance
+(fewest shortcuts added first). When a station is removed, every route
+through it that no other remaining path matches (a local "witness" search)
+is kept as a shortcut arc. A query is then a bidirectional Dijkstra that
+only climbs to more important stations, meeting near the top of the
+hierarchy after settling a few dozen stations. Each arc remembers the
+station it bypasses (or the compiled edge it stands for), so routes unpack
+into the same edges ``MetroGraph.dijkstra`` returns.
+
+One hierarchy is built per criteria. File layout (native byte order, every
+block padded to 8 bytes)::
+
+    header | JSON (station names, criteria, arc counts)
+           | per criteria, for upward and downward arcs:
+             offsets int32[n+1], ends int32[m], weights float64[m], via int32[m]
+
+``via`` is the bypassed station id for a shortcut and ``~edge`` (negative)
+for an original compiled edge. As with the route table, the header carries
+a caller supplied 32-byte key and a file whose key differs is rebuilt.
+"""
+import glob
+import heapq
+import json
+import os
+import struct
+import sys
+from array import array
+from time import perf_counter
+
+from route_table import CRITERIA, STALE_ROUTE, _padded
+
+MAGIC = b'MRCH'
+VERSION = 1
+HEADER = struct.Struct('<4sI32sIII')  # magic, version, key, stations, edges, JSON length
+SETTLE_LIMIT = 60  # stations a witness search may settle before assuming no witness exists
+INF = float('inf')
+
+
+def hierarchy_path(cache_dir, key):
+    return os.path.join(cache_dir, f"hierarchy_{key.hex()[:16]}.bin")
+
+
+def contract(n, arcs, settle_limit=SETTLE_LIMIT):
+    """Contract a directed graph given as ``(u, v, weight, via)`` arcs.
+
+    Returns ``(up, down)``: per station, the arcs it had to more important
+    stations when it was contracted, as ``{v: (weight, via)}`` for arcs
+    ``station -> v`` and ``{u: (weight, via)}`` for arcs ``u -> station``.
+    Parallel arcs keep the lightest.
+    """
+    out = [{} for _ in range(n)]
+    into = [{} for _ in range(n)]
+    for u, v, weight, via in arcs:
+        if u != v and weight != INF and weight < out[u].get(v, (INF,))[0]:
+            out[u][v] = into[v][u] = (weight, via)
+
+    heappush, heappop = heapq.heappush, heapq.heappop
+
+    def witness_distances(source, skip, limit):
+        """Distances from ``source`` up to ``limit`` avoiding ``skip``, within the settle limit."""
+        dist = {source: 0}
+        heap = [(0, source)]
+        settled = 0
+        while heap and settled < settle_limit:
+            weight, node = heappop(heap)
+            if weight > dist[node]:
+                continue
+            if weight > limit:
+                break
+            settled += 1
+            for neighbor, (arc_weight, _) in out[node].items():
+                if neighbor == skip:
+                    continue
+                new_weight = weight + arc_weight
+                if new_weight < dist.get(neighbor, INF):
+                    dist[neighbor] = new_weight
+                    heappush(heap, (new_weight, neighbor))
+        return dist
+
+    def shortcuts(v):
+        """Arcs ``(u, w, weight)`` needed to preserve shortest routes through ``v`` if it is removed."""
+        needed = []
+        for u, (in_weight, _) in into[v].items():
+            through = {w: in_weight + out_weight for w, (out_weight, _) in out[v].items() if w != u}
+            if not through:
+                continue
+            dist = witness_distances(u, v, max(through.values()))
+            needed.extend((u, w, weight) for w, weight in through.items() if dist.get(w, INF) > weight)
+        return needed
+
+    deleted_neighbors = [0] * n
+
+    def priority(v, needed):
+        # Edge difference plus contracted neighbors, so contraction spreads evenly
+        return len(needed) - len(out[v]) - len(into[v]) + deleted_neighbors[v]
+
+    heap = [(priority(v, shortcuts(v)), v) for v in range(n)]
+    heapq.heapify(heap)
+    up = [None] * n
+    down = [None] * n
+    while heap:
+        _, v = heappop(heap)
+        needed = shortcuts(v)
+        current = priority(v, needed)
+        if heap and current > heap[0][0]:
+            heappush(heap, (current, v))  # lazy update: something else is cheaper now
+            continue
+
+        up[v], down[v] = out[v], into[v]
+        for w in out[v]:
+            del into[w][v]
+            deleted_neighbors[w] += 1
+        for u in into[v]:
+            del out[u][v]
+            deleted_neighbors[u] += 1
+        for u, w, weight in needed:
+            if weight < out[u].get(w, (INF,))[0]:
+                out[u][w] = into[w][u] = (weight, v)
+        out[v] = into[v] = None
+    return up, down
+
+
+def _csr(arcs_by_node):
+    offsets, ends, weights, via = array('i', [0]), array('i'), array('d'), array('i')
+    for arcs in arcs_by_node:
+        for end, (weight, middle) in sorted(arcs.items()):
+            ends.append(end)
+            weights.append(weight)
+            via.append(middle)
+        offsets.append(len(ends))
+    return offsets, ends, weights, via
+
+
+class ContractionHierarchy:
+    """Per-criteria upward/downward arc arrays over a MetroGraph's compiled view."""
+
+    def __init__(self, metro_graph, graphs):
+        self.metro_graph = metro_graph
+        self.compiled = metro_graph._compiled()
+        self.graphs = graphs  # criteria -> (up arrays, down arrays), each (offsets, ends, weights, via)
+        self.criteria = tuple(graphs)
+
+    def __len__(self):
+        return len(self.compiled)
+
+    def arc_count(self, criteria='time'):
+        up, down = self.graphs[criteria]
+        return len(up[1]) + len(down[1])
+
+    @classmethod
+    def build(cls, metro_graph, criteria=CRITERIA, settle_limit=SETTLE_LIMIT):
+        """Contract the compiled graph once per criteria (closed edges are left out)."""
+        compiled = metro_graph._compiled()
+        n = len(compiled)
+        graphs = {}
+        for name in criteria:
+            started = perf_counter()
+            weights = compiled.weights(name)
+            arcs = ((compiled.sources[edge], compiled.targets[edge], weights[edge], ~edge)
+                    for edge in range(len(compiled.targets)))
+            up, down = contract(n, arcs, settle_limit)
+            graphs[name] = (_csr(up), _csr(down))
+            if metro_graph.profiler is not None:
+                metro_graph.profiler.add('contract', perf_counter() - started, stations=n,
+                                         arcs=sum(len(arcs) for arcs in up) + sum(len(arcs) for arcs in down))
+        return cls(metro_graph, graphs)
+
+    def save(self, path, key):
+        compiled = self.compiled
+        meta = json.dumps({
+            'names': compiled.names,
+            'criteria': list(self.criteria),
+            'arcs': {name: [len(up[1]), len(down[1])] for name, (up, down) in self.graphs.items()},
+        }).encode('utf-8')
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, key, len(compiled), len(compiled.targets), len(meta)))
+            f.write(meta.ljust(_padded(len(meta)), b'\0'))
+            for up, down in self.graphs.values():
+                for block in (*up, *down):
+                    data = block.tobytes()
+                    f.write(data.ljust(_padded(len(data)), b'\0'))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, metro_graph, path, key):
+        compiled = metro_graph._compiled()
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version, file_key, n, edge_count, meta_size = HEADER.unpack_from(data)
+        offset = HEADER.size
+        meta = json.loads(data[offset:offset + meta_size].decode('utf-8')) if magic == MAGIC else {}
+        if (magic != MAGIC or version != VERSION or file_key != key or meta['names'] != compiled.names
+                or edge_count != len(compiled.targets)):
+            raise ValueError(f"Contraction hierarchy {path} does not match the current network")
+        offset += _padded(meta_size)
+
+        def read(typecode, count):
+            nonlocal offset
+            block = array(typecode)
+            block.frombytes(data[offset:offset + block.itemsize * count])
+            offset += _padded(block.itemsize * count)
+            return block
+
+        graphs = {}
+        for name in meta['criteria']:
+            graphs[name] = tuple((read('i', n + 1), read('i', m), read('d', m), read('i', m))
+                                 for m in meta['arcs'][name])
+        return cls(metro_graph, graphs)
+
+    def _query(self, criteria, source, target):
+        """Bidirectional upward search; returns (total, meeting station, (forward, backward) preds, dists)."""
+        (up_offsets, up_ends, up_weights, _), (down_offsets, down_ends, down_weights, _) = self.graphs[criteria]
+        heappush, heappop = heapq.heappush, heapq.heappop
+        dist = ({source: 0}, {target: 0})
+        pred = ({source: None}, {target: None})  # station -> (station it was reached from, arc)
+        heaps = ([(0, source)], [(0, target)])
+        arrays = ((up_offsets, up_ends, up_weights), (down_offsets, down_ends, down_weights))
+        best, meeting = (0, source) if source == target else (INF, -1)
+        while True:
+            tops = [heap[0][0] if heap else INF for heap in heaps]
+            side = 0 if tops[0] <= tops[1] else 1
+            if tops[side] >= best:
+                break  # neither side can still improve on the best meeting
+            weight, node = heappop(heaps[side])
+            own, other = dist[side], dist[1 - side]
+            if weight > own[node]:
+                continue
+            if node in other and weight + other[node] < best:
+                best, meeting = weight + other[node], node
+            offsets, ends, weights = arrays[side]
+            heap, preds = heaps[side], pred[side]
+            for arc in range(offsets[node], offsets[node + 1]):
+                neighbor = ends[arc]
+                new_weight = weight + weights[arc]
+                if new_weight < own.get(neighbor, INF):
+                    own[neighbor] = new_weight
+                    preds[neighbor] = (node, arc)
+                    heappush(heap, (new_weight, neighbor))
+        return best, meeting, pred, dist
+
+    def _unpack(self, criteria, tail, head, weight_arc):
+        """Compiled edge ids along the arc ``tail -> head`` (a shortcut or an original edge)."""
+        (up_offsets, up_ends, _, up_via), (down_offsets, down_ends, _, down_via) = self.graphs[criteria]
+        edges = []
+        stack = [(tail, head, weight_arc)]
+        while stack:
+            tail, head, via = stack.pop()
+            if via < 0:
+                edges.append(~via)
+                continue
+            # The bypassed station was contracted first, so both halves are stored
+            # on it: ``tail -> via`` among its downward arcs, ``via -> head`` upward
+            second = next(up_via[arc] for arc in range(up_offsets[via], up_offsets[via + 1]) if up_ends[arc] == head)
+            first = next(down_via[arc] for arc in range(down_offsets[via], down_offsets[via + 1])
+                         if down_ends[arc] == tail)
+            stack.append((via, head, second))
+            stack.append((tail, via, first))
+        return edges
+
+    def route(self, start, end, criteria='time', avoid=()):
+        """Route in the ``MetroGraph.dijkstra`` format; ``STALE_ROUTE`` if it uses an edge in ``avoid``."""
+        metro_graph, compiled = self.metro_graph, self.compiled
+        if criteria not in self.graphs:
+            raise ValueError("Invalid criteria.")
+        source = compiled.index.get(start)
+        target = compiled.index.get(end)
+        if source is None or target is None:
+            return metro_graph._unroutable(start, end)
+
+        profiler = metro_graph.profiler
+        started = perf_counter() if profiler is not None else 0
+        best, meeting, (forward, backward), dist = self._query(criteria, source, target)
+        if profiler is not None:
+            profiler.add('ch_query', perf_counter() - started, nodes_settled=len(dist[0]) + len(dist[1]))
+        if best == INF:
+            return None
+
+        up_via, down_via = self.graphs[criteria][0][3], self.graphs[criteria][1][3]
+        arcs = []  # (tail, head, via) from source to target
+        node = meeting
+        while forward[node] is not None:
+            tail, arc = forward[node]
+            arcs.append((tail, node, up_via[arc]))
+            node = tail
+        arcs.reverse()
+        node = meeting
+        while backward[node] is not None:
+            head, arc = backward[node]  # downward arcs point back toward the target
+            arcs.append((node, head, down_via[arc]))
+            node = head
+
+        edges = []
+        for tail, head, via in arcs:
+            edges.extend(self._unpack(criteria, tail, head, via))
+        if avoid and any(edge in avoid for edge in edges):
+            return STALE_ROUTE
+        return metro_graph._route_from_edges(compiled, source, edges)
+
+
+def load_or_build_hierarchy(metro_graph, key, cache_dir, criteria=CRITERIA):
+    """Open the cached hierarchy for ``key``, rebuilding it (and dropping stale ones) if needed."""
+    path = hierarchy_path(cache_dir, key)
+    if os.path.exists(path):
+        try:
+            hierarchy = ContractionHierarchy.load(metro_graph, path, key)
+            if set(criteria) <= set(hierarchy.criteria):
+                return hierarchy
+        except (ValueError, KeyError, struct.error, OSError) as e:
+            print(f"Rebuilding contraction hierarchy: {e}")
+
+    os.makedirs(cache_dir, exist_ok=True)
+    for stale in glob.glob(os.path.join(cache_dir, 'hierarchy_*.bin')):
+        if stale != path:
+            os.remove(stale)
+    hierarchy = ContractionHierarchy.build(metro_graph, criteria)
+    hierarchy.save(path, key)
+    return hierarchy
+
+
+if __name__ == "__main__":
+    from app import CACHE_DIR, load_metro_data, network_digest
+
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else 'metro_normalized.csv'
+    hierarchy = load_or_build_hierarchy(load_metro_data(csv_path), network_digest(csv_path), CACHE_DIR)
+    print(f"Contraction hierarchy for {len(hierarchy)} stations, "
+          f"{', '.join(f'{name}: {hierarchy.arc_count(name)} arcs' for name in hierarchy.criteria)}")
@@ -0,0 +1,287 @@
+"""Tk desktop front end for the metro route optimizer.
+
+Route searches and map rendering run on a single background worker thread;
+results are handed back to the Tk thread by polling with ``root.after``.
+"""
+import os
+import tkinter as tk
+import webbrowser
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import ttk, messagebox
+
+from app import CRITERIA_LABELS, format_route, parse_transfer_penalty
+from timetable import parse_clock
+
+POLL_MS = 50  # how often the Tk thread checks background jobs
+SUGGESTION_LIMIT = 15  # stations listed in a combobox while typing
+
+
+class MetroRouteOptimizerApp:
+    def __init__(self, root, metro_graph):
+        self.root = root
+        self.metro_graph = metro_graph
+        self.root.title("Metro Route Optimizer")
+        
+        # Make window larger
+        self.root.geometry("800x700")
+        
+        # One worker keeps MetroGraph (and its route cache) off the Tk thread
+        # without ever being used from two threads at once
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.jobs = {}  # job kind -> Future; a newer job of the same kind supersedes the old one
+        self.station_names = sorted(self.metro_graph.stations)
+        
+        self.setup_ui()
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+    
+    def setup_ui(self):
+        # Create main container
+        main_frame = ttk.Frame(self.root, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        
+        # Input frame
+        input_frame = ttk.LabelFrame(main_frame, text="Route Options", padding="10")
+        input_frame.pack(fill=tk.X, pady=5)
+        
+        ttk.Label(input_frame, text="From Station:").grid(row=0, column=0, sticky=tk.W, padx=5, pady=5)
+        self.from_station = ttk.Combobox(input_frame, values=self.station_names)
+        self.from_station.grid(row=0, column=1, sticky=tk.EW, padx=5, pady=5)
+        
+        ttk.Label(input_frame, text="To Station:").grid(row=1, column=0, sticky=tk.W, padx=5, pady=5)
+        self.to_station = ttk.Combobox(input_frame, values=self.station_names)
+        self.to_station.grid(row=1, column=1, sticky=tk.EW, padx=5, pady=5)
+        
+        for combobox in (self.from_station, self.to_station):
+            combobox.bind('<<ComboboxSelected>>', self.on_station_change)
+            combobox.bind('<KeyRelease>', self.on_station_typed)
+        
+        ttk.Label(input_frame, text="Optimize By:").grid(row=2, column=0, sticky=tk.W, padx=5, pady=5)
+        self.criteria = ttk.Combobox(input_frame, values=list(CRITERIA_LABELS), state='readonly')
+        self.criteria.current(0)
+        self.criteria.grid(row=2, column=1, sticky=tk.EW, padx=5, pady=5)
+        
+        ttk.Label(input_frame, text="Depart At (HH:MM):").grid(row=3, column=0, sticky=tk.W, padx=5, pady=5)
+        self.depart = ttk.Entry(input_frame)  # empty: static route ignoring the timetable
+        self.depart.grid(row=3, column=1, sticky=tk.EW, padx=5, pady=5)
+        
+        ttk.Label(input_frame, text="Transfer Penalty:").grid(row=4, column=0, sticky=tk.W, padx=5, pady=5)
+        self.transfer_penalty = ttk.Entry(input_frame)  # empty: line changes cost nothing extra
+        self.transfer_penalty.grid(row=4, column=1, sticky=tk.EW, padx=5, pady=5)
+        
+        button_frame = ttk.Frame(input_frame)
+        button_frame.grid(row=5, column=0, columnspan=2, pady=10)
+        
+        find_route_btn = ttk.Button(button_frame, text="Find Optimal Route", command=self.find_route)
+        find_route_btn.pack(side=tk.LEFT, padx=5)
+        
+        self.show_route_map_btn = ttk.Button(button_frame, text="Show Route on Map", command=self.show_route_map, state=tk.DISABLED)
+        self.show_route_map_btn.pack(side=tk.LEFT, padx=5)
+        
+        self.show_full_map_btn = ttk.Button(button_frame, text="Show Full Metro Map", command=self.show_full_map)
+        self.show_full_map_btn.pack(side=tk.LEFT, padx=5)
+        
+        # Progress indication for background jobs
+        status_frame = ttk.Frame(input_frame)
+        status_frame.grid(row=6, column=0, columnspan=2, sticky=tk.EW)
+        self.progress = ttk.Progressbar(status_frame, mode='indeterminate', length=150)
+        self.progress.pack(side=tk.LEFT, padx=5)
+        self.status = ttk.Label(status_frame, text="")
+        self.status.pack(side=tk.LEFT, padx=5)
+        
+        # Results frame
+        results_frame = ttk.LabelFrame(main_frame, text="Route Details", padding="10")
+        results_frame.pack(fill=tk.BOTH, expand=True, pady=5)
+        
+        self.results_text = tk.Text(results_frame, height=15, wrap=tk.WORD)
+        self.results_text.pack(fill=tk.BOTH, expand=True)
+        
+        scrollbar = ttk.Scrollbar(results_frame, orient=tk.VERTICAL, command=self.results_text.yview)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.results_text['yscrollcommand'] = scrollbar.set
+        
+        self.current_route = None
+    
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.root.destroy()
+    
+    def submit(self, kind, status, func, *args, on_done, on_error=None):
+        """Run ``func(*args)`` on the worker and pass its result to ``on_done`` on the Tk thread.
+        
+        Submitting a job cancels any earlier job of the same ``kind``.
+        """
+        self.cancel(kind)
+        future = self.executor.submit(func, *args)
+        self.jobs[kind] = future
+        self.update_progress(status)
+        self.root.after(POLL_MS, self.poll, kind, future, on_done, on_error)
+    
+    def poll(self, kind, future, on_done, on_error):
+        if self.jobs.get(kind) is not future:
+            return  # superseded or cancelled; its result is dropped
+        if not future.done():
+            self.root.after(POLL_MS, self.poll, kind, future, on_done, on_error)
+            return
+        
+        del self.jobs[kind]
+        self.update_progress()
+        try:
+            result = future.result()
+        except Exception as e:
+            messagebox.showerror("Error", f"An error occurred: {str(e)}")
+            if on_error:
+                on_error()
+            return
+        on_done(result)
+    
+    def cancel(self, *kinds):
+        """Cancel pending jobs; a job already running finishes but its result is ignored."""
+        cancelled = False
+        for kind in kinds:
+            future = self.jobs.pop(kind, None)
+            if future is not None:
+                future.cancel()
+                cancelled = True
+        if cancelled:
+            self.update_progress("Cancelled")
+        return cancelled
+    
+    def update_progress(self, status=None):
+        if self.jobs:
+            self.progress.start(10)
+        else:
+            self.progress.stop()
+        if status is not None or not self.jobs:
+            self.status.config(text=status or "")
+    
+    def on_station_change(self, event=None):
+        # Results for the previous stations are no longer wanted
+        self.cancel('route', 'route_map')
+    
+    def on_station_typed(self, event):
+        combobox = event.widget
+        text = combobox.get()
+        if text.strip():
+            combobox['values'] = self.metro_graph.search_stations(text, SUGGESTION_LIMIT)
+        else:
+            combobox['values'] = self.station_names
+        self.on_station_change()
+    
+    def resolve_station(self, combobox):
+        """Replace a partial or misspelled entry with the station it names; None if it names none."""
+        text = combobox.get()
+        station = self.metro_graph.resolve_station(text)
+        if station is None:
+            suggestions = self.metro_graph.search_stations(text, 5)
+            hint = f"\n\nDid you mean: {', '.join(suggestions)}?" if suggestions else ""
+            messagebox.showerror("Error", f"Unknown station: {text}{hint}")
+        elif station != text:
+            combobox.set(station)
+        return station
+    
+    def find_route(self):
+        if not self.from_station.get() or not self.to_station.get():
+            messagebox.showerror("Error", "Please select both from and to stations.")
+            return
+        
+        from_station = self.resolve_station(self.from_station)
+        to_station = from_station and self.resolve_station(self.to_station)
+        criteria = self.criteria.get()
+        if not from_station or not to_station:
+            return
+        if criteria not in CRITERIA_LABELS:
+            messagebox.showerror("Error", f"Unknown criteria: {criteria}. Choose one from the list.")
+            return
+        
+        depart = self.depart.get().strip() or None
+        if depart:
+            try:
+                parse_clock(depart)
+            except ValueError:
+                messagebox.showerror("Error", f"Invalid departure time: {depart}. Use HH:MM.")
+                return
+            if CRITERIA_LABELS[criteria] != 'time':
+                messagebox.showerror("Error", "A departure time can only be used with Minimum Time.")
+                return
+        
+        transfer_penalty = self.transfer_penalty.get().strip() or None
+        if transfer_penalty:
+            try:
+                transfer_penalty = parse_transfer_penalty(transfer_penalty)
+            except ValueError:
+                messagebox.showerror("Error", f"Invalid transfer penalty: {transfer_penalty}. "
+                                              "Use a number of 0 or more.")
+                return
+            if depart:
+                messagebox.showerror("Error", "A departure time already includes the time spent changing "
+                                              "trains; clear the transfer penalty.")
+                return
+        
+        if from_station == to_station:
+            messagebox.showerror("Error", "From and To stations cannot be the same.")
+            return
+        
+        self.show_route_map_btn.config(state=tk.DISABLED)
+        self.submit('route', "Finding route...", self.compute_route, from_station, to_station, criteria, depart,
+                    transfer_penalty, on_done=lambda result: self.show_route(from_station, to_station, *result),
+                    on_error=self.clear_route)
+    
+    def compute_route(self, from_station, to_station, criteria, depart=None, transfer_penalty=None):
+        """Worker side of find_route: the route and its formatted directions."""
+        if depart:
+            result = self.metro_graph.route_at(from_station, to_station, depart)
+            criteria = f"Earliest Arrival, leaving {depart}"
+        else:
+            result = self.metro_graph.route(from_station, to_station, CRITERIA_LABELS[criteria], transfer_penalty)
+            if transfer_penalty is not None:
+                criteria += f", {transfer_penalty:g} per transfer"
+        if not result:
+            return result, self.metro_graph.no_route_message(from_station, to_station, depart)
+        return result, format_route(self.metro_graph, result, criteria)
+    
+    def show_route(self, from_station, to_station, result, text):
+        self.results_text.delete(1.0, tk.END)
+        if not result:
+            self.results_text.insert(tk.END, text)
+            self.clear_route()
+            return
+        
+        self.current_route = result
+        self.results_text.insert(tk.END, text)
+        self.show_route_map_btn.config(state=tk.NORMAL)
+    
+    def clear_route(self):
+        self.show_route_map_btn.config(state=tk.DISABLED)
+        self.current_route = None
+    
+    def show_route_map(self):
+        if not self.current_route:
+            messagebox.showinfo("Info", "No route to show on map. Please find a route first.")
+            return
+        
+        self.submit('route_map', "Rendering route map...", self.render_route_map, self.current_route,
+                    on_done=lambda file_path: self.open_map(file_path, "Could not generate map for the route."))
+    
+    def render_route_map(self, route):
+        m = self.metro_graph.generate_route_map(route)
+        if not m:
+            return None
+        file_path = "route_map.html"
+        m.save(file_path)
+        return file_path
+    
+    def show_full_map(self):
+        self.submit('full_map', "Rendering full map...", self.metro_graph.save_full_map, "full_metro_map.html",
+                    on_done=lambda file_path: self.open_map(file_path, "Could not generate full metro map."))
+    
+    def open_map(self, file_path, error):
+        if file_path:
+            webbrowser.open('file://' + os.path.realpath(file_path))
+        else:
+            messagebox.showerror("Error", error)
+
+
+def run_gui(metro_graph):
+    root = tk.Tk()
+    app = MetroRouteOptimizerApp(root, metro_graph)
+    root.mainloop()
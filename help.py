@@ -1,53 +1,289 @@
-import pandas as pd
+"""Geocode metro stations into station_coords.json and write them back into the network CSV.
+
+Lookups run on a small thread pool behind a token-bucket rate limiter, so the
+provider's request limit is kept without fixed sleeps. The coordinate cache
+is checkpointed atomically as results arrive, so an interrupted run resumes
+where it stopped. Coordinates shared by several stations are placeholders
+(a generic match such as "Noida, India"); those stations are looked up
+again and any result equal to a placeholder is rejected.
+
+    python help.py [--backend nominatim|fixture] [--rate 1] [--workers 4]
+
+The fixture backend answers from an existing coordinates file, for offline
+runs and testing.
+"""
+import argparse
+import csv
 import json
-import time
 import os
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-# Load or create cache
+NETWORK_CSV = 'metro_normalized.csv'
 COORDS_FILE = "station_coords.json"
-if os.path.exists(COORDS_FILE):
-    with open(COORDS_FILE, "r") as f:
-        station_coords = json.load(f)
-else:
-    station_coords = {}
-
-# Load stations
-df = pd.read_csv("metro.csv")
-stations = set(df['From Station']).union(set(df['To Station']))
-
-geolocator = Nominatim(user_agent="metro-route-optimizer")
-
-def geocode_station(station):
-    queries = [
-        f"{station} Metro Station, Delhi, India",
-        f"{station}, Delhi Metro",
-        f"{station}, India"
-    ]
-    for query in queries:
+QUERY_TEMPLATES = (
+    "{station} Metro Station, Delhi, India",
+    "{station}, Delhi Metro",
+    "{station}, India",
+)
+DELHI_NCR_BOUNDS = (28.2, 76.7, 29.0, 77.6)  # (min lat, min lon, max lat, max lon) of the network
+COORD_COLUMNS = {'From Station': ('From Lat', 'From Lon'), 'To Station': ('To Lat', 'To Lon')}
+
+
+class GeocodeError(Exception):
+    """A transient backend failure (timeout, service error); the next query is tried."""
+
+
+class NominatimBackend:
+    """OpenStreetMap Nominatim through geopy (limit 1 request per second)."""
+
+    def __init__(self, user_agent="metro-route-optimizer", timeout=10):
+        from geopy.exc import GeocoderServiceError, GeocoderTimedOut
+        from geopy.geocoders import Nominatim
+
+        self.geolocator = Nominatim(user_agent=user_agent)
+        self.timeout = timeout
+        self.errors = (GeocoderTimedOut, GeocoderServiceError)
+
+    def geocode(self, query):
+        """Return (lat, lon) for ``query`` or None if nothing matches."""
+        try:
+            location = self.geolocator.geocode(query, timeout=self.timeout)
+        except self.errors as e:
+            raise GeocodeError(str(e)) from e
+        return (location.latitude, location.longitude) if location else None
+
+
+class FixtureBackend:
+    """Answer queries from a coordinates file in the station_coords.json format.
+
+    ``latency`` seconds are slept per query to stand in for a network round trip.
+    """
+
+    def __init__(self, path=COORDS_FILE, latency=0.0):
+        with open(path, encoding='utf-8') as f:
+            self.coords = {station: (coord['lat'], coord['lon'])
+                           for station, coord in json.load(f).items() if coord}
+        self.latency = latency
+
+    def geocode(self, query):
+        if self.latency:
+            time.sleep(self.latency)
+        for template in QUERY_TEMPLATES:
+            prefix, suffix = template.split('{station}')
+            if query.startswith(prefix) and query.endswith(suffix):
+                station = query[len(prefix):len(query) - len(suffix)]
+                if station in self.coords:
+                    return self.coords[station]
+        return None
+
+
+BACKENDS = {'nominatim': NominatimBackend, 'fixture': FixtureBackend}
+
+
+class TokenBucket:
+    """Thread-safe token bucket: ``rate`` requests per second with bursts of up to ``capacity``."""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent, sleeping only as long as the bucket needs to refill."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class CoordinateCache:
+    """Station -> {'lat', 'lon'} (or None) backed by a JSON file that is replaced atomically."""
+
+    def __init__(self, path=COORDS_FILE):
+        self.path = path
+        self.coords = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.coords = json.load(f)
+        self.dirty = 0
+
+    def __getitem__(self, station):
+        return self.coords.get(station)
+
+    def __setitem__(self, station, coord):
+        self.coords[station] = {"lat": coord[0], "lon": coord[1]} if coord else None
+        self.dirty += 1
+
+    def placeholders(self):
+        """Coordinates shared by more than one station, mapped to the stations sharing them."""
+        stations = defaultdict(list)
+        for station, coord in self.coords.items():
+            if coord:
+                stations[(coord['lat'], coord['lon'])].append(station)
+        return {coord: names for coord, names in stations.items() if len(names) > 1}
+
+    def checkpoint(self):
+        if not self.dirty:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.coords, f, indent=4, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self.dirty = 0
+
+
+def in_bounds(coord, bounds):
+    min_lat, min_lon, max_lat, max_lon = bounds
+    return min_lat <= coord[0] <= max_lat and min_lon <= coord[1] <= max_lon
+
+
+def geocode_station(backend, limiter, station, reject=frozenset(), bounds=DELHI_NCR_BOUNDS):
+    """Try each query template in turn; return (lat, lon) or None.
+
+    Results in ``reject`` (known placeholders) or outside ``bounds`` are skipped.
+    """
+    for template in QUERY_TEMPLATES:
+        query = template.format(station=station)
+        limiter.acquire()
         try:
-            print(f"🔍 Trying: {query}")
-            location = geolocator.geocode(query, timeout=10)
-            if location:
-                print(f"✅ Found: {station} → {location.latitude}, {location.longitude}")
-                return {"lat": location.latitude, "lon": location.longitude}
-        except (GeocoderTimedOut, GeocoderServiceError) as e:
+            coord = backend.geocode(query)
+        except GeocodeError as e:
             print(f"⚠️ Error: {station} – {e}")
-        time.sleep(1)
+            continue
+        if coord is None:
+            continue
+        coord = (coord[0], coord[1])
+        if coord in reject or (bounds and not in_bounds(coord, bounds)):
+            print(f"↪️ Rejected: {query} → {coord[0]}, {coord[1]}")
+            continue
+        print(f"✅ Found: {station} → {coord[0]}, {coord[1]}")
+        return coord
     print(f"❌ Not found: {station}")
     return None
 
-# Main loop
-for station in stations:
-    if station_coords.get(station):
-        print(f"✅ Cached: {station}")
-        continue
-    station_coords[station] = geocode_station(station)
-    time.sleep(1)
 
-# Save results
-with open(COORDS_FILE, "w") as f:
-    json.dump(station_coords, f, indent=4)
+def geocode_stations(stations, backend, cache, rate=1.0, workers=4, checkpoint_every=10, bounds=DELHI_NCR_BOUNDS):
+    """Geocode every station not yet in ``cache`` (or cached at a placeholder), checkpointing as results arrive.
+
+    Returns the number of stations looked up.
+    """
+    placeholders = cache.placeholders()
+    shared = {station for names in placeholders.values() for station in names}
+    pending = sorted(station for station in stations if not cache[station] or station in shared)
+    print(f"🗺️ {len(stations) - len(pending)} stations cached, {len(pending)} to geocode "
+          f"({len(shared & set(pending))} at placeholder coordinates)")
+    if not pending:
+        return 0
+
+    limiter = TokenBucket(rate)
+    reject = frozenset(placeholders)
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = {executor.submit(geocode_station, backend, limiter, station, reject, bounds): station
+                   for station in pending}
+        for future in as_completed(futures):
+            station, coord = futures[future], future.result()
+            # A station that stays unresolved keeps its placeholder, so it is still
+            # recognized (and rejected) as one on the next run
+            if coord or station not in shared:
+                cache[station] = coord
+            if cache.dirty >= checkpoint_every:
+                cache.checkpoint()
+    finally:
+        # Keep whatever finished, even on Ctrl-C or a crash
+        executor.shutdown(wait=False, cancel_futures=True)
+        cache.checkpoint()
+    return len(pending)
+
+
+def read_stations(csv_path):
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        return {row[column].strip() for row in reader for column in COORD_COLUMNS}
+
+
+def write_csv_coords(csv_path, cache, out_path=None, blank_placeholders=False):
+    """Rewrite the lat/lon columns of ``csv_path`` from ``cache``.
+
+    Stations without coordinates get empty cells. Stations still sharing a
+    placeholder coordinate keep it unless ``blank_placeholders`` is set, as
+    A* and the maps need every station to have a position. Returns the
+    number of rows whose coordinates changed.
+    """
+    out_path = out_path or csv_path
+    placeholders = set(cache.placeholders()) if blank_placeholders else set()
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        fieldnames = reader.fieldnames
+        rows = list(reader)
+    for columns in COORD_COLUMNS.values():
+        for column in columns:
+            if column not in fieldnames:
+                fieldnames.append(column)
+
+    changed = 0
+    for row in rows:
+        before = [row.get(column) for columns in COORD_COLUMNS.values() for column in columns]
+        for station_column, (lat_column, lon_column) in COORD_COLUMNS.items():
+            coord = cache[row[station_column].strip()]
+            coord = (coord['lat'], coord['lon']) if coord else None
+            row[lat_column], row[lon_column] = (coord if coord and coord not in placeholders else ('', ''))
+        after = [str(row[column]) for columns in COORD_COLUMNS.values() for column in columns]
+        changed += before != after
+
+    tmp_path = f"{out_path}.tmp"
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp_path, out_path)
+    return changed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Geocode metro stations and write coordinates into the network CSV.")
+    parser.add_argument('--csv', default=NETWORK_CSV, help="network CSV to read stations from and update")
+    parser.add_argument('--coords', default=COORDS_FILE, help="coordinate cache (JSON), checkpointed as it fills")
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='nominatim')
+    parser.add_argument('--fixture', default=COORDS_FILE, help="coordinates file answering the fixture backend")
+    parser.add_argument('--rate', type=float, default=1.0, help="requests per second (Nominatim allows 1)")
+    parser.add_argument('--workers', type=int, default=4, help="concurrent lookups")
+    parser.add_argument('--no-write-csv', action='store_true', help="only update the coordinate cache")
+    parser.add_argument('--blank-placeholders', action='store_true',
+                        help="write empty cells for stations still at a shared placeholder coordinate "
+                             "(A* and the maps then leave them out)")
+    args = parser.parse_args(argv)
+
+    backend = FixtureBackend(args.fixture) if args.backend == 'fixture' else NominatimBackend()
+    cache = CoordinateCache(args.coords)
+    stations = read_stations(args.csv)
+    start = time.perf_counter()
+    looked_up = geocode_stations(stations, backend, cache, args.rate, args.workers)
+    print(f"\n🗺️ Geocoded {looked_up} stations in {time.perf_counter() - start:.1f} s; "
+          f"coordinates saved to {args.coords}.")
+
+    missing = sorted(station for station in stations if not cache[station])
+    if missing:
+        print(f"❌ No coordinates for {len(missing)} stations: {', '.join(missing)}")
+    for coord, names in sorted(cache.placeholders().items()):
+        print(f"⚠️ Placeholder {coord[0]}, {coord[1]} still shared by: {', '.join(sorted(names))}")
+    if not args.no_write_csv:
+        changed = write_csv_coords(args.csv, cache, blank_placeholders=args.blank_placeholders)
+        print(f"📝 Updated coordinates in {changed} rows of {args.csv}.")
+        if cache.placeholders() and not args.blank_placeholders:
+            print("⚠️ Placeholder coordinates were kept in the CSV; pass --blank-placeholders to clear them.")
+
 
-print("\n🗺️ Done! Coordinates saved to station_coords.json.")
+if __name__ == "__main__":
+    main()
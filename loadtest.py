@@ -0,0 +1,106 @@
+"""Load test for the routing service (service.py).
+
+Opens ``--connections`` keep-alive connections that issue random route
+queries for ``--duration`` seconds, then reports throughput and p50/p99
+latency. Pass ``--spawn`` to start a local service instance first.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import subprocess
+import sys
+import time
+from urllib.parse import urlencode
+
+from route_table import CRITERIA
+
+
+async def request(reader, writer, target):
+    """Send one GET on an open connection and return (status, body)."""
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode('latin-1'))
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+async def worker(host, port, stations, deadline, latencies, statuses, rng, hot_pairs):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            start, end = rng.choice(hot_pairs) if hot_pairs and rng.random() < 0.5 else rng.sample(stations, 2)
+            target = '/route?' + urlencode({'from': start, 'to': end, 'criteria': rng.choice(CRITERIA)})
+            started = time.perf_counter()
+            status, _ = await request(reader, writer, target)
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def run(args):
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    _, body = await request(reader, writer, '/stations')
+    writer.close()
+    stations = json.loads(body)['stations']
+
+    rng = random.Random(args.seed)
+    hot_pairs = [tuple(rng.sample(stations, 2)) for _ in range(args.hot_pairs)]
+    latencies, statuses = [], {}
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*(
+        worker(args.host, args.port, stations, deadline, latencies, statuses, random.Random(args.seed + i), hot_pairs)
+        for i in range(args.connections)
+    ))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"{len(latencies)} requests over {args.connections} connections in {elapsed:.1f} s")
+    print(f"throughput  {len(latencies) / elapsed:10.1f} req/s")
+    print(f"p50         {statistics.median(latencies) * 1e3:10.2f} ms")
+    print(f"p99         {latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e3:10.2f} ms")
+    print("statuses   ", dict(sorted(statuses.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--connections', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds to run")
+    parser.add_argument('--hot-pairs', type=int, default=20,
+                        help="popular pairs that make up half the queries (exercises coalescing/caching)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--spawn', action='store_true', help="start service.py on --port for the test")
+    parser.add_argument('--workers', type=int, default=None, help="worker count for a spawned service")
+    args = parser.parse_args()
+
+    server = None
+    if args.spawn:
+        command = [sys.executable, 'service.py', '--host', args.host, '--port', str(args.port)]
+        if args.workers:
+            command += ['--workers', str(args.workers)]
+        server = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        for line in server.stdout:  # wait until the service is listening
+            if line.startswith('Serving'):
+                break
+    try:
+        asyncio.run(run(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Opt-in instrumentation for MetroGraph's hot paths.
+
+Attach a Profiler with ``MetroGraph.enable_profiling()`` (or pass one to
+``load_metro_data``) and every search, route reconstruction, compile and
+load phase adds its wall time and counters (nodes expanded, heap pushes,
+stale heap pops, cache hits) to it. With no profiler attached the hot paths
+skip all timing.
+"""
+import json
+from collections import defaultdict
+from contextlib import contextmanager
+from time import perf_counter
+
+
+class Profiler:
+    """Per-phase call counts, wall time and counters."""
+
+    def __init__(self):
+        self.phases = defaultdict(lambda: defaultdict(float))
+
+    def add(self, phase, seconds, **counters):
+        stats = self.phases[phase]
+        stats['calls'] += 1
+        stats['seconds'] += seconds
+        for name, value in counters.items():
+            stats[name] += value
+
+    @contextmanager
+    def phase(self, name, **counters):
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, perf_counter() - started, **counters)
+
+    def reset(self):
+        self.phases.clear()
+
+    def as_dict(self):
+        """``{phase: {'calls', 'seconds', 'mean_us', counter totals and per-call means}}``."""
+        report = {}
+        for phase, stats in sorted(self.phases.items()):
+            calls = int(stats['calls'])
+            entry = {'calls': calls, 'seconds': stats['seconds'], 'mean_us': stats['seconds'] / calls * 1e6}
+            for name, value in stats.items():
+                if name not in ('calls', 'seconds'):
+                    entry[name] = int(value) if float(value).is_integer() else value
+                    entry[f'{name}_per_call'] = value / calls
+            report[phase] = entry
+        return report
+
+    def to_json(self, path=None):
+        """The report as JSON text, also written to ``path`` if given."""
+        text = json.dumps(self.as_dict(), indent=2)
+        if path is not None:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text + "\n")
+        return text
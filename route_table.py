@@ -0,0 +1,161 @@
+"""Precomputed all-pairs route table with a memory-mapped on-disk cache.
+
+For every criteria the table stores an ``n x n`` matrix of shortest-path
+totals and an ``n x n`` matrix of first edges: ``next_edge[s * n + t]`` is
+the compiled edge id leaving ``s`` on a shortest route to ``t``. Following
+first edges hop by hop rebuilds a route in O(path length).
+
+File layout (native byte order, every block padded to 8 bytes)::
+
+    header | station names (JSON) | per criteria: next_edge int32[n*n], dist float64[n*n]
+
+The header carries a caller supplied 32-byte key (a hash of the network
+CSV and loader settings); a table whose key differs is treated as stale.
+"""
+import glob
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+CRITERIA = ('time', 'distance', 'cost')  # every routing criteria; the other modules import it from here
+STALE_ROUTE = object()  # returned by RouteTable.route when the stored route uses an avoided edge
+MAGIC = b'MRTB'
+VERSION = 1
+HEADER = struct.Struct('<4sI32sIII')  # magic, version, key, stations, edges, names length
+
+
+def _padded(size):
+    return (size + 7) & ~7
+
+
+def table_path(cache_dir, key):
+    return os.path.join(cache_dir, f"route_table_{key.hex()[:16]}.bin")
+
+
+class RouteTable:
+    """Read-only all-pairs route table backed by a memory-mapped file."""
+
+    def __init__(self, metro_graph, path, key):
+        self.metro_graph = metro_graph
+        self.compiled = metro_graph._compiled()
+        self.path = path
+
+        self.next_edge = {}
+        self.dist = {}
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = view = memoryview(self._mmap)
+
+        magic, version, file_key, n, edge_count, names_size = HEADER.unpack_from(view)
+        offset = HEADER.size
+        if (magic != MAGIC or version != VERSION or file_key != key
+                or json.loads(bytes(view[offset:offset + names_size]).decode('utf-8')) != self.compiled.names
+                or edge_count != len(self.compiled.targets)):
+            self.close()
+            raise ValueError(f"Route table {path} does not match the current network")
+        offset += _padded(names_size)
+
+        self.size = n
+        for criteria in CRITERIA:
+            self.next_edge[criteria] = view[offset:offset + 4 * n * n].cast('i')
+            offset += _padded(4 * n * n)
+            self.dist[criteria] = view[offset:offset + 8 * n * n].cast('d')
+            offset += _padded(8 * n * n)
+
+    @classmethod
+    def build(cls, metro_graph, path, key):
+        """Compute every shortest-path tree and write the table to ``path``."""
+        compiled = metro_graph._compiled()
+        n = len(compiled)
+        names = json.dumps(compiled.names).encode('utf-8')
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, key, n, len(compiled.targets), len(names)))
+            f.write(names.ljust(_padded(len(names)), b'\0'))
+            for criteria in CRITERIA:
+                next_edge = array('i', [-1]) * (n * n)
+                dist = array('d', [float('inf')]) * (n * n)
+                for source in range(n):
+                    tree = metro_graph._search(compiled, source, criteria)
+                    row = source * n
+                    # Nodes are settled after their predecessor, so one pass over the
+                    # settle order propagates the first edge out of the source
+                    for node in tree.order:
+                        dist[row + node] = tree.dist[node]
+                        parent = tree.pred_node[node]
+                        if parent == source:
+                            next_edge[row + node] = tree.pred_edge[node]
+                        elif parent != -1:
+                            next_edge[row + node] = next_edge[row + parent]
+                for block in (next_edge, dist):
+                    data = block.tobytes()
+                    f.write(data.ljust(_padded(len(data)), b'\0'))
+        os.replace(tmp_path, path)
+        return cls(metro_graph, path, key)
+
+    def close(self):
+        for block in (*self.next_edge.values(), *self.dist.values(), self._view):
+            block.release()
+        self.next_edge = {}
+        self.dist = {}
+        self._mmap.close()
+
+    def distance(self, start, end, criteria='time'):
+        """Shortest ``criteria`` total from ``start`` to ``end`` (inf if unreachable)."""
+        index = self.compiled.index
+        return self.dist[criteria][index[start] * self.size + index[end]]
+
+    def route(self, start, end, criteria='time', avoid=()):
+        """Look up a route in the same format as ``MetroGraph.dijkstra``.
+
+        Returns ``STALE_ROUTE`` if the stored route uses an edge in ``avoid``.
+        """
+        compiled = self.compiled
+        if criteria not in self.next_edge:
+            raise ValueError("Invalid criteria.")
+        source = compiled.index.get(start)
+        target = compiled.index.get(end)
+        if source is None or target is None:
+            return self.metro_graph._unroutable(start, end)
+
+        n = self.size
+        next_edge = self.next_edge[criteria]
+        if source != target and next_edge[source * n + target] == -1:
+            return None
+        edges = []
+        node = source
+        while node != target and len(edges) < n:
+            edge = next_edge[node * n + target]
+            if edge in avoid:
+                return STALE_ROUTE
+            edges.append(edge)
+            node = compiled.targets[edge]
+        return self.metro_graph._route_from_edges(compiled, source, edges)
+
+
+def load_or_build_route_table(metro_graph, key, cache_dir):
+    """Open the cached table for ``key``, rebuilding it (and dropping stale ones) if needed."""
+    path = table_path(cache_dir, key)
+    if os.path.exists(path):
+        try:
+            return RouteTable(metro_graph, path, key)
+        except (ValueError, struct.error, OSError) as e:
+            print(f"Rebuilding route table: {e}")
+
+    os.makedirs(cache_dir, exist_ok=True)
+    for stale in glob.glob(os.path.join(cache_dir, 'route_table_*.bin')):
+        if stale != path:
+            os.remove(stale)
+    return RouteTable.build(metro_graph, path, key)
+
+
+if __name__ == "__main__":
+    from app import CACHE_DIR, load_metro_data, network_digest
+
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else 'metro_normalized.csv'
+    table = load_or_build_route_table(load_metro_data(csv_path), network_digest(csv_path), CACHE_DIR)
+    print(f"Route table for {table.size} stations at {table.path}")
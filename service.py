@@ -0,0 +1,258 @@
+"""Local HTTP/JSON routing service on top of MetroGraph.
+
+Endpoints (all GET):
+
+    /stations[?q=text][&limit=10]               sorted station names, or ranked matches for q
+    /route?from=A&to=B[&criteria=time][&transfer_penalty=N]
+    /route?from=A&to=B&depart=HH:MM             earliest arrival on the timetable
+    /map/full                                   full network map (HTML)
+    /map/route?from=A&to=B[&criteria=time]      route map (HTML)
+
+Station names in ``from``/``to`` may be partial or misspelled as long as they
+resolve to a single station (see MetroGraph.resolve_station).
+
+The asyncio event loop only parses requests and writes responses; route
+searches and map rendering run in a worker pool (processes by default),
+and identical requests that arrive while one is in flight share its result.
+Run with ``python service.py [--port 8765] [--workers N] [--threads]``.
+"""
+import asyncio
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from app import parse_transfer_penalty
+from batch import init_worker, worker_graph
+from route_table import CRITERIA, load_or_build_route_table
+from timetable import parse_clock
+
+
+def _find_route(start, end, criteria, transfer_penalty):
+    return worker_graph().route(start, end, criteria, transfer_penalty)
+
+
+def _find_route_at(start, end, departure):
+    """The route_at result, or the reason there is none as a string."""
+    metro_graph = worker_graph()
+    result = metro_graph.route_at(start, end, departure)
+    return result if result is not None else metro_graph.no_route_message(start, end, departure)
+
+
+def _full_map_html():
+    fd, path = tempfile.mkstemp(suffix='.html')
+    os.close(fd)
+    try:
+        if worker_graph().save_full_map(path) is None:
+            return None
+        with open(path, encoding='utf-8') as f:
+            return f.read()
+    finally:
+        os.remove(path)
+
+
+def _route_map_html(start, end, criteria):
+    metro_graph = worker_graph()
+    m = metro_graph.generate_route_map(metro_graph.route(start, end, criteria))
+    return m.get_root().render() if m else None
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class RouteService:
+    """Serve route, station and map requests for one MetroGraph.
+
+    With process workers, pass ``table_key``/``cache_dir`` so each worker
+    opens the precomputed route table; thread workers share ``metro_graph``
+    (and any table already attached to it) directly.
+    """
+
+    def __init__(self, metro_graph, workers=None, use_threads=False, table_key=None, cache_dir=None):
+        self.metro_graph = metro_graph
+        self.stations = set(metro_graph.stations)
+        metro_graph._station_index()  # build before the first request rather than during it
+        self._stations_body = json.dumps({'stations': sorted(metro_graph.stations)}, ensure_ascii=False).encode('utf-8')
+        if use_threads:
+            init_worker(metro_graph)
+            self.executor = ThreadPoolExecutor(workers)
+        else:
+            self.executor = ProcessPoolExecutor(workers, initializer=init_worker,
+                                                initargs=(metro_graph, table_key, cache_dir))
+        self._inflight = {}  # request key -> asyncio.Future shared by identical requests
+        self.coalesced = 0
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+    async def _run(self, key, func, *args):
+        """Run ``func(*args)`` in the pool, sharing the result with identical in-flight requests."""
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, func, *args)
+        self._inflight[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def _station_params(self, params):
+        start, end = params.get('from'), params.get('to')
+        if not start or not end:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "'from' and 'to' are required")
+        stations = []
+        for query in (start, end):
+            station = query if query in self.stations else self.metro_graph.resolve_station(query)
+            if station is None:
+                suggestions = self.metro_graph.search_stations(query, 5)
+                hint = f"; did you mean: {', '.join(suggestions)}?" if suggestions else ""
+                raise HTTPError(HTTPStatus.NOT_FOUND, f"Unknown station: {query}{hint}")
+            stations.append(station)
+        start, end = stations
+        criteria = params.get('criteria', 'time')
+        if criteria not in CRITERIA:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"criteria must be one of {', '.join(CRITERIA)}")
+        return start, end, criteria
+
+    async def dispatch(self, method, target):
+        """Return (status, content type, body bytes) for one request."""
+        if method != 'GET':
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Only GET is supported")
+        url = urlsplit(target)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+
+        if url.path == '/stations':
+            if not params.get('q'):
+                return HTTPStatus.OK, 'application/json', self._stations_body
+            try:
+                limit = int(params.get('limit', 10))
+            except ValueError:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "limit must be an integer")
+            matches = self.metro_graph.search_stations(params['q'], limit)
+            return HTTPStatus.OK, 'application/json', json.dumps({'stations': matches}, ensure_ascii=False).encode('utf-8')
+
+        if url.path == '/route':
+            start, end, criteria = self._station_params(params)
+            departure = params.get('depart')
+            if departure is not None:
+                try:
+                    departure = parse_clock(departure)
+                except ValueError:
+                    raise HTTPError(HTTPStatus.BAD_REQUEST, "depart must be a time as HH:MM")
+                result = await self._run(('route_at', start, end, departure), _find_route_at, start, end,
+                                         departure / 60)
+                if isinstance(result, str):
+                    raise HTTPError(HTTPStatus.NOT_FOUND, result)
+                return HTTPStatus.OK, 'application/json', json.dumps(result, ensure_ascii=False).encode('utf-8')
+            transfer_penalty = params.get('transfer_penalty')
+            try:
+                transfer_penalty = parse_transfer_penalty(transfer_penalty) if transfer_penalty is not None else None
+            except ValueError:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "transfer_penalty must be a finite number >= 0")
+            result = await self._run(('route', start, end, criteria, transfer_penalty),
+                                     _find_route, start, end, criteria, transfer_penalty)
+            if result is None:
+                raise HTTPError(HTTPStatus.NOT_FOUND, f"No route found from {start} to {end}")
+            return HTTPStatus.OK, 'application/json', json.dumps(result, ensure_ascii=False).encode('utf-8')
+
+        if url.path == '/map/full':
+            html = await self._run(('map/full',), _full_map_html)
+        elif url.path == '/map/route':
+            start, end, criteria = self._station_params(params)
+            html = await self._run(('map/route', start, end, criteria), _route_map_html, start, end, criteria)
+        else:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"No such endpoint: {url.path}")
+        if html is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, "Could not generate map")
+        return HTTPStatus.OK, 'text/html; charset=utf-8', html.encode('utf-8')
+
+    async def handle(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection (keep-alive supported)."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                if headers.get('content-length'):
+                    await reader.readexactly(int(headers['content-length']))  # bodies are ignored
+
+                parts = request_line.decode('latin-1').split()
+                keep_alive = (len(parts) == 3 and parts[2] == 'HTTP/1.1'
+                              and headers.get('connection', '').lower() != 'close')
+                try:
+                    if len(parts) != 3:
+                        raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+                    status, content_type, body = await self.dispatch(parts[0], parts[1])
+                except HTTPError as e:
+                    status, content_type = e.status, 'application/json'
+                    body = json.dumps({'error': e.message}, ensure_ascii=False).encode('utf-8')
+                except Exception as e:
+                    status, content_type = HTTPStatus.INTERNAL_SERVER_ERROR, 'application/json'
+                    body = json.dumps({'error': str(e)}, ensure_ascii=False).encode('utf-8')
+
+                writer.write(
+                    f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8765):
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"Serving {len(self.stations)} stations on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    import argparse
+
+    from app import CACHE_DIR, NETWORK_CSV, load_network, network_digest
+
+    parser = argparse.ArgumentParser(description="Local HTTP/JSON metro routing service.")
+    parser.add_argument('--csv', default=NETWORK_CSV, help="network CSV to load")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=None, help="worker pool size (default: CPU count)")
+    parser.add_argument('--threads', action='store_true', help="use a thread pool instead of processes")
+    args = parser.parse_args()
+
+    key = network_digest(args.csv)
+    metro_graph = load_network(args.csv, key)
+    metro_graph.route_table = load_or_build_route_table(metro_graph, key, CACHE_DIR)
+    service = RouteService(metro_graph, args.workers, args.threads, key, CACHE_DIR)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
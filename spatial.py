@@ -0,0 +1,142 @@
+"""Spatial index over station coordinates for nearest-station and radius queries.
+
+Stations are bucketed into a grid of roughly ``cell_km`` square cells. A
+nearest query scans rings of cells outward from the query cell and stops
+once no unscanned cell can hold anything closer; a radius query scans only
+the cells overlapping the circle. Batch queries use a vectorized haversine
+when numpy is installed.
+"""
+import heapq
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180  # along a meridian
+SLACK = 0.99  # margin for the flat-grid approximation of great-circle distances
+MATRIX_SIZE = 1 << 20  # distances per nearest_many block: 8 MiB of float64 per temporary array
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km between two points given in degrees."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def haversine_matrix(np, lats1, lons1, lats2, lons2):
+    """Distances in km between every point of the first set (rows) and of the second (columns)."""
+    lat1 = np.radians(np.asarray(lats1, dtype=float))[:, None]
+    lon1 = np.radians(np.asarray(lons1, dtype=float))[:, None]
+    lat2 = np.radians(np.asarray(lats2, dtype=float))[None, :]
+    lon2 = np.radians(np.asarray(lons2, dtype=float))[None, :]
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+class SpatialIndex:
+    """Grid index over ``{station: (lat, lon)}``."""
+
+    def __init__(self, coords, cell_km=1.0):
+        self.stations = sorted(station for station, coord in coords.items() if coord)
+        self.lats = [coords[station][0] for station in self.stations]
+        self.lons = [coords[station][1] for station in self.stations]
+        self.cell_km = cell_km
+        self.cell_lat = cell_km / KM_PER_DEGREE
+        # Size longitude cells at the latitude where a degree is shortest, so
+        # every cell is at least cell_km wide wherever the stations are
+        max_abs_lat = max((abs(lat) for lat in self.lats), default=0.0)
+        self.cell_lon = cell_km / (KM_PER_DEGREE * max(math.cos(math.radians(max_abs_lat)), 1e-6))
+
+        self.cells = {}  # (row, column) -> station ids
+        for i, (lat, lon) in enumerate(zip(self.lats, self.lons)):
+            self.cells.setdefault(self._cell(lat, lon), []).append(i)
+        rows = [cell[0] for cell in self.cells] or [0]
+        columns = [cell[1] for cell in self.cells] or [0]
+        self.bounds = (min(rows), min(columns), max(rows), max(columns))
+
+    def __len__(self):
+        return len(self.stations)
+
+    def _cell(self, lat, lon):
+        return math.floor(lat / self.cell_lat), math.floor(lon / self.cell_lon)
+
+    def _ring(self, row, column, radius):
+        """Station ids in the cells exactly ``radius`` cells away (Chebyshev) from (row, column)."""
+        cells = self.cells
+        if radius == 0:
+            yield from cells.get((row, column), ())
+            return
+        for c in range(column - radius, column + radius + 1):
+            yield from cells.get((row - radius, c), ())
+            yield from cells.get((row + radius, c), ())
+        for r in range(row - radius + 1, row + radius):
+            yield from cells.get((r, column - radius), ())
+            yield from cells.get((r, column + radius), ())
+
+    def nearest(self, lat, lon, k=1, max_km=None):
+        """Up to ``k`` ``(distance_km, station)`` pairs closest to the point, nearest first."""
+        if not self.stations or k <= 0:
+            return []
+        row, column = self._cell(lat, lon)
+        min_row, min_column, max_row, max_column = self.bounds
+        last_ring = max(abs(row - min_row), abs(row - max_row), abs(column - min_column), abs(column - max_column))
+
+        best = []  # max-heap of the k closest so far, as (-distance, id)
+        for radius in range(last_ring + 1):
+            for i in self._ring(row, column, radius):
+                distance = haversine_km(lat, lon, self.lats[i], self.lons[i])
+                if max_km is not None and distance > max_km:
+                    continue
+                if len(best) < k:
+                    heapq.heappush(best, (-distance, i))
+                elif distance < -best[0][0]:
+                    heapq.heapreplace(best, (-distance, i))
+            # Anything in a further ring is at least radius full cells away
+            reach = radius * self.cell_km * SLACK
+            if (len(best) == k and -best[0][0] <= reach) or (max_km is not None and reach > max_km):
+                break
+        return sorted((-distance, self.stations[i]) for distance, i in best)
+
+    def within(self, lat, lon, radius_km):
+        """Every ``(distance_km, station)`` within ``radius_km`` of the point, nearest first."""
+        row, column = self._cell(lat, lon)
+        rows = math.ceil(radius_km / self.cell_km / SLACK)
+        min_row, min_column, max_row, max_column = self.bounds
+        found = []
+        for r in range(max(row - rows, min_row), min(row + rows, max_row) + 1):
+            for c in range(max(column - rows, min_column), min(column + rows, max_column) + 1):
+                for i in self.cells.get((r, c), ()):
+                    distance = haversine_km(lat, lon, self.lats[i], self.lons[i])
+                    if distance <= radius_km:
+                        found.append((distance, self.stations[i]))
+        found.sort()
+        return found
+
+    def nearest_many(self, points, chunk=None):
+        """Nearest ``(distance_km, station)`` for each ``(lat, lon)`` in ``points``.
+
+        With numpy the distances from a chunk of points to every station are
+        computed as one matrix; without it each point is a grid query. The
+        default chunk keeps each matrix to MATRIX_SIZE distances however many
+        stations there are.
+        """
+        points = list(points)
+        np = _numpy()
+        if np is None or not self.stations:
+            return [(self.nearest(lat, lon) or [None])[0] for lat, lon in points]
+
+        chunk = chunk or max(1, MATRIX_SIZE // len(self.stations))
+        results = []
+        for begin in range(0, len(points), chunk):
+            block = np.asarray(points[begin:begin + chunk], dtype=float).reshape(-1, 2)
+            distances = haversine_matrix(np, block[:, 0], block[:, 1], self.lats, self.lons)
+            closest = distances.argmin(axis=1)
+            results.extend((float(distances[row, i]), self.stations[i]) for row, i in enumerate(closest.tolist()))
+        return results
@@ -0,0 +1,292 @@
+"""Station name index for autocomplete and resolving loosely typed names.
+
+Names (and aliases) are normalized into word tokens. A prefix trie over the
+tokens answers as-you-type queries where every typed word is the start of
+some word in the name, in any order; names containing every typed word
+anywhere come next. Only when those find fewer stations than asked for
+does a symmetric-deletion index over token prefixes add typo-tolerant
+matches (insertions, deletions, substitutions and transpositions such as
+"Voilet").
+
+Matches are ranked: exact name, then name prefix, then word prefixes, then
+substrings, then fuzzy matches by number of edits; ties go to the shorter
+name.
+"""
+import re
+import unicodedata
+from bisect import bisect_right
+
+# Spelling variants and abbreviations, applied to single words
+TOKEN_ALIASES = {
+    'sec': 'sector', 'sect': 'sector',
+    'mkt': 'market',
+    'rd': 'road',
+    'stn': 'station',
+    'ext': 'extension', 'extn': 'extension',
+    'ph': 'phase',
+    'center': 'centre',
+    'cantonment': 'cantt',
+    'qila': 'quila', 'qilla': 'quila',
+    'qutub': 'qutab',
+    'grey': 'gray',
+    'voilet': 'violet',
+}
+
+# Former or colloquial names, indexed alongside the current names they point to
+STATION_ALIASES = {
+    'Connaught Place': 'Rajiv Chowk',
+    'CP': 'Rajiv Chowk',
+    'Race Course': 'Lok Kalyan Marg',
+    'Red Fort': 'Lal Quila',
+    'Pragati Maidan': 'Supreme Court (Pragati Maidan)',
+    'Millennium City Centre': 'Huda City Centre',
+    'Gurugram': 'Huda City Centre',
+    'Airport': 'IGI Airport',
+}
+
+MIN_FUZZY_LENGTH = 3  # shortest token prefix indexed for fuzzy matching
+FUZZY_CACHE_SIZE = 512  # query words whose fuzzy matches are kept; typing repeats all but the last
+
+_PUNCTUATION = re.compile(r"[^\w]+")
+
+
+def normalize_name(text):
+    """Split a station name into lowercase, accent-free, alias-mapped word tokens.
+
+    Dots are dropped and runs of single letters are joined, so "N.H.P.C.",
+    "N H P C" and "NHPC" all normalize to ``('nhpc',)``.
+    """
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    words = _PUNCTUATION.sub(' ', text.casefold().replace('.', '')).split()
+    return tuple(TOKEN_ALIASES.get(token, token) for token in _join_initials(words))
+
+
+def _join_initials(words):
+    tokens = []
+    run = ''
+    for word in words:
+        if len(word) == 1 and word.isalpha():
+            run += word
+            continue
+        if run:
+            tokens.append(run)
+            run = ''
+        tokens.append(word)
+    if run:
+        tokens.append(run)
+    return tokens
+
+
+def max_edits(token):
+    """Typos tolerated in a query word: none for short words, more for long ones."""
+    if len(token) < 4:
+        return 0
+    return 1 if len(token) < 8 else 2
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance, or ``limit + 1`` once it must exceed ``limit``."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        best = i
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if cost and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+            best = min(best, value)
+        if best > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def _deletions(word, depth):
+    """``word`` and every string made by deleting up to ``depth`` characters from it."""
+    variants = {word}
+    frontier = {word}
+    for _ in range(depth):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        variants |= frontier
+    return variants
+
+
+class _TrieNode:
+    __slots__ = ('children', 'entries')
+
+    def __init__(self):
+        self.children = {}
+        self.entries = set()  # every entry with a token starting with this prefix
+
+
+class StationIndex:
+    """Ranked prefix and fuzzy search over station names and aliases."""
+
+    def __init__(self, stations, aliases=STATION_ALIASES):
+        stations = sorted(stations)
+        self.stations = frozenset(stations)
+
+        # An entry is one searchable spelling: a station name or an alias of one
+        self.entry_station = []
+        self.entry_tokens = []
+        self.entry_text = []
+        self.exact = {}  # normalized text -> station
+        for name in stations:
+            self._add_entry(name, name)
+        for alias, name in aliases.items():
+            if name in self.stations:
+                self._add_entry(alias, name)
+
+        # Every entry's text on one line each, for substring search
+        self.text = '\n'.join(self.entry_text)
+        self.text_offsets = []  # where each entry's line starts in self.text
+        offset = 0
+        for entry_text in self.entry_text:
+            self.text_offsets.append(offset)
+            offset += len(entry_text) + 1
+
+        self.root = _TrieNode()
+        fuzzy_keys = set()
+        for entry, tokens in enumerate(self.entry_tokens):
+            for token in tokens:
+                node = self.root
+                for depth, char in enumerate(token, 1):
+                    node = node.children.setdefault(char, _TrieNode())
+                    node.entries.add(entry)
+                    if depth >= MIN_FUZZY_LENGTH:
+                        fuzzy_keys.add(token[:depth])
+
+        # Symmetric deletion index: two words within k edits share a string
+        # reachable by at most k deletions from each
+        self.deletions = {}  # deletion variant -> token prefixes it came from
+        for key in fuzzy_keys:
+            for variant in _deletions(key, 2):
+                self.deletions.setdefault(variant, []).append(key)
+        self._fuzzy_cache = {}  # query word -> _fuzzy_entries result
+
+    def _add_entry(self, text, station):
+        tokens = normalize_name(text)
+        if not tokens:
+            return
+        self.entry_station.append(station)
+        self.entry_tokens.append(tokens)
+        self.entry_text.append(' '.join(tokens))
+        self.exact.setdefault(' '.join(tokens), station)
+
+    def __len__(self):
+        return len(self.stations)
+
+    def _prefix_entries(self, prefix):
+        node = self.root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return set()
+        return node.entries
+
+    def _substring_entries(self, token):
+        entries = set()
+        start = self.text.find(token)
+        while start != -1:
+            entries.add(bisect_right(self.text_offsets, start) - 1)
+            start = self.text.find(token, start + 1)
+        return entries
+
+    def _fuzzy_entries(self, token):
+        """Map each entry with a word within ``max_edits(token)`` of a prefix ``token`` to its edit count."""
+        matches = self._fuzzy_cache.get(token)
+        if matches is None:
+            matches = self._edit_matches(token)
+            if len(self._fuzzy_cache) >= FUZZY_CACHE_SIZE:
+                self._fuzzy_cache.clear()
+            self._fuzzy_cache[token] = matches
+        return matches
+
+    def _edit_matches(self, token):
+        limit = max_edits(token)
+        matches = {}
+        if not limit:
+            return matches
+        keys = {key for variant in _deletions(token, limit) for key in self.deletions.get(variant, ())}
+        for key in keys:
+            edits = edit_distance(token, key, limit)
+            if edits > limit:
+                continue
+            for entry in self._prefix_entries(key):
+                if edits < matches.get(entry, limit + 1):
+                    matches[entry] = edits
+        return matches
+
+    def _ranked(self, query, limit):
+        """Best ``(rank, station)`` pairs for ``query``, at most one per station."""
+        tokens = normalize_name(query)
+        if not tokens or limit <= 0:
+            return []
+        text = ' '.join(tokens)
+
+        exact_sets = [self._prefix_entries(token) for token in tokens]
+        candidates = {entry: 0 for entry in set.intersection(*exact_sets)}
+        substrings = set()
+        if len({self.entry_station[entry] for entry in candidates}) < limit:
+            # Words typed from the middle, e.g. "ajiv"
+            substrings = set.intersection(*map(self._substring_entries, tokens)).difference(candidates)
+            candidates.update(dict.fromkeys(substrings, 0))
+        if len({self.entry_station[entry] for entry in candidates}) < limit:
+            # Typo-tolerant pass: each word matches exactly or within its edit budget
+            edits = {}
+            for token, exact in zip(tokens, exact_sets):
+                token_edits = dict(self._fuzzy_entries(token))
+                token_edits.update(dict.fromkeys(exact, 0))
+                if not edits:
+                    edits = token_edits
+                else:
+                    edits = {entry: count + token_edits[entry] for entry, count in edits.items() if entry in token_edits}
+                if not edits:
+                    break
+            for entry, count in edits.items():
+                candidates.setdefault(entry, count)
+
+        best = {}
+        for entry, edits in candidates.items():
+            if edits:
+                tier = 4
+            elif entry in substrings:
+                tier = 3
+            elif self.entry_text[entry] == text:
+                tier = 0
+            elif self.entry_text[entry].startswith(text):
+                tier = 1
+            else:
+                tier = 2
+            station = self.entry_station[entry]
+            rank = (tier, edits, len(station), station)
+            if station not in best or rank < best[station]:
+                best[station] = rank
+        return sorted((rank, station) for station, rank in best.items())[:limit]
+
+    def search(self, query, limit=10):
+        """Up to ``limit`` station names matching ``query``, best first."""
+        return [station for _, station in self._ranked(query, limit)]
+
+    def resolve(self, query):
+        """The station ``query`` unambiguously names, or None.
+
+        Exact names and aliases always resolve; otherwise the best match must
+        rank strictly ahead of the runner-up (ignoring name length).
+        """
+        if query in self.stations:
+            return query
+        station = self.exact.get(' '.join(normalize_name(query)))
+        if station is not None:
+            return station
+        ranked = self._ranked(query, 2)
+        if not ranked:
+            return None
+        if len(ranked) == 1 or ranked[0][0][:2] < ranked[1][0][:2]:
+            return ranked[0][1]
+        return None
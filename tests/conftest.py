@@ -0,0 +1,82 @@
+"""Shared fixtures: a small hand-built network with interchanges, parallel segments and an island."""
+import hashlib
+import os
+import sys
+from itertools import combinations
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import MetroGraph  # noqa: E402
+from route_table import CRITERIA  # noqa: E402
+from spatial import haversine_km  # noqa: E402
+
+PRICE_PER_KM = 5
+STATION_COORDS = {
+    'Alpha': (28.60, 77.20),
+    'Bravo': (28.60, 77.21),
+    'Charlie': (28.60, 77.22),
+    'Delta': (28.60, 77.23),
+    'Echo': (28.61, 77.21),
+    'Foxtrot': (28.59, 77.21),
+    'Golf': (28.58, 77.21),
+    'Hotel': (28.59, 77.225),
+    'Xray': (28.70, 77.30),
+    'Yankee': (28.70, 77.31),
+}
+# (from, to, minutes, line, track km per straight-line km)
+SEGMENTS = [
+    ('Alpha', 'Bravo', 2, 'Red', 1.1),
+    ('Bravo', 'Charlie', 3, 'Red', 1.05),
+    ('Charlie', 'Delta', 2, 'Red', 1.1),
+    ('Bravo', 'Charlie', 1, 'Yellow', 1.6),  # faster but longer than the Red segment it runs beside
+    ('Echo', 'Bravo', 2, 'Blue', 1.2),
+    ('Bravo', 'Foxtrot', 2, 'Blue', 1.1),
+    ('Foxtrot', 'Golf', 3, 'Blue', 1.3),
+    ('Foxtrot', 'Hotel', 2, 'Green', 1.2),
+    ('Hotel', 'Delta', 2, 'Green', 1.1),
+    ('Golf', 'Hotel', 4, 'Green', 1.4),
+    ('Xray', 'Yankee', 2, 'Pink', 1.1),  # not connected to the rest
+]
+NETWORK_KEY = hashlib.sha256(b'test network').digest()
+
+
+def build_network():
+    metro_graph = MetroGraph()
+    for from_station, to_station, time, line, detour in SEGMENTS:
+        (lat_from, lon_from), (lat_to, lon_to) = STATION_COORDS[from_station], STATION_COORDS[to_station]
+        distance = round(haversine_km(lat_from, lon_from, lat_to, lon_to) * detour, 2)
+        metro_graph.add_edge(from_station, to_station, time, distance, distance * PRICE_PER_KM, line,
+                             lat_from, lon_from, lat_to, lon_to)
+    metro_graph.compile()
+    return metro_graph
+
+
+@pytest.fixture
+def metro_graph():
+    return build_network()
+
+
+def station_pairs(metro_graph):
+    """Every unordered pair of distinct stations."""
+    return list(combinations(sorted(metro_graph.stations), 2))
+
+
+def queries(metro_graph):
+    """Every ordered (start, end, criteria) query, including start == end."""
+    stations = sorted(metro_graph.stations)
+    return [(start, end, criteria) for criteria in CRITERIA for start in stations for end in stations]
+
+
+def route_segments(result):
+    """Unordered station pairs a route result travels."""
+    path = result['path']
+    return {frozenset(pair) for pair in zip(path, path[1:])}
+
+
+def assert_same_total(result, expected, criteria):
+    """Both unreachable, or equal totals for ``criteria``."""
+    assert (result is None) == (expected is None)
+    if expected is not None:
+        assert result[f'total_{criteria}'] == pytest.approx(expected[f'total_{criteria}'])
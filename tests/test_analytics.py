@@ -0,0 +1,76 @@
+"""Network-wide analytics must agree with one dijkstra call per station pair."""
+import csv
+import math
+
+import pytest
+
+import analytics
+from conftest import station_pairs
+from route_table import CRITERIA
+
+
+@pytest.fixture(params=['python', 'numpy'])
+def accumulate(request, monkeypatch):
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(analytics, '_numpy', lambda: None)
+    return request.param
+
+
+def ordered_routes(metro_graph, criteria='time'):
+    for start, end in station_pairs(metro_graph):
+        for pair in ((start, end), (end, start)):
+            yield pair, metro_graph.dijkstra(*pair, criteria)
+
+
+@pytest.mark.parametrize('criteria', CRITERIA)
+def test_travel_matrix_matches_dijkstra(metro_graph, accumulate, criteria):
+    stations, matrix = analytics.travel_matrix(metro_graph, criteria, batch_size=3)
+    position = {station: i for i, station in enumerate(stations)}
+    for (start, end), result in ordered_routes(metro_graph, criteria):
+        total = matrix[position[start]][position[end]]
+        if result is None:
+            assert math.isinf(total)
+        else:
+            assert total == pytest.approx(result[f'total_{criteria}'])
+
+
+def test_centrality_counts_routes_through_and_changing_at_each_station(metro_graph, accumulate):
+    betweenness = dict.fromkeys(metro_graph.stations, 0)
+    transfer_load = dict.fromkeys(metro_graph.stations, 0)
+    for _, result in ordered_routes(metro_graph):
+        if result is None:
+            continue
+        for station in result['path'][1:-1]:
+            betweenness[station] += 1
+        for before, after in zip(result['steps'], result['steps'][1:]):
+            if before[5] != after[5]:
+                transfer_load[before[1]] += 1
+
+    stats = analytics.centrality(metro_graph, batch_size=3, use_numpy=accumulate == 'numpy')
+    assert dict(zip(stats['stations'], stats['betweenness'])) == betweenness
+    assert dict(zip(stats['stations'], stats['transfer_load'])) == transfer_load
+    assert transfer_load['Bravo'] > 0
+
+
+def test_isochrone(metro_graph):
+    within = analytics.isochrone(metro_graph, 'Alpha', limit=5)
+    totals = [total for total, _ in within]
+    assert totals == sorted(totals)
+    routes = {end: metro_graph.dijkstra('Alpha', end, 'time') for end in metro_graph.stations}
+    assert {station for _, station in within} == {
+        end for end, result in routes.items() if result is not None and result['total_time'] <= 5}
+    assert analytics.isochrone(metro_graph, 'Nowhere') == []
+
+
+def test_matrix_csv_leaves_unreachable_pairs_empty(metro_graph, tmp_path, monkeypatch):
+    monkeypatch.setattr(analytics, '_numpy', lambda: None)
+    stations, matrix = analytics.travel_matrix(metro_graph)
+    path = str(tmp_path / 'times.csv')
+    analytics.save_matrix(path, stations, matrix)
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = {row['Station']: row for row in csv.DictReader(f)}
+    assert rows['Alpha']['Alpha'] == '0'
+    assert rows['Alpha']['Xray'] == ''
+    assert float(rows['Alpha']['Delta']) == metro_graph.dijkstra('Alpha', 'Delta', 'time')['total_time']
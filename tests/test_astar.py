@@ -0,0 +1,12 @@
+"""Goal-directed search must agree with dijkstra."""
+import pytest
+
+from conftest import assert_same_total, queries
+from route_table import CRITERIA
+
+
+@pytest.mark.parametrize('criteria', CRITERIA)
+def test_astar_matches_dijkstra(metro_graph, criteria):
+    assert metro_graph.astar_calibration(criteria)['usable']  # otherwise astar just runs dijkstra
+    for start, end, _ in queries(metro_graph):
+        assert_same_total(metro_graph.astar(start, end, criteria), metro_graph.dijkstra(start, end, criteria), criteria)
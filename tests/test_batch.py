@@ -0,0 +1,30 @@
+"""Batch queries must return what one dijkstra call per query would."""
+import pytest
+
+from batch import batch_routes
+from conftest import queries
+
+
+def expected_results(metro_graph):
+    return {query: metro_graph.dijkstra(*query) for query in queries(metro_graph)}
+
+
+@pytest.mark.parametrize('processes', [None, 2])
+def test_batch_matches_dijkstra(metro_graph, processes):
+    expected = expected_results(metro_graph)
+    results = list(batch_routes(metro_graph, expected, processes=processes, window=7))
+    assert len(results) == len(expected)
+    assert {(start, end, criteria): result for start, end, criteria, result in results} == expected
+
+
+def test_criteria_defaults_to_time(metro_graph):
+    [(start, end, criteria, result)] = batch_routes(metro_graph, [('Alpha', 'Golf')])
+    assert (start, end, criteria) == ('Alpha', 'Golf', 'time')
+    assert result == metro_graph.dijkstra('Alpha', 'Golf', 'time')
+
+
+def test_resolve_names(metro_graph):
+    results = list(batch_routes(metro_graph, [('alph', 'Chralie'), ('alph', 'Nowhere')], resolve_names=True))
+    assert [(start, end) for start, end, _, _ in results] == [('Alpha', 'Charlie'), ('Alpha', 'Nowhere')]
+    assert results[0][3] == metro_graph.dijkstra('Alpha', 'Charlie', 'time')
+    assert results[1][3] is None
@@ -0,0 +1,22 @@
+"""The contraction hierarchy must agree with dijkstra."""
+from conftest import NETWORK_KEY, assert_same_total, queries
+from contraction import ContractionHierarchy, load_or_build_hierarchy
+
+
+def test_contraction_hierarchy_matches_dijkstra(metro_graph):
+    hierarchy = ContractionHierarchy.build(metro_graph)
+    for start, end, criteria in queries(metro_graph):
+        assert_same_total(hierarchy.route(start, end, criteria), metro_graph.dijkstra(start, end, criteria), criteria)
+
+
+def test_saved_contraction_hierarchy_matches_dijkstra(metro_graph, tmp_path):
+    load_or_build_hierarchy(metro_graph, NETWORK_KEY, str(tmp_path))
+    hierarchy = load_or_build_hierarchy(metro_graph, NETWORK_KEY, str(tmp_path))  # read back from disk
+    for start, end, criteria in queries(metro_graph):
+        assert_same_total(hierarchy.route(start, end, criteria), metro_graph.dijkstra(start, end, criteria), criteria)
+
+
+def test_route_uses_the_attached_hierarchy(metro_graph):
+    metro_graph.hierarchy = ContractionHierarchy.build(metro_graph)
+    for start, end, criteria in queries(metro_graph):
+        assert_same_total(metro_graph.route(start, end, criteria), metro_graph.dijkstra(start, end, criteria), criteria)
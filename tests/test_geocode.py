@@ -0,0 +1,61 @@
+"""Geocoding into the coordinate cache and back into the network CSV, using the fixture backend."""
+import json
+
+import pytest
+
+from help import CoordinateCache, FixtureBackend, geocode_stations, read_stations, write_csv_coords
+
+KNOWN = {'Alpha': (28.60, 77.20), 'Bravo': (28.60, 77.21), 'Charlie': (28.60, 77.22)}
+PLACEHOLDER = {'lat': 28.5, 'lon': 77.5}  # a generic match shared by two stations
+CSV_TEXT = ('From Station,To Station,Time (min),Line,From Lat,From Lon,To Lat,To Lon\r\n'
+            'Alpha,Bravo,2,Red,,,,\r\n'
+            'Bravo, Charlie ,3,Red,,,,\r\n'
+            'Charlie,Delta,2,Red,,,,\r\n')
+
+
+@pytest.fixture
+def backend(tmp_path):
+    path = tmp_path / 'fixture.json'
+    path.write_text(json.dumps({station: {'lat': lat, 'lon': lon} for station, (lat, lon) in KNOWN.items()}))
+    return FixtureBackend(str(path))
+
+
+@pytest.fixture
+def network_csv(tmp_path):
+    path = tmp_path / 'network.csv'
+    path.write_bytes(CSV_TEXT.encode('utf-8'))
+    return str(path)
+
+
+def test_geocodes_missing_and_placeholder_stations(backend, network_csv, tmp_path):
+    coords_path = tmp_path / 'coords.json'
+    coords_path.write_text(json.dumps({'Alpha': {'lat': 28.60, 'lon': 77.20},
+                                       'Bravo': PLACEHOLDER, 'Delta': PLACEHOLDER}))
+    cache = CoordinateCache(str(coords_path))
+    stations = read_stations(network_csv)
+    assert stations == {'Alpha', 'Bravo', 'Charlie', 'Delta'}
+
+    looked_up = geocode_stations(stations, backend, cache, rate=1000, workers=2)
+    assert looked_up == 3  # Alpha is cached; Bravo and Delta sit on the placeholder
+    saved = json.loads(coords_path.read_text())
+    assert saved['Bravo'] == {'lat': 28.60, 'lon': 77.21}
+    assert saved['Charlie'] == {'lat': 28.60, 'lon': 77.22}
+    assert saved['Delta'] == PLACEHOLDER  # unresolved, so still recognisable as a placeholder next run
+    assert [path.name for path in tmp_path.iterdir() if path.suffix == '.tmp'] == []
+
+
+def test_write_csv_coords_keeps_line_endings_and_placeholders(network_csv, tmp_path):
+    cache = CoordinateCache(str(tmp_path / 'coords.json'))
+    for station, coord in KNOWN.items():
+        cache[station] = coord
+    cache['Delta'] = (28.5, 77.5)
+    cache['Echo'] = (28.5, 77.5)
+
+    assert write_csv_coords(network_csv, cache) == 3
+    data = open(network_csv, 'rb').read()
+    assert b'\r' not in data
+    assert data.decode('utf-8').splitlines()[3] == 'Charlie,Delta,2,Red,28.6,77.22,28.5,77.5'
+
+    assert write_csv_coords(network_csv, cache) == 0
+    assert write_csv_coords(network_csv, cache, blank_placeholders=True) == 1
+    assert open(network_csv, encoding='utf-8').read().splitlines()[3] == 'Charlie,Delta,2,Red,28.6,77.22,,'
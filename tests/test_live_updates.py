@@ -0,0 +1,114 @@
+"""Closing, slowing and speeding up segments invalidate exactly the cached routes they affect."""
+import pytest
+
+from conftest import NETWORK_KEY, assert_same_total, queries, route_segments, station_pairs
+from contraction import ContractionHierarchy
+from route_table import CRITERIA, STALE_ROUTE, load_or_build_route_table
+
+SEGMENT = frozenset(('Foxtrot', 'Golf'))  # a single Blue segment, no parallel track
+ROUTE_OPTIONS = (None,)  # route cache options for MetroGraph.route without a transfer penalty
+
+
+def cache_every_route(metro_graph, criteria='time'):
+    """Route every station pair once; return ``{pair: result}``."""
+    return {pair: metro_graph.route(*pair, criteria) for pair in station_pairs(metro_graph)}
+
+
+def assert_only_routes_through_segment_dropped(metro_graph, routes, criteria='time'):
+    through = {pair for pair, result in routes.items() if result is not None and SEGMENT in route_segments(result)}
+    assert through and len(through) < len(routes)
+    assert len(metro_graph.route_cache) == len(routes) - len(through)
+    for pair in routes:
+        hit, _ = metro_graph.route_cache.get(*pair, criteria, ROUTE_OPTIONS)
+        assert hit == (pair not in through)
+
+
+def assert_routes_match_dijkstra(metro_graph):
+    for start, end, criteria in queries(metro_graph):
+        assert_same_total(metro_graph.route(start, end, criteria), metro_graph.dijkstra(start, end, criteria), criteria)
+
+
+def test_slowing_a_segment_drops_only_cached_routes_through_it(metro_graph):
+    routes = cache_every_route(metro_graph)
+    metro_graph.update_edge('Foxtrot', 'Golf', time=30)
+    assert_only_routes_through_segment_dropped(metro_graph, routes)
+    assert_routes_match_dijkstra(metro_graph)
+
+
+def test_closing_a_segment_drops_only_cached_routes_through_it(metro_graph):
+    routes = cache_every_route(metro_graph)
+    metro_graph.disable_edge('Foxtrot', 'Golf')
+    assert_only_routes_through_segment_dropped(metro_graph, routes)
+    assert_routes_match_dijkstra(metro_graph)
+    for start, end, criteria in queries(metro_graph):
+        result = metro_graph.route(start, end, criteria)
+        assert result is None or SEGMENT not in route_segments(result)
+
+
+def test_slowed_segment_marks_only_table_routes_through_it_stale(metro_graph, tmp_path):
+    table = load_or_build_route_table(metro_graph, NETWORK_KEY, str(tmp_path))
+    metro_graph.route_table = table
+    before = {(start, end, criteria): table.route(start, end, criteria) for start, end, criteria in queries(metro_graph)}
+
+    metro_graph.update_edge('Foxtrot', 'Golf', time=30)
+    assert metro_graph.route_table is table  # still attached: other routes stay optimal
+    compiled = metro_graph.compiled
+    assert {frozenset((compiled.names[compiled.sources[edge]], compiled.names[compiled.targets[edge]]))
+            for edge in metro_graph._stale_edges} == {SEGMENT}
+    for (start, end, criteria), result in before.items():
+        stale = table.route(start, end, criteria, avoid=metro_graph._stale_edges) is STALE_ROUTE
+        assert stale == (result is not None and SEGMENT in route_segments(result))
+    assert_routes_match_dijkstra(metro_graph)
+
+
+def test_closed_segment_falls_back_from_the_hierarchy(metro_graph):
+    metro_graph.hierarchy = ContractionHierarchy.build(metro_graph)
+    metro_graph.disable_edge('Foxtrot', 'Golf')
+    assert metro_graph.hierarchy is not None
+    assert_routes_match_dijkstra(metro_graph)
+
+
+def test_faster_segment_detaches_precomputed_routes(metro_graph, tmp_path):
+    metro_graph.route_table = load_or_build_route_table(metro_graph, NETWORK_KEY, str(tmp_path))
+    metro_graph.hierarchy = ContractionHierarchy.build(metro_graph)
+    cache_every_route(metro_graph)
+    metro_graph.update_edge('Golf', 'Hotel', time=1)
+    assert metro_graph.route_table is None and metro_graph.hierarchy is None
+    assert len(metro_graph.route_cache) == 0
+    assert_routes_match_dijkstra(metro_graph)
+
+
+def test_reopening_a_segment_restores_its_routes(metro_graph):
+    expected = {(start, end, criteria): metro_graph.dijkstra(start, end, criteria)
+                for start, end, criteria in queries(metro_graph)}
+    metro_graph.disable_edge('Foxtrot', 'Golf')
+    cache_every_route(metro_graph)
+    metro_graph.enable_edge('Foxtrot', 'Golf')
+    for (start, end, criteria), result in expected.items():
+        assert_same_total(metro_graph.route(start, end, criteria), result, criteria)
+
+
+def test_every_criteria_is_invalidated(metro_graph):
+    routes = {criteria: cache_every_route(metro_graph, criteria) for criteria in CRITERIA}
+    metro_graph.disable_edge('Foxtrot', 'Golf')
+    for criteria, by_pair in routes.items():
+        for pair, result in by_pair.items():
+            hit, _ = metro_graph.route_cache.get(*pair, criteria, ROUTE_OPTIONS)
+            assert hit == (result is None or SEGMENT not in route_segments(result))
+
+
+@pytest.mark.parametrize('weights', [{'time': -1}, {'distance': float('nan')}, {'cost': float('inf')}])
+def test_invalid_weights_are_rejected_before_any_change(metro_graph, weights):
+    expected = metro_graph.dijkstra('Alpha', 'Golf', 'time')
+    with pytest.raises(ValueError):
+        metro_graph.update_edge('Foxtrot', 'Golf', **weights)
+    assert metro_graph.dijkstra('Alpha', 'Golf', 'time') == expected
+
+
+@pytest.mark.parametrize('delay', [{'minutes': -5}, {'factor': -1.0}, {'factor': float('nan')}])
+def test_delay_that_makes_a_time_negative_is_rejected(metro_graph, delay):
+    expected = metro_graph.dijkstra('Echo', 'Golf', 'time')
+    with pytest.raises(ValueError):
+        metro_graph.delay_line('Blue', **delay)
+    assert metro_graph.dijkstra('Echo', 'Golf', 'time') == expected
+    assert all(edge[1] >= 0 for edges in metro_graph.graph.values() for edge in edges)
@@ -0,0 +1,44 @@
+"""Both CSV readers must hand load_metro_data the same cleaned-up columns."""
+import sys
+
+import pytest
+
+from app import _read_columns, load_metro_data
+
+HEADER = 'From Station,To Station,Time (min),Distance (km),Line,From Lat,From Lon,To Lat,To Lon\n'
+ROWS = (
+    ' Alpha , Bravo ,2, 1.2 ,Red ,28.60,77.20,28.60,77.21\n'
+    'Bravo,Charlie, 3 ,1.1, Red,,, 28.60 ,77.22\n'
+)
+
+
+@pytest.fixture
+def network_csv(tmp_path):
+    path = tmp_path / 'network.csv'
+    path.write_text(HEADER + ROWS, encoding='utf-8')
+    return str(path)
+
+
+def test_cells_are_stripped_and_blanks_are_none(network_csv, monkeypatch):
+    monkeypatch.delitem(sys.modules, 'pandas', raising=False)
+    columns = _read_columns(network_csv)
+    assert columns['From Station'] == ['Alpha', 'Bravo']
+    assert columns['Line'] == ['Red', 'Red']
+    assert columns['Time (min)'] == [2, 3]
+    assert columns['Distance (km)'] == [1.2, 1.1]
+    assert columns['From Lat'] == [28.60, None]
+    assert columns['To Lat'] == [28.60, 28.60]
+
+
+def test_pandas_reader_matches_csv_reader(network_csv, monkeypatch):
+    pytest.importorskip('pandas')
+    with_pandas = _read_columns(network_csv)
+    monkeypatch.delitem(sys.modules, 'pandas')
+    assert with_pandas == _read_columns(network_csv)
+
+
+def test_padded_csv_loads_one_line(network_csv):
+    metro_graph = load_metro_data(network_csv)
+    assert set(metro_graph.stations) == {'Alpha', 'Bravo', 'Charlie'}
+    assert list(metro_graph.line_edges) == ['Red']
+    assert metro_graph.dijkstra('Alpha', 'Charlie', 'time')['total_time'] == 5
@@ -0,0 +1,35 @@
+"""Pareto routes must include the fastest and cheapest routes and nothing dominated."""
+import pytest
+
+from conftest import station_pairs
+
+
+def dominates(a, b):
+    keys = ('total_time', 'total_cost', 'transfers')
+    return all(a[key] <= b[key] for key in keys) and any(a[key] < b[key] for key in keys)
+
+
+def test_pareto_routes_include_the_fastest_and_cheapest(metro_graph):
+    for start, end in station_pairs(metro_graph):
+        routes = metro_graph.pareto_routes(start, end)
+        fastest = metro_graph.dijkstra(start, end, 'time')
+        if fastest is None:
+            assert routes == []
+            continue
+        assert min(route['total_time'] for route in routes) == pytest.approx(fastest['total_time'])
+        cheapest = metro_graph.dijkstra(start, end, 'cost')
+        assert min(route['total_cost'] for route in routes) == pytest.approx(cheapest['total_cost'])
+        for route in routes:
+            assert route['path'][0] == start and route['path'][-1] == end
+            assert not any(dominates(other, route) for other in routes)
+
+
+def test_faster_route_with_more_transfers_is_kept(metro_graph):
+    routes = metro_graph.pareto_routes('Alpha', 'Delta')
+    assert [(route['transfers'], route['total_time']) for route in routes] == [(0, 7), (2, 5)]
+    assert routes[1]['lines'] == ['Red', 'Yellow', 'Red']
+
+
+def test_max_transfers_caps_the_rounds(metro_graph):
+    routes = metro_graph.pareto_routes('Alpha', 'Delta', max_transfers=1)
+    assert [(route['transfers'], route['total_time']) for route in routes] == [(0, 7)]
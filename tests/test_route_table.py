@@ -0,0 +1,28 @@
+"""The precomputed route table must agree with dijkstra."""
+from conftest import NETWORK_KEY, assert_same_total, queries
+from route_table import load_or_build_route_table
+
+
+def test_route_table_matches_dijkstra(metro_graph, tmp_path):
+    table = load_or_build_route_table(metro_graph, NETWORK_KEY, str(tmp_path))
+    try:
+        for start, end, criteria in queries(metro_graph):
+            assert_same_total(table.route(start, end, criteria), metro_graph.dijkstra(start, end, criteria), criteria)
+    finally:
+        table.close()
+
+
+def test_saved_route_table_matches_dijkstra(metro_graph, tmp_path):
+    load_or_build_route_table(metro_graph, NETWORK_KEY, str(tmp_path)).close()
+    table = load_or_build_route_table(metro_graph, NETWORK_KEY, str(tmp_path))  # read back from disk
+    try:
+        for start, end, criteria in queries(metro_graph):
+            assert_same_total(table.route(start, end, criteria), metro_graph.dijkstra(start, end, criteria), criteria)
+    finally:
+        table.close()
+
+
+def test_route_uses_the_attached_table(metro_graph, tmp_path):
+    metro_graph.route_table = load_or_build_route_table(metro_graph, NETWORK_KEY, str(tmp_path))
+    for start, end, criteria in queries(metro_graph):
+        assert_same_total(metro_graph.route(start, end, criteria), metro_graph.dijkstra(start, end, criteria), criteria)
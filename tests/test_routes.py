@@ -0,0 +1,38 @@
+"""Route results must describe every hop they take, not just the totals."""
+import pytest
+
+from conftest import queries
+
+
+def test_steps_add_up_to_the_totals(metro_graph):
+    for start, end, criteria in queries(metro_graph):
+        for result in (metro_graph.route(start, end, criteria), metro_graph.route(end, start, criteria)):
+            if result is None:
+                continue
+            steps = result['steps']
+            assert [step[0] for step in steps] == result['path'][:-1]
+            assert [step[1] for step in steps] == result['path'][1:]
+            assert sum(step[2] for step in steps) == pytest.approx(result['total_time'])
+            assert sum(step[3] for step in steps) == pytest.approx(result['total_distance'])
+            assert sum(step[4] for step in steps) == pytest.approx(result['total_cost'])
+
+
+def test_steps_name_the_parallel_segment_taken(metro_graph):
+    fastest = metro_graph.dijkstra('Bravo', 'Charlie', 'time')
+    shortest = metro_graph.dijkstra('Bravo', 'Charlie', 'distance')
+    assert [step[5] for step in fastest['steps']] == ['Yellow']
+    assert [step[5] for step in shortest['steps']] == ['Red']
+    assert fastest['steps'][0][2] == fastest['total_time'] == 1
+
+
+def test_point_searches_reusing_arrays_match_full_trees(metro_graph):
+    compiled = metro_graph._compiled()
+    for criteria in ('time', 'distance'):
+        trees = {source: metro_graph._search(compiled, source, criteria) for source in range(len(compiled))}
+        for start, end, _ in queries(metro_graph):  # early stops leave different stations behind each time
+            result = metro_graph.dijkstra(start, end, criteria)
+            expected = trees[compiled.index[start]].dist[compiled.index[end]]
+            if result is None:
+                assert expected == float('inf')
+            else:
+                assert result[f'total_{criteria}'] == pytest.approx(expected)
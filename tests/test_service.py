@@ -0,0 +1,105 @@
+"""The HTTP service's request handling, run on thread workers sharing one graph."""
+import asyncio
+import json
+import sys
+import threading
+from http import HTTPStatus
+
+import pytest
+
+from app import RouteCache
+from conftest import queries
+from service import HTTPError, RouteService
+
+
+@pytest.fixture
+def service(metro_graph):
+    service = RouteService(metro_graph, workers=4, use_threads=True)
+    yield service
+    service.close()
+
+
+def get(service, target):
+    status, _, body = asyncio.run(service.dispatch('GET', target))
+    return status, json.loads(body)
+
+
+def test_route_matches_dijkstra(service, metro_graph):
+    status, result = get(service, '/route?from=Alpha&to=Golf&criteria=distance')
+    assert status == HTTPStatus.OK
+    expected = metro_graph.dijkstra('Alpha', 'Golf', 'distance')
+    assert result['path'] == expected['path']
+    assert result['total_distance'] == pytest.approx(expected['total_distance'])
+
+
+@pytest.mark.parametrize('transfer_penalty', ['-1', 'nan', 'inf', 'abc'])
+def test_invalid_transfer_penalty_is_a_bad_request(service, transfer_penalty):
+    with pytest.raises(HTTPError) as error:
+        get(service, f'/route?from=Alpha&to=Golf&transfer_penalty={transfer_penalty}')
+    assert error.value.status == HTTPStatus.BAD_REQUEST
+
+
+def test_unknown_station_is_not_found(service):
+    with pytest.raises(HTTPError) as error:
+        get(service, '/route?from=Alpha&to=Zulu')
+    assert error.value.status == HTTPStatus.NOT_FOUND
+
+
+def test_concurrent_requests_share_the_route_cache(service, metro_graph):
+    # Every (unordered) pair is requested twice, with and without a penalty
+    targets = [f'/route?from={start}&to={end}&criteria={criteria}{penalty}'
+               for start, end, criteria in queries(metro_graph) if start != end
+               for penalty in ('', '&transfer_penalty=3')]
+
+    async def fetch_all():
+        return await asyncio.gather(*(service.dispatch('GET', target) for target in targets),
+                                    return_exceptions=True)
+
+    responses = asyncio.run(fetch_all())
+    assert all(isinstance(response, HTTPError) or response[0] == HTTPStatus.OK for response in responses)
+    stats = metro_graph.route_cache.stats()
+    assert stats['hits'] + stats['misses'] == len(targets) - service.coalesced
+    assert stats['size'] == stats['misses']
+
+
+def test_route_cache_survives_concurrent_use():
+    cache = RouteCache(maxsize=16)
+    route = {'path': ['A', 'B'], 'lines': ['Red'], 'steps': [('A', 'B', 1, 1, 5, 'Red')]}
+    errors = []
+
+    def hammer(offset):
+        try:
+            for i in range(2000):
+                key = (f'S{(i + offset) % 40}', 'T', 'time')
+                cache.put(*key, (), route, 0.001)
+                cache.get(*key)
+                if i % 100 == 0:
+                    cache.discard_routes_through({frozenset(('A', 'B'))})
+        except Exception as e:  # e.g. "OrderedDict mutated during iteration"
+            errors.append(e)
+
+    threads = [threading.Thread(target=hammer, args=(offset,)) for offset in range(8)]
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # switch threads as often as possible to expose races
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+    assert errors == []
+    assert len(cache) <= cache.maxsize
+    assert cache.hits + cache.misses == 8 * 2000
+
+
+def test_map_layers_cache_is_replaced_whole(metro_graph, tmp_path):
+    (tmp_path / 'map_layers_0000000000000000.json').write_text('{}')  # another network's layers
+    layers = metro_graph.map_layers(str(tmp_path))
+    [cached] = tmp_path.iterdir()  # the stale file is gone and no temporary file is left behind
+    assert json.loads(cached.read_text(encoding='utf-8')) == layers
+
+    cached.write_text('not json')  # a damaged cache is rebuilt in place
+    metro_graph._map_layers = None
+    assert metro_graph.map_layers(str(tmp_path)) == layers
+    assert [path.name for path in tmp_path.iterdir()] == [cached.name]
@@ -0,0 +1,36 @@
+"""Snapshots written by save_snapshot load back into an equivalent network."""
+import app
+from app import load_snapshot, save_snapshot
+from conftest import NETWORK_KEY, queries
+
+
+def test_snapshot_round_trip_preserves_routes(metro_graph, tmp_path):
+    path = str(tmp_path / 'network.pickle')
+    save_snapshot(metro_graph, path, NETWORK_KEY)
+    loaded = load_snapshot(path, NETWORK_KEY)
+
+    assert loaded.stations == metro_graph.stations
+    assert loaded.station_coords == metro_graph.station_coords
+    for start, end, criteria in queries(metro_graph):
+        assert loaded.dijkstra(start, end, criteria) == metro_graph.dijkstra(start, end, criteria)
+
+
+def test_snapshot_for_another_network_is_ignored(metro_graph, tmp_path):
+    path = str(tmp_path / 'network.pickle')
+    save_snapshot(metro_graph, path, NETWORK_KEY)
+    assert load_snapshot(path, bytes(32)) is None
+    assert load_snapshot(str(tmp_path / 'missing.pickle'), NETWORK_KEY) is None
+
+
+def test_snapshot_from_another_format_version_is_ignored(metro_graph, tmp_path, monkeypatch):
+    path = str(tmp_path / 'network.pickle')
+    save_snapshot(metro_graph, path, NETWORK_KEY)
+    monkeypatch.setattr(app, 'SNAPSHOT_MAGIC', f'MGSNAP{app.SNAPSHOT_VERSION + 1}\n'.encode('ascii'))
+    assert load_snapshot(path, NETWORK_KEY) is None
+
+
+def test_truncated_snapshot_is_ignored(metro_graph, tmp_path):
+    path = tmp_path / 'network.pickle'
+    save_snapshot(metro_graph, str(path), NETWORK_KEY)
+    path.write_bytes(path.read_bytes()[:-20])
+    assert load_snapshot(str(path), NETWORK_KEY) is None
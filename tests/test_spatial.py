@@ -0,0 +1,61 @@
+"""Grid queries must return what a scan over every station would."""
+import random
+
+import pytest
+
+import spatial
+from spatial import SpatialIndex, haversine_km
+
+
+@pytest.fixture
+def coords():
+    rng = random.Random(7)
+    return {f'S{i}': (28.4 + rng.random() * 0.4, 77.0 + rng.random() * 0.5) for i in range(300)}
+
+
+@pytest.fixture
+def points():
+    rng = random.Random(11)
+    return [(28.3 + rng.random() * 0.6, 76.9 + rng.random() * 0.7) for _ in range(200)]
+
+
+def brute_force(coords, lat, lon):
+    return sorted((haversine_km(lat, lon, *coord), station) for station, coord in coords.items())
+
+
+def test_nearest_matches_brute_force(coords, points):
+    index = SpatialIndex(coords)
+    for lat, lon in points:
+        expected = brute_force(coords, lat, lon)
+        assert index.nearest(lat, lon, k=5) == expected[:5]
+        assert index.nearest(lat, lon, k=3, max_km=2) == [hit for hit in expected[:3] if hit[0] <= 2]
+
+
+def test_within_matches_brute_force(coords, points):
+    index = SpatialIndex(coords)
+    for lat, lon in points:
+        assert index.within(lat, lon, 3) == [hit for hit in brute_force(coords, lat, lon) if hit[0] <= 3]
+
+
+def test_nearest_many_matches_nearest(coords, points, monkeypatch):
+    monkeypatch.setattr(spatial, '_numpy', lambda: None)
+    index = SpatialIndex(coords)
+    assert index.nearest_many(points) == [index.nearest(lat, lon)[0] for lat, lon in points]
+
+
+def test_vectorized_nearest_many_bounds_its_matrices(coords, points, monkeypatch):
+    pytest.importorskip('numpy')
+    index = SpatialIndex(coords)
+    shapes = []
+    haversine_matrix = spatial.haversine_matrix
+
+    def recording(np, lats1, lons1, lats2, lons2):
+        shapes.append((len(lats1), len(lats2)))
+        return haversine_matrix(np, lats1, lons1, lats2, lons2)
+
+    monkeypatch.setattr(spatial, 'haversine_matrix', recording)
+    monkeypatch.setattr(spatial, 'MATRIX_SIZE', 64 * len(coords))
+    results = index.nearest_many(points)
+    assert max(rows * columns for rows, columns in shapes) <= spatial.MATRIX_SIZE
+    for (distance, station), (lat, lon) in zip(results, points):
+        assert (pytest.approx(distance), station) == index.nearest(lat, lon)[0]
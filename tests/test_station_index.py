@@ -0,0 +1,53 @@
+"""Ranked as-you-type station search."""
+import pytest
+
+from station_index import StationIndex
+
+STATIONS = ['Rajiv Chowk', 'Patel Chowk', 'Chandni Chowk', 'Karol Bagh', 'Punjabi Bagh', 'Punjabi Bagh West',
+            'Kashmere Gate', 'Noida Sector 18', 'Rohini Sector 18-19', 'Lok Kalyan Marg', 'Violet Park']
+
+
+@pytest.fixture
+def index():
+    return StationIndex(STATIONS)
+
+
+def test_exact_then_prefix_then_word_prefix(index):
+    assert index.search('punjabi bagh') == ['Punjabi Bagh', 'Punjabi Bagh West']
+    assert index.search('bagh') == ['Karol Bagh', 'Punjabi Bagh', 'Punjabi Bagh West']
+    assert index.search('chowk rajiv') == ['Rajiv Chowk']
+
+
+def test_substrings_rank_after_word_prefixes(index):
+    assert index.search('ajiv') == ['Rajiv Chowk']
+    assert index.search('agh') == ['Karol Bagh', 'Punjabi Bagh', 'Punjabi Bagh West']
+    assert index.search('ndni') == ['Chandni Chowk']
+
+
+def test_typos_and_aliases(index):
+    assert index.search('kashmer gate') == ['Kashmere Gate']
+    assert index.search('voilet') == ['Violet Park']
+    assert index.resolve('Race Course') == 'Lok Kalyan Marg'
+    assert index.resolve('sec 18') is None  # two stations tie
+    assert index.resolve('noida sec 18') == 'Noida Sector 18'
+
+
+def test_fuzzy_pass_only_runs_when_exact_matches_fall_short(index, monkeypatch):
+    calls = []
+    fuzzy_entries = index._fuzzy_entries
+    monkeypatch.setattr(index, '_fuzzy_entries', lambda token: calls.append(token) or fuzzy_entries(token))
+
+    assert index.search('chowk', limit=3) == ['Patel Chowk', 'Rajiv Chowk', 'Chandni Chowk']
+    assert index.search('owk', limit=3) == ['Patel Chowk', 'Rajiv Chowk', 'Chandni Chowk']
+    assert calls == []
+    index.search('chowk', limit=4)
+    assert calls == ['chowk']
+
+
+def test_fuzzy_matches_are_reused_while_typing(index, monkeypatch):
+    calls = []
+    edit_matches = index._edit_matches
+    monkeypatch.setattr(index, '_edit_matches', lambda token: calls.append(token) or edit_matches(token))
+    for typed in ('kashmer', 'kashmer g', 'kashmer ga', 'kashmer gat'):
+        assert index.search(typed) == ['Kashmere Gate']
+    assert calls.count('kashmer') == 1
@@ -0,0 +1,66 @@
+"""Earliest-arrival routing over a day of departures."""
+import os
+
+import pytest
+
+from app import MetroGraph
+from timetable import frequencies_path, line_patterns
+
+FREQUENCIES = ('Line,Start,End,Headway (min)\n'
+               '*,06:00,22:00,10\n')
+
+
+@pytest.fixture
+def frequencies_csv(tmp_path):
+    path = tmp_path / 'frequencies.csv'
+    path.write_text(FREQUENCIES, encoding='utf-8')
+    return str(path)
+
+
+def test_waits_for_the_next_departure(metro_graph, frequencies_csv):
+    metro_graph.load_frequencies(frequencies_csv)
+    result = metro_graph.route_at('Alpha', 'Delta', '06:03')
+    assert [(leg['line'], leg['from'], leg['to'], leg['board']) for leg in result['legs']] == [
+        ('Red', 'Alpha', 'Delta', '06:10')]
+    assert (result['departure'], result['arrival']) == ('06:03', '06:17')
+    assert result['total_time'] == 14 and result['wait_time'] == 7
+
+
+def test_changing_lines_includes_the_platform_walk(metro_graph, frequencies_csv):
+    metro_graph.load_frequencies(frequencies_csv, transfer_walk=3)
+    result = metro_graph.route_at('Alpha', 'Golf', '06:00')
+    # Ready to board Blue at Bravo from 06:05; riding the 06:00 from Golf out to Echo
+    # and back arrives no sooner, so the rider waits at Bravo for the 06:12
+    assert [(leg['line'], leg['from'], leg['board'], leg['alight']) for leg in result['legs']] == [
+        ('Red', 'Alpha', '06:00', '06:02'), ('Blue', 'Bravo', '06:12', '06:17')]
+
+
+def test_no_service_after_the_last_train(metro_graph, frequencies_csv):
+    metro_graph.load_frequencies(frequencies_csv)
+    assert metro_graph.route_at('Alpha', 'Delta', '22:30') is None
+    assert metro_graph.no_route_message('Alpha', 'Delta', '22:30').startswith("No further service today")
+    assert metro_graph.route_at('Alpha', 'Xray', '12:00') is None
+    assert metro_graph.no_route_message('Alpha', 'Xray', '12:00') == "No route found from Alpha to Xray leaving 12:00."
+
+
+def test_trains_run_through_a_duplicated_segment(frequencies_csv):
+    # Blue calls at Bravo, Charlie and Delta, and the data also has a direct
+    # Bravo - Delta segment beside them
+    metro_graph = MetroGraph()
+    for a, b, time in (('Alpha', 'Bravo', 2), ('Bravo', 'Charlie', 2), ('Charlie', 'Delta', 2),
+                       ('Delta', 'Echo', 2), ('Bravo', 'Delta', 3)):
+        metro_graph.add_edge(a, b, time, 1.0, 5.0, 'Blue')
+    metro_graph.add_edge('Charlie', 'Foxtrot', 2, 1.0, 5.0, 'Red')
+    metro_graph.compile()
+    assert line_patterns(metro_graph) == [('Blue', ['Alpha', 'Bravo', 'Charlie', 'Delta', 'Echo']),
+                                          ('Red', ['Charlie', 'Foxtrot'])]
+
+    metro_graph.load_frequencies(frequencies_csv)
+    result = metro_graph.route_at('Alpha', 'Echo', '12:00')
+    assert [(leg['line'], leg['from'], leg['to']) for leg in result['legs']] == [('Blue', 'Alpha', 'Echo')]
+    assert result['total_time'] == 8
+
+
+def test_frequencies_are_found_next_to_the_network_csv(tmp_path):
+    network_csv = os.path.join(str(tmp_path), 'network.csv')
+    assert frequencies_path(network_csv) == os.path.join(str(tmp_path), 'metro_frequencies.csv')
@@ -0,0 +1,321 @@
+"""Time-dependent routing over a day of train departures.
+
+Per-line service frequencies (see ``metro_frequencies.csv``) are expanded
+into trips along each line's station sequence in both directions, and every
+trip hop becomes a connection ``(departure, arrival, from, to, trip)``.
+Queries run the connection scan algorithm: one pass over the connections
+sorted by departure, starting at the requested time and stopping once
+nothing departing later can arrive sooner. Waiting for the first train and
+walking between platforms at interchanges are part of the journey time.
+
+Frequencies CSV columns: ``Line, Start, End, Headway (min)``. Each row is a
+service period (``HH:MM``, hours may run past 24). Rows for line ``*`` apply
+to every line without rows of its own. The file is looked up next to the
+network CSV it belongs with (see frequencies_path).
+"""
+import csv
+import os
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from time import perf_counter
+
+FREQUENCIES_CSV = 'metro_frequencies.csv'
+DEFAULT_LINE = '*'
+TRANSFER_WALK_MIN = 3  # platform-to-platform walk when changing trains at an interchange
+MAX_SKIPPED_STOPS = 2  # a segment bypassing at most this many stops of its line duplicates them
+INF = float('inf')
+
+
+def parse_clock(value):
+    """Seconds after midnight for ``'HH:MM'``/``'HH:MM:SS'`` or a number of minutes."""
+    if isinstance(value, (int, float)):
+        return round(value * 60)
+    parts = [int(part) for part in value.strip().split(':')]
+    if len(parts) not in (2, 3) or not 0 <= parts[1] < 60 or (len(parts) == 3 and not 0 <= parts[2] < 60):
+        raise ValueError(f"Invalid time: {value!r} (expected HH:MM)")
+    hours, minutes, seconds = parts + [0] * (3 - len(parts))
+    return (hours * 60 + minutes) * 60 + seconds
+
+
+def format_clock(seconds):
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}" + (f":{seconds:02d}" if seconds else "")
+
+
+def frequencies_path(network_csv):
+    """The frequencies CSV that sits next to ``network_csv``."""
+    return os.path.join(os.path.dirname(os.path.abspath(network_csv)), FREQUENCIES_CSV)
+
+
+def read_frequencies(file_path=FREQUENCIES_CSV):
+    """``{line: [(start_s, end_s, headway_s)]}`` from a frequencies CSV."""
+    frequencies = defaultdict(list)
+    with open(file_path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            line = row['Line'].strip()
+            line = line if line == DEFAULT_LINE else line.title()  # same normalization as add_edge
+            start, end = parse_clock(row['Start']), parse_clock(row['End'])
+            headway = round(float(row['Headway (min)']) * 60)
+            if headway <= 0 or end <= start:
+                raise ValueError(f"Invalid service period for {line}: {row['Start']}-{row['End']} "
+                                 f"every {row['Headway (min)']} min")
+            frequencies[line].append((start, end, headway))
+    for periods in frequencies.values():
+        periods.sort()
+    return dict(frequencies)
+
+
+def line_patterns(metro_graph):
+    """Station sequences trains run along: ``[(line, [station, ...])]``.
+
+    Each line's segments are split into simple paths between its ends and
+    branch points; a line that is a closed loop becomes one path around it.
+    A segment running parallel to a short all-stops stretch of the same line
+    (e.g. Karol Bagh - R K Ashram Marg beside Jhandewalan) is left out, so
+    trains run through instead of the line splitting at both ends.
+    """
+    patterns = []
+    for line, pairs in sorted(metro_graph.line_edges.items()):
+        adjacency = defaultdict(set)
+        for a, b in pairs:
+            if a != b and a in metro_graph.graph and b in metro_graph.graph:
+                adjacency[a].add(b)
+                adjacency[b].add(a)
+        for a, b in sorted({tuple(sorted(pair)) for pair in pairs}):
+            if b in adjacency[a] and _bypasses(adjacency, a, b):
+                adjacency[a].discard(b)
+                adjacency[b].discard(a)
+        ends = {station for station, neighbors in adjacency.items() if len(neighbors) != 2}
+        walked = set()
+
+        def walk(a, b):
+            path = [a, b]
+            walked.add(frozenset((a, b)))
+            while b not in ends:
+                step = next((c for c in sorted(adjacency[b]) if frozenset((b, c)) not in walked), None)
+                if step is None:
+                    break  # back at the start of a loop
+                walked.add(frozenset((b, step)))
+                path.append(step)
+                b = step
+            return path
+
+        for starts in (sorted(ends), sorted(adjacency)):  # loops have no ends; pick them up second
+            for a in starts:
+                for b in sorted(adjacency[a]):
+                    if frozenset((a, b)) not in walked:
+                        patterns.append((line, walk(a, b)))
+    return patterns
+
+
+def _bypasses(adjacency, a, b):
+    """True if another chain of up to MAX_SKIPPED_STOPS through-stations links ``a`` to ``b``."""
+    for first in adjacency[a] - {b}:
+        previous, station = a, first
+        for _ in range(MAX_SKIPPED_STOPS):
+            if len(adjacency[station]) != 2:
+                break
+            previous, station = station, next(iter(adjacency[station] - {previous}))
+            if station == b:
+                return True
+    return False
+
+
+class Timetable:
+    """A day of connections for one MetroGraph, built from per-line frequencies."""
+
+    def __init__(self, metro_graph, frequencies, transfer_walk=TRANSFER_WALK_MIN, walk_times=None):
+        self.metro_graph = metro_graph
+        self.compiled = compiled = metro_graph._compiled()
+        n = len(compiled)
+
+        lines_at = defaultdict(set)
+        for line, stations in metro_graph.line_stations.items():
+            for station in stations:
+                lines_at[station].add(line)
+        walk_times = walk_times or {}
+        # Seconds needed between arriving on one train and boarding another
+        self.change = array('l', [0]) * n
+        for station, node in compiled.index.items():
+            if len(lines_at[station]) > 1 or station in walk_times:
+                self.change[node] = round(walk_times.get(station, transfer_walk) * 60)
+
+        connections = []  # (departure, arrival, from, to, trip, edge)
+        self.trip_lines = []
+        self.trip_connections = []  # trip -> its connection indexes in stop order (filled after sorting)
+        served = defaultdict(set)  # station -> stations a trip runs to directly
+        for line, stations in line_patterns(metro_graph):
+            periods = frequencies.get(line, frequencies.get(DEFAULT_LINE, ()))
+            line_id = compiled.line_names.index(line) if line in compiled.line_names else -1
+            for direction in (stations, stations[::-1]):
+                for hops in self._runs(direction, line_id):
+                    if periods:
+                        for a, b, _, _ in hops:
+                            served[a].add(b)
+                    for start, end, headway in periods:
+                        for departure in range(start, end, headway):
+                            trip = len(self.trip_lines)
+                            self.trip_lines.append(line)
+                            clock = departure
+                            for a, b, edge, seconds in hops:
+                                connections.append((clock, clock + seconds, a, b, trip, edge))
+                                clock += seconds
+
+        connections.sort()
+        self.departures = array('l', (c[0] for c in connections))
+        self.arrivals = array('l', (c[1] for c in connections))
+        self.sources = array('l', (c[2] for c in connections))
+        self.targets = array('l', (c[3] for c in connections))
+        self.trips = array('l', (c[4] for c in connections))
+        self.edges = array('l', (c[5] for c in connections))
+        self.trip_connections = [[] for _ in self.trip_lines]
+        for i, trip in enumerate(self.trips):
+            self.trip_connections[trip].append(i)
+
+        # Stations no trip sequence links can never reach each other; queries
+        # between them are answered without scanning the rest of the day
+        self.component = array('l', [-1]) * n
+        for node in range(n):
+            if self.component[node] == -1:
+                self.component[node] = node
+                stack = [node]
+                while stack:
+                    for neighbor in served[stack.pop()]:
+                        if self.component[neighbor] == -1:
+                            self.component[neighbor] = node
+                            stack.append(neighbor)
+
+    def __len__(self):
+        return len(self.departures)
+
+    def serves(self, start, end):
+        """True if trips link ``start`` to ``end`` at some time of day."""
+        index = self.compiled.index
+        return start in index and end in index and self.component[index[start]] == self.component[index[end]]
+
+    def _runs(self, stations, line_id):
+        """Split a station sequence into runs of ``(from, to, edge, seconds)`` hops trains can take.
+
+        A hop with no open segment on the line (closed or removed) ends the run.
+        """
+        compiled = self.compiled
+        index, offsets, targets, times, lines = (compiled.index, compiled.offsets, compiled.targets,
+                                                 compiled.times, compiled.lines)
+        runs, run = [], []
+        for a, b in zip(stations, stations[1:]):
+            source, target = index[a], index[b]
+            best = None
+            for edge in range(offsets[source], offsets[source + 1]):
+                if targets[edge] == target and lines[edge] == line_id and times[edge] != INF:
+                    if best is None or times[edge] < times[best]:
+                        best = edge
+            if best is None:
+                if run:
+                    runs.append(run)
+                run = []
+                continue
+            run.append((source, target, best, round(times[best] * 60)))
+        if run:
+            runs.append(run)
+        return runs
+
+    def route(self, start, end, departure):
+        """Earliest-arrival journey from ``start`` leaving at ``departure`` (see parse_clock).
+
+        Returns the MetroGraph.dijkstra result format with ``total_time`` as
+        minutes from departure to arrival, plus ``departure``, ``arrival``,
+        ``wait_time`` (minutes not spent on a train) and ``legs``; or None if
+        ``end`` cannot be reached before service ends.
+        """
+        metro_graph, compiled = self.metro_graph, self.compiled
+        profiler = metro_graph.profiler
+        started = perf_counter() if profiler is not None else 0
+        departure = parse_clock(departure)
+        source = compiled.index.get(start)
+        target = compiled.index.get(end)
+        if source is None or target is None or source == target:
+            result = metro_graph._unroutable(start, end)
+            if result is not None:
+                result.update(departure=format_clock(departure), arrival=format_clock(departure), wait_time=0, legs=[])
+            return result
+
+        if self.component[source] != self.component[target]:
+            return None
+
+        n = len(compiled)
+        arrival = [INF] * n
+        ready = [INF] * n  # earliest time a new train can be boarded at each station
+        enter = [-1] * n  # connection boarded on the way to each station
+        leave = [-1] * n  # connection alighted from at each station
+        rides = [0] * n  # trains ridden to reach each station
+        arrival[source] = ready[source] = departure
+        boarded = {}  # trip -> first connection taken on it
+
+        departures, arrivals, sources, targets, trips = (self.departures, self.arrivals, self.sources,
+                                                         self.targets, self.trips)
+        change = self.change
+        first_scanned = i = bisect_left(departures, departure)
+        for i in range(first_scanned, len(departures)):
+            if departures[i] >= arrival[target]:
+                break  # nothing departing from here on can arrive sooner
+            trip = trips[i]
+            first = boarded.get(trip)
+            if first is None:
+                if ready[sources[i]] > departures[i]:
+                    continue
+                boarded[trip] = first = i
+            stop = targets[i]
+            if arrivals[i] < arrival[stop]:
+                arrival[stop] = arrivals[i]
+                ready[stop] = arrivals[i] + change[stop]
+                enter[stop] = first
+                leave[stop] = i
+                rides[stop] = rides[sources[first]] + 1
+        if profiler is not None:
+            profiler.add('scan', perf_counter() - started, connections_scanned=i - first_scanned,
+                         trips_boarded=len(boarded))
+
+        if arrival[target] == INF:
+            return None
+
+        legs = []
+        node = target
+        while node != source:
+            first, last = enter[node], leave[node]
+            trip = self.trips[first]
+            connections = self.trip_connections[trip]
+            start_at = connections.index(first)
+            end_at = connections.index(last, start_at)
+            # The scan boards a train at the first stop it can; board as late as possible
+            # without riding more trains (e.g. not out to a terminus and back)
+            for j in range(end_at, start_at, -1):
+                stop = self.sources[connections[j]]
+                if (ready[stop] <= self.departures[connections[j]] and rides[stop] <= rides[self.sources[first]]
+                        and (leave[stop] == -1 or self.trips[leave[stop]] != trip)):
+                    start_at = j
+                    break
+            legs.append(connections[start_at:end_at + 1])
+            node = self.sources[connections[start_at]]
+        legs.reverse()
+
+        edges = [self.edges[i] for leg in legs for i in leg]
+        result = metro_graph._route_from_edges(compiled, source, edges)
+        riding = sum(self.arrivals[leg[-1]] - self.departures[leg[0]] for leg in legs)
+        total = arrival[target] - departure
+        result.update(
+            total_time=total / 60,
+            departure=format_clock(departure),
+            arrival=format_clock(arrival[target]),
+            wait_time=(total - riding) / 60,
+            legs=[{
+                'line': self.trip_lines[self.trips[leg[0]]],
+                'from': compiled.names[self.sources[leg[0]]],
+                'to': compiled.names[self.targets[leg[-1]]],
+                'board': format_clock(self.departures[leg[0]]),
+                'alight': format_clock(self.arrivals[leg[-1]]),
+                'stops': len(leg),
+            } for leg in legs],
+        )
+        return result